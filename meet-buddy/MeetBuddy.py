@@ -1,26 +1,43 @@
 import streamlit as st
 import os
 import uuid
-import pickle
 from pipeline import get_meeting
 from details_page import show_details  # Import the details page function
+from metrics_page import show_metrics
+from core.upload import ingest_upload
+from core.meeting_store import migrate_folder
+from core.meeting_catalog import MeetingCatalog, ENTRY_KINDS
 import io
 import contextlib
 import threading
 import queue
 import time
 
-# Set the directory for pickle files
-PICKLE_DIR = 'meetings/'
-if not os.path.exists(PICKLE_DIR):
-    os.makedirs(PICKLE_DIR)
+# Set the directory for meeting files
+MEETING_DIR = 'meetings/'
+if not os.path.exists(MEETING_DIR):
+    os.makedirs(MEETING_DIR)
 
-def list_pickle_files():
-    return [f for f in os.listdir(PICKLE_DIR) if f.endswith('.pkl')]
+catalog = MeetingCatalog()
 
-def load_pickle(file_path):
-    with open(file_path, 'rb') as f:
-        return pickle.load(f)
+def list_meeting_files():
+    # Meetings pickled by older versions are converted, and meetings saved
+    # before the catalog existed are indexed, once per session: the
+    # pipeline indexes every meeting it saves
+    if not st.session_state.get('meeting_folder_imported'):
+        migrate_folder(MEETING_DIR)
+        catalog.import_folder(MEETING_DIR)
+        st.session_state.meeting_folder_imported = True
+    return [meeting.id for meeting in catalog.list_meetings(limit=-1)]
+
+def format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def open_meeting(meeting_id, start_time=None):
+    st.session_state.selected_meeting = meeting_id
+    st.session_state.start_time = start_time
+    st.session_state.page = 'details'
 
 class StdoutRedirector:
     def __init__(self, q):
@@ -39,12 +56,13 @@ if "background_tasks" not in st.session_state:
 if "task_results" not in st.session_state:
     st.session_state.task_results = {}
 
-def process_file(file_path, language, task_id):
+def process_file(file_path, language, task_id, fingerprint=None):
     try:
         q = queue.Queue()
         with contextlib.redirect_stdout(StdoutRedirector(q)):
-            generated_pickle = get_meeting(file_path, language)
-        st.session_state.task_results[task_id] = generated_pickle
+            # Models stay warm in the shared model server across sessions
+            meeting = get_meeting(file_path, language, model_server=True, fingerprint=fingerprint)
+        st.session_state.task_results[task_id] = os.path.basename(meeting.video_path)
     except Exception as e:
         if "task_results" in st.session_state and st.session_state.task_results:
             st.session_state.task_results[task_id] = f"ERROR: {e}"
@@ -65,21 +83,49 @@ st.sidebar.title("👫 Meet Buddy")
 if st.sidebar.button("🏠 Home"):
     st.session_state.page = 'home'
     st.rerun()
+if st.sidebar.button("📊 Metrics"):
+    st.session_state.page = 'metrics'
+    st.rerun()
 
 st.title("👫 Meet Buddy")
 
 if st.session_state.page == 'home':
     st.header("📂 Available Meetings")
-    pickle_files = list_pickle_files()
+    meeting_files = list_meeting_files()
     
-    if pickle_files:
-        selected_pickle = st.selectbox("🔍 Select a meeting:", pickle_files)
+    if meeting_files:
+        selected_meeting = st.selectbox("🔍 Select a meeting:", meeting_files)
         if st.button("🔎 View Details"):
-            st.session_state.selected_pickle = selected_pickle
-            st.session_state.page = 'details'
+            open_meeting(selected_meeting)
             st.rerun()
     else:
-        st.info("No pickle files found in the 'meetings/' directory.")
+        st.info("No meetings found in the 'meetings/' directory.")
+    
+    st.markdown("---")
+    
+    st.header("🔎 Search Meetings")
+    search_columns = st.columns([3, 1, 1])
+    query = search_columns[0].text_input("Words in transcripts, summaries, tasks, decisions...")
+    kind = search_columns[1].selectbox("Kind", options=["all"] + ENTRY_KINDS)
+    person = search_columns[2].text_input("Speaker / assignee")
+    
+    if query.strip() or person.strip():
+        started = time.perf_counter()
+        hits, total = catalog.search(
+            query,
+            kind=None if kind == "all" else kind,
+            person=person.strip() or None,
+            limit=20
+        )
+        st.caption(f"{total} matches in {(time.perf_counter() - started) * 1000:.0f} ms")
+        for i, hit in enumerate(hits):
+            columns = st.columns([5, 1])
+            where = f" [{format_time(hit.start_time)}]" if hit.start_time is not None else ""
+            who = f" — {hit.person}" if hit.person else ""
+            columns[0].markdown(f"`{hit.meeting_id}`{where} *{hit.kind}*{who}: {hit.snippet}")
+            if columns[1].button("▶️ Open", key=f"search_hit_{i}"):
+                open_meeting(hit.meeting_id, hit.start_time)
+                st.rerun()
     
     st.markdown("---")
     
@@ -95,18 +141,21 @@ if st.session_state.page == 'home':
     st.session_state.selected_language = language
     
     if uploaded_file is not None:
-        temp_dir = "videos/"
-        if not os.path.exists(temp_dir):
-            os.makedirs(temp_dir)
-        file_path = os.path.join(temp_dir, uploaded_file.name)
-        
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Streamed to disk in chunks, and only once per upload across reruns
+        record = ingest_upload(
+            uploaded_file,
+            folder="videos/",
+            seen=st.session_state.setdefault("ingested_uploads", {})
+        )
+        file_path = record.path
         st.success(f"✅ Uploaded `{uploaded_file.name}` successfully!")
         
         if st.button("⚙️ Process File"):
             task_id = str(uuid.uuid4())
-            thread = threading.Thread(target=process_file, args=(file_path, language, task_id))
+            # The upload's content hash keys the meeting job, so the video isn't hashed again
+            thread = threading.Thread(
+                target=process_file, args=(file_path, language, task_id, record.content_hash)
+            )
             st.session_state.background_tasks[task_id] = thread
             thread.start()
             st.success(f"✅ Processing started with Task ID: {task_id}")
@@ -122,11 +171,18 @@ if st.session_state.page == 'home':
     else:
         st.info("No ongoing processes.")
 
+elif st.session_state.page == 'metrics':
+    show_metrics()
+
 elif st.session_state.page == 'details':
-    if 'selected_pickle' in st.session_state:
-        show_details(st.session_state.selected_pickle)
+    if 'selected_meeting' in st.session_state:
+        show_details(
+            st.session_state.selected_meeting,
+            meeting_dir=MEETING_DIR,
+            start_time=st.session_state.get('start_time')
+        )
     else:
-        st.error("No pickle file selected.")
+        st.error("No meeting selected.")
         if st.button("🔙 Back to Home"):
             st.session_state.page = 'home'
             st.rerun()
@@ -138,6 +194,6 @@ if st.session_state.task_results:
         if isinstance(result, str) and result.startswith("ERROR:"):
             st.sidebar.error(f"Task {task_id} failed: {result}")
         else:
-            st.sidebar.success(f"Task {task_id} completed! Generated pickle: `{result}`")
+            st.sidebar.success(f"Task {task_id} completed! Meeting saved: `{result}`")
         # Remove the result once displayed
         del st.session_state.task_results[task_id]
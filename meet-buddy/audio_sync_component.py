@@ -9,7 +9,7 @@ def get_audio_data_url(audio_path: str) -> str:
     b64_encoded = base64.b64encode(audio_data).decode("utf-8")
     return f"data:audio/wav;base64,{b64_encoded}"
 
-def audio_sync_player(audio_file, transcript):
+def audio_sync_player(audio_file, transcript, start_time=None):
     """
     transcript is expected to be a list of dicts like:
     [
@@ -22,6 +22,9 @@ def audio_sync_player(audio_file, transcript):
        ...
     ]
     Each dict must have 'start_time' and 'end_time' in seconds (float).
+
+    When start_time (seconds) is given, the player is positioned there and
+    the matching line scrolled into view, e.g. to open a search hit.
     """
     
     # Convert transcript to JSON string
@@ -85,6 +88,20 @@ def audio_sync_player(audio_file, transcript):
         transcriptDiv.appendChild(p);
     }});
 
+    // Jump to the requested moment once the audio can seek
+    const startTime = {json.dumps(start_time)};
+    if (startTime !== null) {{
+        audio.addEventListener('loadedmetadata', () => {{
+            audio.currentTime = startTime;
+        }}, {{ once: true }});
+        const index = transcript.findIndex(item => item.start_time >= startTime);
+        if (index >= 0) {{
+            const p = document.getElementById('transcript-' + index);
+            p.classList.add('highlight');
+            p.scrollIntoView({{ block: 'center' }});
+        }}
+    }}
+
     // Highlight current transcript
     audio.ontimeupdate = function() {{
         const currentTime = audio.currentTime;
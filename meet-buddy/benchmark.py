@@ -0,0 +1,144 @@
+"""
+Micro-benchmark of the speaker alignment on synthetic meetings.
+
+Turns and Whisper segments (with word timestamps) are generated at random
+for meetings of the given lengths, then aligned by the original nested
+loop and by core.alignment's sweep, which must agree at segment level:
+
+    python benchmark.py --hours 0.5 1 3
+    python benchmark.py --hours 3 --words --output benchmarks/alignment.json
+"""
+import os
+import json
+import time
+import random
+import argparse
+import platform
+from copy import deepcopy
+from typing import List
+
+from core.alignment import align
+from models.speaker import SpeakerOutput
+
+
+def make_meeting(seconds: float, speakers: int = 4, seed: int = 0):
+    """Random speaker turns (2-20s, sometimes overlapping) and 1-8s segments of 0.2-0.6s words."""
+    rng = random.Random(seed)
+
+    turns = []
+    t = 0.0
+    while t < seconds:
+        length = rng.uniform(2, 20)
+        start = max(0.0, t - rng.uniform(0, 1)) if rng.random() < 0.1 else t
+        turns.append(SpeakerOutput(
+            speaker=f"SPEAKER_{rng.randrange(speakers):02d}",
+            start_time=start,
+            end_time=start + length,
+            text=""
+        ))
+        t = start + length + rng.uniform(0, 1.5)
+
+    segments = []
+    t = 0.0
+    while t < seconds:
+        words = []
+        end = t + rng.uniform(1, 8)
+        w = t
+        while w < end:
+            length = rng.uniform(0.2, 0.6)
+            words.append({"start": w, "end": w + length, "word": f" w{len(words)}"})
+            w += length
+        segments.append({
+            "start": t,
+            "end": w,
+            "text": "".join(word["word"] for word in words),
+            "words": words
+        })
+        t = w + rng.uniform(0, 0.5)
+
+    return turns, segments
+
+
+def nested_loop_align(speaker_outputs: List[SpeakerOutput], whisper_segments: List[dict]) -> List[SpeakerOutput]:
+    """The original O(N * M) SpeakerDiarization.align, kept as the baseline."""
+    for ws in whisper_segments:
+        w_start, w_end = ws["start"], ws["end"]
+        best_overlap = 0.0
+        best_index = None
+        for i, spk_out in enumerate(speaker_outputs):
+            overlap = min(spk_out.end_time, w_end) - max(spk_out.start_time, w_start)
+            if overlap > best_overlap:
+                best_overlap = overlap
+                best_index = i
+        if best_index is not None and best_overlap > 0:
+            speaker_outputs[best_index].text += " " + ws["text"]
+
+    for spk_out in speaker_outputs:
+        spk_out.text = spk_out.text.strip()
+    speaker_outputs.sort(key=lambda x: x.start_time)
+    return speaker_outputs
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def bench_meeting(hours: float, words: bool, seed: int) -> dict:
+    turns, segments = make_meeting(hours * 3600, seed=seed)
+
+    expected, loop_seconds = timed(nested_loop_align, deepcopy(turns), segments)
+    aligned, sweep_seconds = timed(align, turns, segments)
+    if aligned != expected:
+        raise AssertionError(f"Sweep and nested loop disagree on a {hours}h meeting")
+
+    run = {
+        "hours": hours,
+        "turns": len(turns),
+        "segments": len(segments),
+        "words": sum(len(seg["words"]) for seg in segments),
+        "nested_loop_seconds": loop_seconds,
+        "sweep_seconds": sweep_seconds,
+        "speedup": loop_seconds / sweep_seconds if sweep_seconds else None
+    }
+    if words:
+        _, run["sweep_words_seconds"] = timed(align, turns, segments, words=True)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the speaker alignment on synthetic meetings")
+    parser.add_argument('--hours', type=float, nargs='+', default=[0.5, 1, 3])
+    parser.add_argument('--words', action='store_true', help="Also times the word level alignment")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Writes the results to this JSON file")
+    args = parser.parse_args()
+
+    runs = []
+    for hours in args.hours:
+        run = bench_meeting(hours, args.words, args.seed)
+        runs.append(run)
+
+        print(
+            f"{hours:g}h, {run['turns']} turns x {run['segments']} segments: "
+            f"nested loop {run['nested_loop_seconds']:.3f}s, sweep {run['sweep_seconds']:.3f}s "
+            f"({run['speedup']:.0f}x)"
+        )
+        if args.words:
+            print(f"  {run['words']} words: {run['sweep_words_seconds']:.3f}s")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                "created": time.time(),
+                "machine": platform.machine(),
+                "python": platform.python_version(),
+                "runs": runs
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
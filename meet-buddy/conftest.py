@@ -0,0 +1,2 @@
+# Lets the tests import the app modules (core.*, models.*, pipeline) the way
+# the app does, from this directory.
@@ -4,9 +4,12 @@ import json
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
+from core.llm_cache import LLMCache
+from core.instrumentation import metrics
+
 
 class MeetingKnowlegeAgent:
-    def __init__(self, language = 'portuguese'):
+    def __init__(self, language = 'portuguese', cache: LLMCache = None):
         prompt_template = f"""
         You are an intelligent meeting analysis assistant. 
         Your primary function is to process and analyze transcripts 
@@ -107,17 +110,27 @@ class MeetingKnowlegeAgent:
             ]
         )
 
+        self.prompt = prompt
+        self.llm = llm
         self.chain = prompt | llm
+        self.cache = cache or LLMCache()
 
 
-    def invoke(self, meeting_log: str):
-        response = self.chain.invoke(
-            {
-                "meeting_log": meeting_log
-            }
-        )
+    def invoke(self, meeting_log: str, bypass_cache: bool = False):
+        """
+        Identical meeting logs are answered from the LLM cache;
+        `bypass_cache` asks the model for a new sample.
+        """
+        with metrics.span('meet-buddy.agent'):
+            content = self.cache.invoke(
+                self.prompt,
+                self.llm,
+                {
+                    "meeting_log": meeting_log
+                },
+                bypass=bypass_cache
+            )
 
-        content = response.content
         content = content.replace('```json', '').replace('```', '')
 
         return json.loads(content)
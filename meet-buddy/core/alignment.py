@@ -0,0 +1,103 @@
+import heapq
+from dataclasses import replace
+from typing import List, Optional, Sequence
+
+from models.speaker import SpeakerOutput
+
+
+def assign_intervals(
+    turn_starts: Sequence[float],
+    turn_ends: Sequence[float],
+    starts: Sequence[float],
+    ends: Sequence[float]
+) -> List[Optional[int]]:
+    """
+    For every interval [starts[i], ends[i]], the index of the turn it
+    overlaps the most (the lowest index on ties), or None when it overlaps
+    none.
+
+    Both lists are sorted once and swept together: turns enter a heap
+    (keyed by their end) once they start before the interval ends, and
+    leave it for good once they end before an interval starts. Only the
+    turns in the heap are compared, so the cost is
+    O((N + M) log M) plus the number of overlapping pairs, instead of N * M.
+    """
+    turn_order = sorted(range(len(turn_starts)), key=lambda t: turn_starts[t])
+    order = sorted(range(len(starts)), key=lambda i: starts[i])
+    assigned = [None] * len(starts)
+
+    active = []
+    next_turn = 0
+    for i in order:
+        start, end = starts[i], ends[i]
+
+        while next_turn < len(turn_order) and turn_starts[turn_order[next_turn]] < end:
+            t = turn_order[next_turn]
+            heapq.heappush(active, (turn_ends[t], t))
+            next_turn += 1
+        # Intervals come by start time, so these turns are behind all of them
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+
+        best, best_overlap = None, 0.0
+        for turn_end, t in active:
+            overlap = min(turn_end, end) - max(turn_starts[t], start)
+            if overlap > best_overlap or (overlap == best_overlap and best is not None and t < best):
+                best, best_overlap = t, overlap
+        assigned[i] = best
+
+    return assigned
+
+
+def align(
+    speaker_outputs: List[SpeakerOutput],
+    whisper_segments: List[dict],
+    words: bool = False
+) -> List[SpeakerOutput]:
+    """
+    Distributes the Whisper text among the speaker turns, returning new
+    SpeakerOutputs sorted by start time (the turns are left untouched).
+
+    Each segment goes to the turn it overlaps the most. With `words`, every
+    word (when Whisper produced word timestamps) goes to the turn it
+    overlaps the most instead, so a segment spoken by two people is split
+    between their turns; words falling between turns stay with their
+    segment's turn. Text that overlaps no turn is dropped.
+    """
+    turn_starts = [turn.start_time for turn in speaker_outputs]
+    turn_ends = [turn.end_time for turn in speaker_outputs]
+    segment_turns = assign_intervals(
+        turn_starts, turn_ends,
+        [seg["start"] for seg in whisper_segments],
+        [seg["end"] for seg in whisper_segments]
+    )
+
+    # Pieces are joined once per turn, never concatenated one by one
+    pieces = [[turn.text or ""] for turn in speaker_outputs]
+
+    if words:
+        units = []
+        for seg, segment_turn in zip(whisper_segments, segment_turns):
+            if seg.get("words"):
+                units.extend((w["start"], w["end"], w["word"], segment_turn) for w in seg["words"])
+            else:
+                units.append((seg["start"], seg["end"], " " + seg["text"], segment_turn))
+
+        word_turns = assign_intervals(
+            turn_starts, turn_ends, [u[0] for u in units], [u[1] for u in units]
+        )
+        for (_, _, text, segment_turn), t in zip(units, word_turns):
+            t = t if t is not None else segment_turn
+            if t is not None:
+                pieces[t].append(text)
+    else:
+        for seg, t in zip(whisper_segments, segment_turns):
+            if t is not None:
+                pieces[t].append(" " + seg["text"])
+
+    aligned = [
+        replace(turn, text="".join(turn_pieces).strip())
+        for turn, turn_pieces in zip(speaker_outputs, pieces)
+    ]
+    aligned.sort(key=lambda x: x.start_time)
+    return aligned
@@ -0,0 +1,345 @@
+import os
+import re
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+    import resource
+except ImportError:  # Windows
+    fcntl = resource = None
+
+
+METRICS_DIR = os.getenv('METRICS_DIR', 'metrics')
+# Once folded into the aggregates, the span log is rotated past this size
+MAX_LOG_BYTES = int(float(os.getenv('METRICS_MAX_LOG_MB', '16')) * 1024 * 1024)
+
+
+# Aggregates kept as maxima, exported as gauges
+RSS_GAUGES = {
+    'rss_mb': 'pipeline_span_rss_megabytes',
+    'process_peak_rss_mb': 'pipeline_span_process_peak_rss_megabytes'
+}
+
+
+def _children_cpu_seconds() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def _rss_mb() -> Optional[float]:
+    # Current resident memory (Linux), not the peak
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def _peak_rss_mb(children: bool = False) -> Optional[float]:
+    # Peak over the whole life of the process (or of its largest child)
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return usage.ru_maxrss * scale / (1024 * 1024)
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _empty_aggregates() -> dict:
+    return {'inode': None, 'offset': 0, 'spans': {}, 'counters': {}}
+
+
+class Metrics:
+    """
+    Spans and counters of the pipeline, appended as JSON lines to
+    `<root>/spans.jsonl` (shared by every process, e.g. the workers) and
+    aggregated into a Prometheus text file, `<root>/metrics.prom`.
+
+    The aggregates are kept in `<root>/aggregates.json` with the offset of
+    the log they cover, so each export only reads the lines logged since the
+    last one. Past `max_log_bytes` the folded log is rotated to
+    `spans.jsonl.1`, replacing the previous one.
+
+    A span records its wall time, CPU time of the process and of its child
+    processes (ffmpeg), the current RSS when it starts and ends, and the
+    peak RSS of the process so far (`process_peak_rss_mb`, which earlier
+    spans may have set). Code running inside a span adds its own figures
+    (audio seconds, tokens...) with `annotate`.
+    """
+
+    def __init__(self, root: str = METRICS_DIR, max_log_bytes: int = MAX_LOG_BYTES):
+        self.root = root
+        self.max_log_bytes = max_log_bytes
+        self.log_path = os.path.join(root, 'spans.jsonl')
+        self.prom_path = os.path.join(root, 'metrics.prom')
+        self.aggregates_path = os.path.join(root, 'aggregates.json')
+        self.lock_path = os.path.join(root, 'spans.lock')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        stack = self._stack()
+        record = {
+            'type': 'span',
+            'name': name,
+            'parent': stack[-1]['name'] if stack else None,
+            'pid': os.getpid(),
+            'started': time.time(),
+            'attributes': dict(attributes),
+            'error': None
+        }
+        stack.append(record)
+        wall, cpu, children = time.perf_counter(), time.process_time(), _children_cpu_seconds()
+        rss_start = _rss_mb()
+
+        try:
+            yield record['attributes']
+        except BaseException as e:
+            record['error'] = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            # Spans in generators may be closed out of order
+            stack[:] = [open_record for open_record in stack if open_record is not record]
+            record.update(
+                wall_seconds=time.perf_counter() - wall,
+                cpu_seconds=time.process_time() - cpu,
+                child_cpu_seconds=_children_cpu_seconds() - children,
+                rss_start_mb=rss_start,
+                rss_end_mb=_rss_mb(),
+                process_peak_rss_mb=_peak_rss_mb(),
+                process_child_peak_rss_mb=_peak_rss_mb(children=True)
+            )
+            self._write(record)
+
+    def annotate(self, **values):
+        """
+        Adds figures to the innermost span of this thread: numbers are
+        summed (so repeated calls accumulate), anything else is replaced.
+        Does nothing outside of a span.
+        """
+        stack = self._stack()
+        if not stack:
+            return
+
+        attributes = stack[-1]['attributes']
+        for key, value in values.items():
+            if _is_number(value):
+                attributes[key] = attributes.get(key, 0) + value
+            else:
+                attributes[key] = value
+
+    def count(self, name: str, value: float = 1, **labels):
+        self._write({
+            'type': 'counter',
+            'name': name,
+            'value': value,
+            'labels': labels,
+            'pid': os.getpid(),
+            'started': time.time()
+        })
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = False):
+        """
+        Cross-process lock on the span log: writers share it, folding and
+        rotating the log takes it exclusively.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.lock_path, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock, self._file_lock():
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def records(self, limit: Optional[int] = None) -> List[dict]:
+        """
+        The spans and counters of the current log, oldest first (the last
+        `limit`, read from the end of the file).
+        """
+        try:
+            with open(self.log_path, 'rb') as f:
+                lines = self._tail(f, limit) if limit else f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A line still being written by another process
+                continue
+        return records[-limit:] if limit else records
+
+    @staticmethod
+    def _tail(f, limit: int, block_size: int = 64 * 1024) -> List[bytes]:
+        end = f.seek(0, os.SEEK_END)
+        position, data = end, b''
+        while position > 0 and data.count(b'\n') <= limit:
+            position = max(0, position - block_size)
+            f.seek(position)
+            data = f.read(end - position)
+
+        lines = data.splitlines()
+        # The first line is cut unless the start of the file was reached
+        return lines[1:] if position > 0 else lines
+
+    def _load_aggregates(self) -> dict:
+        try:
+            with open(self.aggregates_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return _empty_aggregates()
+
+    def _save_aggregates(self, aggregates: dict):
+        tmp_path = f'{self.aggregates_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(aggregates, f, ensure_ascii=False)
+        os.replace(tmp_path, self.aggregates_path)
+
+    @staticmethod
+    def _fold(aggregates: dict, record: dict):
+        if record['type'] == 'counter':
+            key = json.dumps([record['name'], sorted(record['labels'].items())], ensure_ascii=False)
+            aggregates['counters'][key] = aggregates['counters'].get(key, 0) + record['value']
+            return
+
+        entry = aggregates['spans'].setdefault(record['name'], {
+            'runs': 0,
+            'errors': 0,
+            'wall_seconds': 0.0,
+            'cpu_seconds': 0.0,
+            'child_cpu_seconds': 0.0
+        })
+        entry['runs'] += 1
+        entry['errors'] += record['error'] is not None
+        for key in ('wall_seconds', 'cpu_seconds', 'child_cpu_seconds'):
+            entry[key] += record.get(key) or 0.0
+
+        # Older records and aggregates only have the process peak, as peak_rss_mb
+        process_peak = record.get('process_peak_rss_mb', record.get('peak_rss_mb'))
+        for key, value in (
+            ('rss_mb', max(record.get('rss_start_mb') or 0.0, record.get('rss_end_mb') or 0.0)),
+            ('process_peak_rss_mb', max(process_peak or 0.0, entry.pop('peak_rss_mb', 0.0)))
+        ):
+            entry[key] = max(entry.get(key, 0.0), value)
+
+        for key, value in record['attributes'].items():
+            if _is_number(value):
+                entry[key] = entry.get(key, 0) + value
+
+    def aggregate(self) -> dict:
+        """
+        Folds the records logged since the last call into the saved
+        aggregates and returns them; rotates the log once it is too big.
+        """
+        with self._lock, self._file_lock(exclusive=True):
+            aggregates = self._load_aggregates()
+            changed = False
+
+            try:
+                with open(self.log_path, 'rb') as f:
+                    inode = os.fstat(f.fileno()).st_ino
+                    if inode != aggregates['inode']:
+                        # A new log (first run, or rotated by an older version)
+                        aggregates.update(inode=inode, offset=0)
+                        changed = True
+
+                    f.seek(aggregates['offset'])
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break
+                        aggregates['offset'] += len(line)
+                        changed = True
+                        try:
+                            self._fold(aggregates, json.loads(line))
+                        except json.JSONDecodeError:
+                            continue
+            except FileNotFoundError:
+                pass
+
+            if aggregates['offset'] >= self.max_log_bytes:
+                os.replace(self.log_path, f'{self.log_path}.1')
+                aggregates.update(inode=None, offset=0)
+                changed = True
+
+            if changed:
+                self._save_aggregates(aggregates)
+            return aggregates
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Per span name: runs, errors, summed times/attributes, the largest
+        RSS at a span start or end and the largest process peak RSS.
+        """
+        return self.aggregate()['spans']
+
+    def export_prometheus(self) -> str:
+        """Writes the aggregated metrics in Prometheus text format."""
+        aggregates = self.aggregate()
+        spans = aggregates['spans']
+        lines = []
+
+        metric_keys = sorted({key for entry in spans.values() for key in entry})
+        for key in metric_keys:
+            if key in RSS_GAUGES:
+                metric, kind = RSS_GAUGES[key], 'gauge'
+            else:
+                metric, kind = f'pipeline_span_{_metric_name(key)}_total', 'counter'
+
+            lines.append(f'# TYPE {metric} {kind}')
+            for name, entry in sorted(spans.items()):
+                if key in entry:
+                    lines.append(f'{metric}{{span="{_label_value(name)}"}} {entry[key]}')
+
+        counters = {}
+        for key, value in aggregates['counters'].items():
+            name, labels = json.loads(key)
+            counters[(name, tuple(map(tuple, labels)))] = value
+
+        for name in sorted({name for name, _ in counters}):
+            metric = f'{_metric_name(name)}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    label_text = ','.join(f'{k}="{_label_value(v)}"' for k, v in labels)
+                    lines.append(f'{metric}{{{label_text}}} {value}' if label_text else f'{metric} {value}')
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f'{self.prom_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.prom_path)
+        return self.prom_path
+
+
+metrics = Metrics()
@@ -0,0 +1,356 @@
+import os
+import re
+import time
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from core.meeting_store import MEETING_SUFFIX, MeetingFile
+
+
+CATALOG_DB = 'meetings.db'
+
+# Kinds of indexed entries: the dialog turns and the knowledge sections
+TURN = 'turn'
+SUMMARY = 'summary'
+TASK = 'task'
+DECISION = 'decision'
+TOPIC = 'topic'
+NEXT_STEP = 'next_step'
+QUESTION = 'question'
+RISK = 'risk'
+
+ENTRY_KINDS = [TURN, SUMMARY, TASK, DECISION, TOPIC, NEXT_STEP, QUESTION, RISK]
+
+
+@dataclass
+class MeetingEntry:
+    id: str
+    path: str
+    video_path: Optional[str]
+    duration: Optional[float]
+    speakers: int
+    turns: int
+    summary: str
+    created_at: float
+    updated_at: float
+
+
+@dataclass
+class SearchHit:
+    meeting_id: str
+    kind: str
+    person: Optional[str]
+    start_time: Optional[float]
+    end_time: Optional[float]
+    text: str
+    snippet: str
+
+
+def knowledge_entries(knowledge) -> List[Tuple[str, Optional[str], str]]:
+    """(kind, person, text) of everything the agent extracted worth searching."""
+    if not isinstance(knowledge, dict):
+        return []
+
+    def items(key):
+        return [item for item in knowledge.get(key) or [] if isinstance(item, dict)]
+
+    entries = []
+    if knowledge.get('summarization'):
+        entries.append((SUMMARY, None, str(knowledge['summarization'])))
+    for task in items('tasks_per_speaker'):
+        deadline = f" (deadline: {task['deadline']})" if task.get('deadline') else ''
+        entries.append((TASK, task.get('assigned_to'), f"{task.get('task_description', '')}{deadline}"))
+    for decision in items('key_decisions'):
+        entries.append((DECISION, decision.get('responsible_party'), decision.get('decision_description', '')))
+    for topic in items('topics'):
+        entries.append((TOPIC, None, f"{topic.get('topic_name', '')}: {topic.get('brief_overview', '')}"))
+    for step in items('next_steps'):
+        entries.append((NEXT_STEP, step.get('assigned_to'), step.get('action', '')))
+    for pair in items('questions_answers'):
+        entries.append((QUESTION, None, f"{pair.get('question', '')} {pair.get('answer', '')}"))
+    for risk in items('risks_issues'):
+        entries.append((RISK, None, risk.get('risk_issue_description', '')))
+    return entries
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _phrase(value: str) -> str:
+    return '"{}"'.format(value.replace('"', '""'))
+
+
+def _match_expression(
+    query: str,
+    kind: Optional[str] = None,
+    person: Optional[str] = None,
+    meeting_id: Optional[str] = None
+) -> str:
+    # Every word is matched as a prefix of the text or person, quoted to
+    # escape FTS syntax
+    terms = ' '.join(f'{_phrase(word)}*' for word in query.split())
+    expression = f'{{text person}} : ({terms})'
+    if kind is not None:
+        expression += f' AND kind : {_phrase(kind)}'
+    if person:
+        expression += f' AND person : {_phrase(person)}*'
+    if meeting_id is not None:
+        expression += f' AND meeting_id : ^{_phrase(meeting_id)}'
+    return expression
+
+
+def snippet(text: str, query: str, words: int = 16) -> str:
+    """
+    Up to `words` words of `text` around the first word starting with a
+    query word, the matches in bold.
+    """
+    tokens = text.split()
+    prefixes = [word.lower() for word in re.findall(r'\w+', query)]
+
+    def matches(token):
+        token = re.sub(r'^\W+', '', token).lower()
+        return any(token.startswith(prefix) for prefix in prefixes)
+
+    first = next((i for i, token in enumerate(tokens) if matches(token)), 0)
+    start = max(0, min(first - words // 2, len(tokens) - words))
+    window = [f'**{token}**' if matches(token) else token for token in tokens[start:start + words]]
+    return ('… ' if start > 0 else '') + ' '.join(window) + (' …' if start + words < len(tokens) else '')
+
+
+class MeetingCatalog:
+    """
+    SQLite index of the stored meetings, written when a meeting is saved
+    and queried by the app: every dialog turn (with its speaker and times)
+    and every knowledge item (summary, tasks, decisions, topics...) is an
+    entry, searched with FTS5 (or LIKE when the SQLite build lacks it), so
+    finding "tasks assigned to Ana" never opens a meeting file.
+
+    Meetings are identified by their file name in `meetings/`.
+    """
+
+    def __init__(self, db_path: str = CATALOG_DB):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS meetings (
+                    id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    video_path TEXT,
+                    duration REAL,
+                    speakers INTEGER NOT NULL DEFAULT 0,
+                    turns INTEGER NOT NULL DEFAULT 0,
+                    summary TEXT NOT NULL DEFAULT '',
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    meeting_id TEXT NOT NULL REFERENCES meetings (id),
+                    kind TEXT NOT NULL,
+                    person TEXT COLLATE NOCASE,
+                    start_time REAL,
+                    end_time REAL,
+                    text TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_meeting ON entries (meeting_id, start_time)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_kind ON entries (kind, person)')
+            conn.execute('CREATE INDEX IF NOT EXISTS meetings_updated ON meetings (updated_at)')
+
+            try:
+                # External content index, kept in sync by triggers. Kind and
+                # meeting are indexed too, so filters narrow the match itself
+                conn.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (
+                        text, person, kind, meeting_id, content='entries', content_rowid='id'
+                    )
+                ''')
+                conn.executescript('''
+                    CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN
+                        INSERT INTO entries_fts (rowid, text, person, kind, meeting_id)
+                        VALUES (new.id, new.text, new.person, new.kind, new.meeting_id);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON entries BEGIN
+                        INSERT INTO entries_fts (entries_fts, rowid, text, person, kind, meeting_id)
+                        VALUES ('delete', old.id, old.text, old.person, old.kind, old.meeting_id);
+                    END;
+                ''')
+                self.full_text = True
+            except sqlite3.OperationalError:
+                self.full_text = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def meeting_id(path: str) -> str:
+        return os.path.basename(path)
+
+    def index_meeting(self, path: str, meeting=None) -> str:
+        """
+        (Re)indexes the meeting stored at `path` (`meeting` may be passed
+        when already in memory) and returns its id.
+        """
+        meeting = meeting or MeetingFile(path)
+        meeting_id = self.meeting_id(path)
+        knowledge = meeting.knowledge if isinstance(meeting.knowledge, dict) else {}
+        turns = list(meeting.speakers_dialog)
+        now = time.time()
+
+        rows = [
+            (meeting_id, TURN, turn.speaker, turn.start_time, turn.end_time, turn.text)
+            for turn in turns if turn.text
+        ]
+        rows += [
+            (meeting_id, kind, person, None, None, text)
+            for kind, person, text in knowledge_entries(knowledge) if text
+        ]
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                INSERT INTO meetings (id, path, video_path, duration, speakers, turns, summary, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    path = excluded.path,
+                    video_path = excluded.video_path,
+                    duration = excluded.duration,
+                    speakers = excluded.speakers,
+                    turns = excluded.turns,
+                    summary = excluded.summary,
+                    updated_at = excluded.updated_at
+            ''', (
+                meeting_id, path, meeting.video_path,
+                max((turn.end_time for turn in turns), default=None),
+                len({turn.speaker for turn in turns}), len(turns),
+                str(knowledge.get('summarization') or ''), now, now
+            ))
+            conn.execute('DELETE FROM entries WHERE meeting_id = ?', (meeting_id,))
+            conn.executemany('''
+                INSERT INTO entries (meeting_id, kind, person, start_time, end_time, text)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return meeting_id
+
+    def get_meeting(self, meeting_id: str) -> Optional[MeetingEntry]:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM meetings WHERE id = ?', (meeting_id,)).fetchone()
+        return MeetingEntry(**dict(row)) if row else None
+
+    def list_meetings(self, limit: int = 100, offset: int = 0) -> List[MeetingEntry]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT * FROM meetings ORDER BY updated_at DESC LIMIT ? OFFSET ?', (limit, offset)
+            ).fetchall()
+        return [MeetingEntry(**dict(row)) for row in rows]
+
+    def search(
+        self,
+        query: str = '',
+        kind: Optional[str] = None,
+        person: Optional[str] = None,
+        meeting_id: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Tuple[List[SearchHit], int]:
+        """
+        One page of entries matching `query` (over their text and person),
+        optionally of one `kind`, for one `person` (prefix, case
+        insensitive) and/or in one meeting, best matches first, and the
+        total number of matches. Turn hits carry their start time, to open
+        the meeting right there.
+        """
+        query = query.strip()
+        conditions, params = [], []
+        if kind is not None:
+            conditions.append('e.kind = ?')
+            params.append(kind)
+        if person:
+            conditions.append("e.person LIKE ? ESCAPE '\\'")
+            params.append('{}%'.format(_escape_like(person)))
+        if meeting_id is not None:
+            conditions.append('e.meeting_id = ?')
+            params.append(meeting_id)
+
+        if query and self.full_text:
+            # The filters are repeated in the match, so only their matches are
+            # ranked; the entries_fts index drives the join (not one full-text
+            # query per candidate row)
+            source = 'entries_fts CROSS JOIN entries e ON e.id = entries_fts.rowid'
+            conditions.insert(0, 'entries_fts MATCH ?')
+            params.insert(0, _match_expression(query, kind, person, meeting_id))
+            order_by = 'entries_fts.rank'
+        else:
+            source = 'entries e'
+            if query:
+                conditions.append("(e.text LIKE ? ESCAPE '\\' OR e.person LIKE ? ESCAPE '\\')")
+                pattern = '%{}%'.format(_escape_like(query))
+                params.extend([pattern, pattern])
+            order_by = 'e.meeting_id, e.start_time, e.id'
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with closing(self._connect()) as conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM {source} {where}', params).fetchone()[0]
+            rows = conn.execute(
+                f'''
+                SELECT e.meeting_id, e.kind, e.person, e.start_time, e.end_time, e.text
+                FROM {source} {where}
+                ORDER BY {order_by} LIMIT ? OFFSET ?
+                ''',
+                (*params, limit, offset)
+            ).fetchall()
+        return [SearchHit(**dict(row), snippet=snippet(row['text'], query)) for row in rows], total
+
+    def remove_meeting(self, meeting_id: str):
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM entries WHERE meeting_id = ?', (meeting_id,))
+            conn.execute('DELETE FROM meetings WHERE id = ?', (meeting_id,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def import_folder(self, folder: str = 'meetings') -> int:
+        """
+        Indexes the stored meetings of `folder` missing from the catalog
+        (e.g. saved before it existed) and drops the ones whose file is
+        gone. Returns how many were indexed.
+        """
+        if not os.path.isdir(folder):
+            return 0
+
+        with closing(self._connect()) as conn:
+            known = {row['id']: row['path'] for row in conn.execute('SELECT id, path FROM meetings')}
+        for meeting_id, path in known.items():
+            if not os.path.exists(path):
+                self.remove_meeting(meeting_id)
+
+        imported = 0
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith(MEETING_SUFFIX) or name in known:
+                continue
+            try:
+                self.index_meeting(os.path.join(folder, name))
+                imported += 1
+            except Exception as e:
+                print(f'Could not index {name}: {e}')
+        return imported
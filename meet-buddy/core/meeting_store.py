@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import struct
+import zipfile
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from models.speaker import SpeakerOutput, Meeting
+
+
+SCHEMA_VERSION = 1
+MEETING_SUFFIX = '.meeting'
+
+TURN_ARRAYS = ('start', 'end', 'speaker', 'text_offsets', 'text')
+
+
+def meeting_path(video_name: str, folder: str = 'meetings') -> str:
+    return os.path.join(folder, f'{video_name}{MEETING_SUFFIX}')
+
+
+def _write_json(archive: zipfile.ZipFile, name: str, value):
+    archive.writestr(name, json.dumps(value, ensure_ascii=False, default=str))
+
+
+def _write_array(archive: zipfile.ZipFile, name: str, array: np.ndarray):
+    with archive.open(f'{name}.npy', 'w', force_zip64=True) as f:
+        np.lib.format.write_array(f, np.ascontiguousarray(array), allow_pickle=False)
+
+
+def save_meeting(meeting: Meeting, path: str):
+    """
+    Writes `meeting` as an uncompressed zip of independent sections:
+
+        meta.json       schema version, paths, speaker labels, turn count
+        knowledge.json  what the agent extracted
+        turns/*.npy     the speaker turns as columns: start, end, speaker
+                        (index into the labels) and text offsets into one
+                        UTF-8 blob
+
+    Written aside and renamed, so readers never see half a file.
+    """
+    turns = list(meeting.speakers_dialog)
+    speakers = sorted({turn.speaker or '' for turn in turns})
+    codes = {speaker: i for i, speaker in enumerate(speakers)}
+
+    encoded = [(turn.text or '').encode('utf-8') for turn in turns]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    meta = {
+        'schema_version': SCHEMA_VERSION,
+        'created': time.time(),
+        'audio_path': meeting.audio_path,
+        'video_path': meeting.video_path,
+        'speakers': speakers,
+        'turns': len(turns),
+        'duration': max((turn.end_time for turn in turns), default=0.0),
+    }
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        _write_json(archive, 'meta.json', meta)
+        _write_json(archive, 'knowledge.json', meeting.knowledge)
+        _write_array(archive, 'turns/start', np.array([t.start_time for t in turns], dtype=np.float64))
+        _write_array(archive, 'turns/end', np.array([t.end_time for t in turns], dtype=np.float64))
+        _write_array(archive, 'turns/speaker', np.array([codes[t.speaker or ''] for t in turns], dtype=np.int32))
+        _write_array(archive, 'turns/text_offsets', offsets)
+        _write_array(archive, 'turns/text', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    os.replace(tmp_path, path)
+
+
+def _spoken_before(times: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    # Sum of (edge - time) over the sorted `times` before each edge
+    counts = np.searchsorted(times, edges, side='left')
+    prefix = np.concatenate(([0.0], np.cumsum(times, dtype=np.float64)))
+    return counts * edges - prefix[counts]
+
+
+class MeetingTurns:
+    """
+    Read-only sequence of the speaker turns of a stored meeting, backed by
+    memory-mapped columns: a SpeakerOutput is only built for the turns
+    actually accessed.
+    """
+
+    def __init__(self, arrays: dict, speakers: List[str]):
+        self.start = arrays['start']
+        self.end = arrays['end']
+        self.speaker_codes = arrays['speaker']
+        self._offsets = arrays['text_offsets']
+        self._text = arrays['text']
+        self.speakers = speakers
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def text(self, i: int) -> str:
+        return bytes(self._text[self._offsets[i]:self._offsets[i + 1]]).decode('utf-8')
+
+    def speaker(self, i: int) -> Optional[str]:
+        return self.speakers[self.speaker_codes[i]] or None
+
+    def __getitem__(self, i: int) -> SpeakerOutput:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return SpeakerOutput(
+            speaker=self.speaker(i),
+            start_time=float(self.start[i]),
+            end_time=float(self.end[i]),
+            text=self.text(i)
+        )
+
+    def __iter__(self) -> Iterator[SpeakerOutput]:
+        return (self[i] for i in range(len(self)))
+
+    def talk_time(self, bin_seconds: float = 60.0) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """
+        Seconds each speaker talks in every `bin_seconds` window, as a
+        (windows, speakers) array and the speaker of each column. Computed
+        from the time columns alone, no turn (nor its text) is built.
+        """
+        last = float(self.end.max()) if len(self) else 0.0
+        edges = np.arange(int(last // bin_seconds) + 2, dtype=np.float64) * bin_seconds
+
+        columns, speakers = [], []
+        for code, label in enumerate(self.speakers):
+            mask = self.speaker_codes == code
+            if not mask.any():
+                continue
+            # Talk before t: sum of (t - start) minus sum of (t - end), over the turns begun
+            spoken = _spoken_before(np.sort(self.start[mask]), edges) - _spoken_before(np.sort(self.end[mask]), edges)
+            columns.append(np.diff(spoken))
+            speakers.append(label or None)
+
+        table = np.stack(columns, axis=1) if columns else np.zeros((len(edges) - 1, 0))
+        return table, speakers
+
+    def between(self, start: float, end: float) -> List[SpeakerOutput]:
+        """The turns starting in [start, end), found by binary search."""
+        lo = int(np.searchsorted(self.start, start, side='left'))
+        hi = int(np.searchsorted(self.start, end, side='left'))
+        return [self[i] for i in range(lo, hi)]
+
+
+class MeetingFile:
+    """
+    Lazy view of a stored meeting: each section (meta, knowledge, turns)
+    is read the first time it is accessed, and the turn columns are memory
+    mapped, so rendering a summary never loads the dialog.
+
+    Exposes the attributes of Meeting (`knowledge`, `speakers_dialog`,
+    `audio_path`, `video_path`), so it can be used in its place.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._meta = None
+        self._knowledge = None
+        self._turns = None
+
+    def _read_json(self, name: str):
+        with zipfile.ZipFile(self.path) as archive:
+            return json.loads(archive.read(name).decode('utf-8'))
+
+    @property
+    def meta(self) -> dict:
+        if self._meta is None:
+            meta = self._read_json('meta.json')
+            if meta.get('schema_version', 0) > SCHEMA_VERSION:
+                raise ValueError(
+                    f"{self.path}: meeting schema {meta['schema_version']} is newer than {SCHEMA_VERSION}"
+                )
+            self._meta = meta
+        return self._meta
+
+    @property
+    def knowledge(self):
+        if self._knowledge is None:
+            self._knowledge = self._read_json('knowledge.json')
+        return self._knowledge
+
+    @property
+    def speakers_dialog(self) -> MeetingTurns:
+        if self._turns is None:
+            self._turns = MeetingTurns(self._map_turns(), self.meta['speakers'])
+        return self._turns
+
+    @property
+    def audio_path(self) -> Optional[str]:
+        return self.meta['audio_path']
+
+    @property
+    def video_path(self) -> Optional[str]:
+        return self.meta['video_path']
+
+    def _map_turns(self) -> dict:
+        arrays = {}
+        with zipfile.ZipFile(self.path) as archive, open(self.path, 'rb') as f:
+            for name in TURN_ARRAYS:
+                info = archive.getinfo(f'turns/{name}.npy')
+
+                # The member data follows its local header, name and extra field
+                f.seek(info.header_offset + 26)
+                name_length, extra_length = struct.unpack('<HH', f.read(4))
+                f.seek(info.header_offset + 30 + name_length + extra_length)
+
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+                if int(np.prod(shape)) == 0:
+                    arrays[name] = np.empty(shape, dtype=dtype)
+                else:
+                    arrays[name] = np.memmap(
+                        self.path, dtype=dtype, mode='r', shape=shape,
+                        order='F' if fortran_order else 'C', offset=f.tell()
+                    )
+        return arrays
+
+    def to_meeting(self) -> Meeting:
+        """Loads every section into a plain Meeting."""
+        return Meeting(
+            speakers_dialog=list(self.speakers_dialog),
+            audio_path=self.audio_path,
+            video_path=self.video_path,
+            knowledge=self.knowledge
+        )
+
+
+def migrate_pickle(pickle_path: str, remove: bool = False) -> str:
+    """Converts a Meeting pickled by Meeting.save into the sectioned format."""
+    path = f'{pickle_path[:-len(".pkl")]}{MEETING_SUFFIX}'
+    save_meeting(Meeting.load(pickle_path), path)
+    if remove:
+        os.remove(pickle_path)
+    return path
+
+
+def migrate_folder(folder: str = 'meetings', remove: bool = False) -> List[str]:
+    """Migrates the pickled meetings of `folder` that have no converted file yet."""
+    if not os.path.isdir(folder):
+        return []
+
+    migrated = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith('.pkl'):
+            continue
+        pickle_path = os.path.join(folder, name)
+        if os.path.exists(f'{pickle_path[:-len(".pkl")]}{MEETING_SUFFIX}'):
+            continue
+        try:
+            migrated.append(migrate_pickle(pickle_path, remove=remove))
+        except Exception as e:
+            print(f'Could not migrate {pickle_path}: {e}')
+    return migrated
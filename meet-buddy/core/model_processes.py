@@ -0,0 +1,205 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.speaker import SpeakerOutput
+
+
+def thread_budgets(
+    diarization_threads: Optional[int] = None,
+    transcription_threads: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Splits the CPUs between pyannote and Whisper, half each by default,
+    so their torch intra-op pools together never exceed the core count.
+    """
+    cpus = os.cpu_count() or 1
+    diarization_threads = diarization_threads or max(1, cpus // 2)
+    transcription_threads = transcription_threads or max(1, cpus - diarization_threads)
+    return diarization_threads, transcription_threads
+
+
+@dataclass
+class SharedAudio:
+    """
+    Picklable handle to a decoded 16kHz float32 buffer that worker
+    processes map instead of receiving a copy: the memory-mapped file
+    decode_audio spilled it to, or a shared memory block.
+    """
+    length: int
+    path: Optional[str] = None
+    shm_name: Optional[str] = None
+
+    @classmethod
+    def share(cls, audio: np.ndarray) -> Tuple['SharedAudio', Optional[SharedMemory]]:
+        """The handle of `audio` and, when it had to be copied, the block to unlink."""
+        if (
+            isinstance(audio, np.memmap) and audio.filename and audio.offset == 0
+            and audio.dtype == np.float32 and audio.flags.c_contiguous
+        ):
+            return cls(len(audio), path=audio.filename), None
+
+        shm = SharedMemory(create=True, size=max(audio.nbytes, 1))
+        np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+        return cls(len(audio), shm_name=shm.name), shm
+
+    @contextmanager
+    def open(self, track: bool = True):
+        """
+        Maps the buffer. Spawned workers share their parent's resource
+        tracker, which unlinks the block once the parent releases it;
+        unrelated processes (e.g. the model server) pass `track=False` so
+        their own tracker never unlinks a block they don't own.
+        """
+        if self.path is not None:
+            # Copy-on-write, like decode_audio's own mapping
+            yield np.memmap(self.path, dtype=np.float32, mode="c", shape=(self.length,))
+            return
+
+        try:
+            shm = SharedMemory(name=self.shm_name, track=track)
+        except TypeError:
+            # Python < 3.13 always registers attached blocks
+            shm = SharedMemory(name=self.shm_name)
+            if not track:
+                resource_tracker.unregister(shm._name, "shared_memory")
+        try:
+            yield np.ndarray((self.length,), dtype=np.float32, buffer=shm.buf)
+        finally:
+            try:
+                shm.close()
+            except BufferError:
+                # Still viewed by a model's tensors, unmapped once they are collected
+                pass
+
+
+def _init_worker(threads: int):
+    # Set before torch is imported, so OpenMP/MKL pools get the budget too
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already set by an earlier import in this process
+        pass
+
+
+def _run(audio: SharedAudio, method: str, options: dict):
+    from core.speaker_diarization import SpeakerDiarization
+    with audio.open() as samples:
+        return getattr(SpeakerDiarization(), method)(samples, **options)
+
+
+# One worker per (method, thread budget), kept for the life of the app so
+# its model stays loaded between meetings
+_workers: Dict[Tuple[str, int], ProcessPoolExecutor] = {}
+_workers_lock = threading.Lock()
+
+
+def _worker(method: str, threads: int) -> ProcessPoolExecutor:
+    with _workers_lock:
+        key = (method, threads)
+        if key not in _workers:
+            # spawn avoids forking a parent that already holds torch threads
+            _workers[key] = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,)
+            )
+        return _workers[key]
+
+
+def shutdown_workers():
+    """Stops the warm workers (and unloads their models)."""
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for executor in workers:
+        executor.shutdown()
+
+
+class ModelProcesses:
+    """
+    Runs pyannote and Whisper each in its own spawned process, limited to
+    its thread budget, over one decoded buffer shared with both: instead of
+    two torch pools fighting for the cores (and the GIL) in the app process,
+    diarization and transcription really run side by side, and only their
+    results come back to be aligned.
+
+    The two workers are spawned on first use and reused by every later call
+    (of any instance with the same budgets), so each model is loaded once;
+    a worker that dies is replaced on the next call. To share warm models
+    between app sessions and with other apps, use the ModelServer instead.
+
+    Meant to be called from two threads at once (e.g. two StageGraph
+    stages). The buffer is shared on the first call and released when no
+    call is running anymore.
+    """
+
+    def __init__(
+        self,
+        diarization_threads: Optional[int] = None,
+        transcription_threads: Optional[int] = None
+    ):
+        self.diarization_threads, self.transcription_threads = thread_budgets(
+            diarization_threads, transcription_threads
+        )
+        self._lock = threading.Lock()
+        self._users = 0
+        self._source = None
+        self._shared = None
+        self._shm = None
+
+    def _acquire(self, audio: np.ndarray) -> SharedAudio:
+        with self._lock:
+            if self._users and self._source is not audio:
+                raise ValueError("ModelProcesses is already sharing another audio buffer")
+            if not self._users:
+                self._shared, self._shm = SharedAudio.share(audio)
+                self._source = audio
+            self._users += 1
+            return self._shared
+
+    def _release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users:
+                return
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+            self._source = self._shared = self._shm = None
+
+    def _call(self, threads: int, audio: np.ndarray, method: str, **options):
+        shared = self._acquire(audio)
+        executor = _worker(method, threads)
+        try:
+            return executor.submit(_run, shared, method, options).result()
+        except BrokenProcessPool:
+            # e.g. killed when out of memory: the next call spawns a new one
+            with _workers_lock:
+                if _workers.get((method, threads)) is executor:
+                    del _workers[(method, threads)]
+            raise
+        finally:
+            self._release()
+
+    def diarize(self, audio: np.ndarray) -> List[SpeakerOutput]:
+        return self._call(self.diarization_threads, audio, "diarize")
+
+    def transcribe_segments(self, audio: np.ndarray, word_timestamps: bool = False) -> List[dict]:
+        return self._call(
+            self.transcription_threads, audio, "transcribe_segments", word_timestamps=word_timestamps
+        )
@@ -0,0 +1,171 @@
+import gc
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Hashable, Optional
+
+import whisper
+
+
+DEFAULT_MEMORY_BUDGET_MB = float(os.getenv("MODEL_REGISTRY_BUDGET_MB", "4096"))
+
+
+@dataclass
+class RegistryStats:
+    loads: int = 0
+    hits: int = 0
+    evictions: int = 0
+
+
+def estimate_model_size_mb(model: Any) -> float:
+    """
+    Estimates the memory used by a torch model by summing the size of its
+    parameters and buffers. Objects that are not torch modules count as 0.
+    """
+    total = 0
+    for attr in ("parameters", "buffers"):
+        tensors = getattr(model, attr, None)
+        if callable(tensors):
+            total += sum(t.numel() * t.element_size() for t in tensors())
+    return total / (1024 * 1024)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models.
+
+    Models are kept warm across calls (and Streamlit reruns, since the module
+    is imported only once per server process). When the estimated memory of
+    the loaded models goes over `memory_budget_mb`, the least recently used
+    ones are evicted.
+    """
+
+    def __init__(self, memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB):
+        self.memory_budget_mb = memory_budget_mb
+        self.stats = RegistryStats()
+        self._models = OrderedDict()  # key -> (model, size_mb)
+        self._lock = threading.RLock()
+
+    def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        size_mb: Optional[float] = None
+    ) -> Any:
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.stats.hits += 1
+                return self._models[key][0]
+
+            model = loader()
+            if size_mb is None:
+                size_mb = estimate_model_size_mb(model)
+
+            self._models[key] = (model, size_mb)
+            self.stats.loads += 1
+            self._evict(keep=key)
+            return model
+
+    def set_memory_budget(self, memory_budget_mb: float):
+        with self._lock:
+            self.memory_budget_mb = memory_budget_mb
+            self._evict()
+
+    def memory_used_mb(self) -> float:
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def clear(self):
+        with self._lock:
+            self.stats.evictions += len(self._models)
+            self._models.clear()
+        gc.collect()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "memory_used_mb": self.memory_used_mb(),
+                "memory_budget_mb": self.memory_budget_mb,
+                "models": [str(key) for key in self._models],
+            }
+
+    def _evict(self, keep: Optional[Hashable] = None):
+        evicted = False
+        while self.memory_used_mb() > self.memory_budget_mb:
+            candidates = [key for key in self._models if key != keep]
+            if not candidates:
+                # A single model bigger than the budget is kept anyway
+                break
+            self._models.pop(candidates[0])
+            self.stats.evictions += 1
+            evicted = True
+
+        if evicted:
+            gc.collect()
+
+
+registry = ModelRegistry()
+
+
+def default_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def get_whisper_model(
+    name: str = "base",
+    device: Optional[str] = None,
+    compute_type: str = "float32"
+):
+    """
+    Returns a warm Whisper model from the registry, loading it on first use.
+    `compute_type="float16"` converts the weights to half precision, which
+    only pays off on CUDA devices.
+    """
+    device = device or default_device()
+
+    def loader():
+        model = whisper.load_model(name, device=device)
+        if compute_type == "float16":
+            model = model.half()
+        return model
+
+    return registry.get(("whisper", name, device, compute_type), loader)
+
+
+def registry_stats() -> dict:
+    return registry.snapshot()
+
+
+# pyannote pipelines are not torch modules, so their size has to be hinted
+PYANNOTE_PIPELINE_SIZE_MB = 300.0
+
+
+def get_diarization_pipeline(
+    name: str = "pyannote/speaker-diarization-3.1",
+    device: str = "cpu",
+    auth_token: Optional[str] = None
+):
+    """
+    Returns a warm pyannote pipeline from the registry, loading it on first use.
+    """
+
+    def loader():
+        import torch
+        from pyannote.audio import Pipeline
+
+        pipeline = Pipeline.from_pretrained(
+            name,
+            use_auth_token=auth_token or os.getenv("HF_ACCESS_KEY")
+        )
+        pipeline.to(torch.device(device))
+        return pipeline
+
+    return registry.get(
+        ("pyannote", name, device, "float32"),
+        loader,
+        size_mb=PYANNOTE_PIPELINE_SIZE_MB
+    )
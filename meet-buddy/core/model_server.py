@@ -0,0 +1,303 @@
+import os
+import sys
+import stat
+import time
+import queue
+import secrets
+import tempfile
+import threading
+import subprocess
+from contextlib import closing
+from dataclasses import dataclass, field
+from multiprocessing.connection import Client, Listener
+from typing import Any, List, Optional
+
+import numpy as np
+
+from core.model_processes import SharedAudio
+from core.instrumentation import metrics
+from models.speaker import SpeakerOutput
+
+
+# Per-user directory (0700) holding the socket and the authkey file (0600)
+RUNTIME_DIR = os.getenv(
+    "MODEL_SERVER_DIR",
+    os.path.join(os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"meet-buddy-{os.getuid()}")
+)
+STARTUP_TIMEOUT_SECONDS = 30.0
+
+# Requests each model answers, one at a time
+MODEL_OPS = {"diarize": "pyannote", "transcribe_segments": "whisper"}
+
+
+def _check_private(path: str, mode: int):
+    # Refuses anything another user created or can read (e.g. squatted in /tmp)
+    info = os.lstat(path)
+    if info.st_uid != os.getuid() or stat.S_ISLNK(info.st_mode) or info.st_mode & 0o077:
+        raise PermissionError(
+            f"{path} must be owned by the current user with mode {oct(mode)} "
+            f"(found uid {info.st_uid}, mode {oct(stat.S_IMODE(info.st_mode))})"
+        )
+
+
+def runtime_dir() -> str:
+    os.makedirs(RUNTIME_DIR, mode=0o700, exist_ok=True)
+    _check_private(RUNTIME_DIR, 0o700)
+    return RUNTIME_DIR
+
+
+def default_socket_path() -> str:
+    return os.getenv("MODEL_SERVER_SOCKET") or os.path.join(runtime_dir(), "models.sock")
+
+
+def load_authkey() -> bytes:
+    """
+    The random key authenticating both ends of every connection, created on
+    first use. multiprocessing connections unpickle what they receive, so
+    the key must never be guessable.
+    """
+    directory = runtime_dir()
+    path = os.path.join(directory, "authkey")
+    if not os.path.exists(path):
+        # Written aside and linked into place, so it is never seen half written
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".authkey-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_bytes(32))
+            os.link(tmp_path, path)
+        except FileExistsError:
+            # Created meanwhile by the server or another session
+            pass
+        finally:
+            os.remove(tmp_path)
+
+    _check_private(path, 0o600)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _rss_mb() -> Optional[float]:
+    # Current resident memory (Linux), not the peak
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+@dataclass
+class _Job:
+    op: str
+    audio: SharedAudio
+    options: dict
+    queued: float = field(default_factory=time.time)
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[str] = None
+
+
+class ModelServer:
+    """
+    Long-lived process holding pyannote and Whisper warm for every
+    Streamlit session, reached over a Unix socket (multiprocessing
+    connections) in the user's private RUNTIME_DIR, both ends proving they
+    hold the random key of load_authkey. Each model has its own queue and worker thread, so
+    requests for one model are served one at a time while diarization and
+    transcription of a meeting still overlap. Audio is passed as a
+    SharedAudio handle, never copied through the socket.
+
+    `status` requests are answered right away, with the queue depths and
+    the memory of the loaded models.
+
+        python -m core.model_server
+    """
+
+    def __init__(self, address: Optional[str] = None, authkey: Optional[bytes] = None):
+        self.address = address or default_socket_path()
+        self.authkey = authkey or load_authkey()
+        self.started = time.time()
+        self.queues = {model: queue.Queue() for model in MODEL_OPS.values()}
+        self.running = {model: None for model in MODEL_OPS.values()}
+        self.served = {model: 0 for model in MODEL_OPS.values()}
+        self.loaded = {model: False for model in MODEL_OPS.values()}
+        self._lock = threading.Lock()
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            if ModelServerClient(self.address, self.authkey).available():
+                print(f"A model server is already listening on {self.address}")
+                return
+            # Left behind by a server that died
+            os.remove(self.address)
+
+        # Listening before the models load, so clients can wait on status
+        with Listener(self.address, family="AF_UNIX", authkey=self.authkey) as listener:
+            for model in self.queues:
+                threading.Thread(target=self._work, args=(model,), daemon=True).start()
+            print(f"Model server listening on {self.address}")
+
+            while True:
+                try:
+                    conn = listener.accept()
+                except OSError as e:
+                    # e.g. a client with the wrong authkey
+                    print(f"Rejected a connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _load(self, model: str) -> Optional[str]:
+        from core.speaker_diarization import SpeakerDiarization
+        try:
+            with metrics.span(f"model-server.load.{model}"):
+                if model == "pyannote":
+                    SpeakerDiarization().pipeline
+                else:
+                    SpeakerDiarization().whisper_model
+        except Exception as e:
+            print(f"Could not load {model}: {e}")
+            return f"{type(e).__name__}: {e}"
+
+        with self._lock:
+            self.loaded[model] = True
+        return None
+
+    def _work(self, model: str):
+        from core.speaker_diarization import SpeakerDiarization
+        load_error = self._load(model)
+
+        while True:
+            job = self.queues[model].get()
+            if load_error is not None:
+                # Fail fast instead of leaving the client waiting
+                job.error = load_error
+                job.done.set()
+                continue
+
+            with self._lock:
+                self.running[model] = job.op
+            try:
+                with metrics.span(f"model-server.{job.op}", queue_seconds=time.time() - job.queued):
+                    with job.audio.open(track=False) as samples:
+                        job.result = getattr(SpeakerDiarization(), job.op)(samples, **job.options)
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+            finally:
+                with self._lock:
+                    self.running[model] = None
+                    self.served[model] += 1
+                job.done.set()
+
+    def _handle(self, conn):
+        with closing(conn):
+            try:
+                request = conn.recv()
+            except EOFError:
+                return
+
+            op = request.get("op")
+            if op == "status":
+                conn.send({"ok": True, "result": self.status()})
+            elif op in MODEL_OPS:
+                job = _Job(op, request["audio"], request.get("options", {}))
+                self.queues[MODEL_OPS[op]].put(job)
+                job.done.wait()
+                if job.error is None:
+                    conn.send({"ok": True, "result": job.result})
+                else:
+                    conn.send({"ok": False, "error": job.error})
+            else:
+                conn.send({"ok": False, "error": f"Unknown request: {op}"})
+
+    def status(self) -> dict:
+        from core.model_registry import registry_stats
+        with self._lock:
+            models = {
+                model: {
+                    "loaded": self.loaded[model],
+                    "queued": self.queues[model].qsize(),
+                    "running": self.running[model],
+                    "served": self.served[model],
+                }
+                for model in self.queues
+            }
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": time.time() - self.started,
+            "queue_depth": sum(m["queued"] + (m["running"] is not None) for m in models.values()),
+            "models": models,
+            "registry": registry_stats(),
+            "rss_mb": _rss_mb(),
+        }
+
+
+class ModelServerClient:
+    """
+    Sends diarization and transcription requests to the ModelServer,
+    starting it in the background first when nobody is listening.
+    """
+
+    def __init__(self, address: Optional[str] = None, authkey: Optional[bytes] = None):
+        self.address = address or default_socket_path()
+        self.authkey = authkey or load_authkey()
+
+    def _request(self, message: dict) -> Any:
+        with closing(Client(self.address, family="AF_UNIX", authkey=self.authkey)) as conn:
+            conn.send(message)
+            reply = conn.recv()
+        if not reply["ok"]:
+            raise RuntimeError(f"Model server: {reply['error']}")
+        return reply["result"]
+
+    def status(self) -> dict:
+        return self._request({"op": "status"})
+
+    def available(self) -> bool:
+        try:
+            self.status()
+            return True
+        except (OSError, EOFError):
+            return False
+
+    def ensure_running(self, timeout: float = STARTUP_TIMEOUT_SECONDS):
+        if self.available():
+            return
+
+        # Its own session, so it outlives the Streamlit script that started it
+        app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        os.makedirs(os.path.join(app_dir, "logs"), exist_ok=True)
+        with open(os.path.join(app_dir, "logs", "model_server.log"), "ab") as log:
+            subprocess.Popen(
+                [sys.executable, "-m", "core.model_server"],
+                cwd=app_dir,
+                env={**os.environ, "MODEL_SERVER_SOCKET": self.address},
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+
+        deadline = time.time() + timeout
+        while not self.available():
+            if time.time() > deadline:
+                raise TimeoutError(f"The model server did not start listening on {self.address}")
+            time.sleep(0.2)
+
+    def _run(self, op: str, audio: np.ndarray, **options) -> Any:
+        self.ensure_running()
+        shared, shm = SharedAudio.share(audio)
+        try:
+            return self._request({"op": op, "audio": shared, "options": options})
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    def diarize(self, audio: np.ndarray) -> List[SpeakerOutput]:
+        return self._run("diarize", audio)
+
+    def transcribe_segments(self, audio: np.ndarray, word_timestamps: bool = False) -> List[dict]:
+        return self._run("transcribe_segments", audio, word_timestamps=word_timestamps)
+
+
+if __name__ == "__main__":
+    ModelServer().serve_forever()
@@ -0,0 +1,110 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from models.speaker import SpeakerOutput
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # Looked up once: offline, every attempt to fetch the BPE files waits on the network
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model("gpt-4o")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        # tiktoken unavailable (or offline without its BPE files): ~4 chars per token
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def verbose_dialog(speaker_outputs: List[SpeakerOutput]) -> str:
+    return '\n'.join([t.to_str() for t in speaker_outputs])
+
+
+def speaker_aliases(speaker_outputs: List[SpeakerOutput]) -> Dict[str, str]:
+    """Short alias (S1, S2, ...) of every speaker with text, in order of appearance."""
+    aliases = {}
+    for output in sorted(speaker_outputs, key=lambda o: o.start_time):
+        speaker = output.speaker or 'Unknown'
+        if (output.text or '').strip() and speaker not in aliases:
+            aliases[speaker] = f'S{len(aliases) + 1}'
+    return aliases
+
+
+def compact_dialog(speaker_outputs: List[SpeakerOutput]) -> str:
+    """
+    Token-compact meeting log for LLM prompts. Empty turns are dropped,
+    consecutive turns of the same speaker are merged, timestamps are rounded
+    to whole seconds and speaker labels are replaced by short aliases
+    (S1, S2, ...) declared once in a header line:
+
+        Speakers: S1=SPEAKER_00, S2=SPEAKER_01 (lines: ...)
+        S1 [0-12] Bom dia a todos...
+
+    The model is asked to name speakers by their labels; aliases it uses
+    anyway are mapped back by restore_speakers.
+    """
+    aliases = speaker_aliases(speaker_outputs)
+    turns = []
+    for output in sorted(speaker_outputs, key=lambda o: o.start_time):
+        text = (output.text or '').strip()
+        if not text:
+            continue
+
+        speaker = output.speaker or 'Unknown'
+        if turns and turns[-1][0] == speaker:
+            turns[-1][2] = output.end_time
+            turns[-1][3].append(text)
+        else:
+            turns.append([speaker, output.start_time, output.end_time, [text]])
+
+    header = (
+        'Speakers: '
+        + ', '.join(f'{alias}={speaker}' for speaker, alias in aliases.items())
+        + ' (lines: speaker [start-end seconds] text; refer to speakers by label, not alias)'
+    )
+    lines = [
+        f'{aliases[speaker]} [{round(start)}-{round(end)}] {" ".join(texts)}'
+        for speaker, start, end, texts in turns
+    ]
+    return '\n'.join([header] + lines)
+
+
+def restore_speakers(value: Any, aliases: Dict[str, str]) -> Any:
+    """
+    Replaces the aliases of `aliases` (speaker -> alias, as used by
+    compact_dialog) by the speaker labels in every string of `value`, e.g.
+    the knowledge JSON, so no alias reaches the stored meeting.
+    """
+    if not aliases:
+        return value
+    speakers = {alias: speaker for speaker, alias in aliases.items()}
+    pattern = re.compile(r'\b(' + '|'.join(map(re.escape, speakers)) + r')\b')
+
+    def restore(item):
+        if isinstance(item, str):
+            return pattern.sub(lambda m: speakers[m.group(1)], item)
+        if isinstance(item, dict):
+            return {key: restore(v) for key, v in item.items()}
+        if isinstance(item, list):
+            return [restore(v) for v in item]
+        return item
+
+    return restore(value)
+
+
+def token_report(original: str, compact: str) -> dict:
+    original_tokens = count_tokens(original)
+    compact_tokens = count_tokens(compact)
+    return {
+        'original_tokens': original_tokens,
+        'compact_tokens': compact_tokens,
+        'saved_tokens': original_tokens - compact_tokens,
+        'saved_ratio': 1 - compact_tokens / original_tokens if original_tokens else 0.0
+    }
@@ -1,42 +1,46 @@
 import os
-from typing import List
+from typing import List, Union
 from dotenv import load_dotenv
 
-from pyannote.audio import Pipeline
-import whisper
+import numpy as np
+import torch
 
+from core.model_registry import get_diarization_pipeline, get_whisper_model
+from core.transcription import transcribe_parallel
+from core import alignment
 from models.speaker import SpeakerOutput
 
 load_dotenv()
 
 class SpeakerDiarization:
-    def __init__(self):
-        self.pipeline = Pipeline.from_pretrained(
+    # Both models come warm from the process-wide registry, so building a
+    # SpeakerDiarization per video doesn't reload them; they are fetched on
+    # first use, so a worker process only loads the one it runs
+
+    @property
+    def pipeline(self):
+        return get_diarization_pipeline(
             "pyannote/speaker-diarization-3.1",
-            use_auth_token=os.getenv("HF_ACCESS_KEY")
+            auth_token=os.getenv("HF_ACCESS_KEY")
         )
-        self.whisper_model = whisper.load_model("small", device='cpu')
 
-    def transcribe(self, audio_path: str) -> List[SpeakerOutput]:
+    @property
+    def whisper_model(self):
+        return get_whisper_model("small", device='cpu')
+
+    def diarize(self, audio: Union[str, np.ndarray]) -> List[SpeakerOutput]:
         """
-        1. Rodar Pyannote para diarização
-        2. Rodar Whisper (uma vez no áudio completo)
-        3. Distribuir cada trecho de texto do Whisper para o turno de fala
-           que tiver a maior intersecção de tempo (evitando repetições)
+        Roda o Pyannote e devolve um SpeakerOutput (sem texto) por turno.
         """
+        if isinstance(audio, np.ndarray):
+            diarization_input = {
+                "waveform": torch.from_numpy(audio).unsqueeze(0),
+                "sample_rate": 16000
+            }
+        else:
+            diarization_input = audio
+        diarization_result = self.pipeline(diarization_input)
 
-        # 1) Speaker Diarization
-        diarization_result = self.pipeline(audio_path)
-
-        # 2) Whisper Transcription (uma vez no arquivo inteiro)
-        transcription = self.whisper_model.transcribe(
-            audio_path, language="pt", fp16=False
-        )
-        whisper_segments = transcription["segments"]
-
-        # ----------------------------------------
-        # Criar objetos SpeakerOutput para cada turno
-        # ----------------------------------------
         speaker_outputs = []
         for turn, _, speaker_label in diarization_result.itertracks(yield_label=True):
             speaker_outputs.append(
@@ -47,39 +51,67 @@ class SpeakerDiarization:
                     text=""
                 )
             )
+        return speaker_outputs
 
-        # ----------------------------------------
-        # 3) Para cada segmento do Whisper,
-        #    encontrar o turno que mais se sobrepõe
-        # ----------------------------------------
-        for ws in whisper_segments:
-            w_start, w_end = ws["start"], ws["end"]
-            w_text = ws["text"]
-
-            best_overlap = 0.0
-            best_index = None
-
-            # Verificar o grau de sobreposição com cada turno
-            for i, spk_out in enumerate(speaker_outputs):
-                spk_start = spk_out.start_time
-                spk_end = spk_out.end_time
-
-                overlap_start = max(spk_start, w_start)
-                overlap_end = min(spk_end, w_end)
-                overlap = overlap_end - overlap_start
-
-                if overlap > best_overlap:
-                    best_overlap = overlap
-                    best_index = i
-
-            # Se houve alguma sobreposição, anexa o texto àquele turno
-            if best_index is not None and best_overlap > 0:
-                speaker_outputs[best_index].text += " " + w_text
-
-        # Limpar espaços e ordenar por tempo de início
-        for spk_out in speaker_outputs:
-            spk_out.text = spk_out.text.strip()
+    def transcribe_segments(
+        self,
+        audio: Union[str, np.ndarray],
+        parallel: bool = False,
+        workers: int = None,
+        word_timestamps: bool = False
+    ) -> List[dict]:
+        """
+        Roda o Whisper (uma vez no áudio completo) e devolve os segmentos,
+        com as palavras e seus tempos quando `word_timestamps=True` (o modo
+        paralelo sempre os inclui).
+        """
+        if parallel:
+            transcription = transcribe_parallel(
+                audio, model="small", device="cpu", workers=workers,
+                language="pt", fp16=False
+            )
+        else:
+            transcription = self.whisper_model.transcribe(
+                audio, language="pt", fp16=False, word_timestamps=word_timestamps
+            )
+        return transcription["segments"]
+
+    @staticmethod
+    def align(
+        speaker_outputs: List[SpeakerOutput],
+        whisper_segments: List[dict],
+        words: bool = False
+    ) -> List[SpeakerOutput]:
+        """
+        Distribui cada trecho de texto do Whisper para o turno de fala
+        que tiver a maior intersecção de tempo (evitando repetições).
+        Com `words`, a distribuição é feita palavra a palavra, dividindo
+        entre os turnos os segmentos em que o falante muda (ver
+        core.alignment.align).
+        """
+        return alignment.align(speaker_outputs, whisper_segments, words=words)
+
+    def transcribe(
+        self,
+        audio: Union[str, np.ndarray],
+        parallel: bool = False,
+        workers: int = None,
+        words: bool = False
+    ) -> List[SpeakerOutput]:
+        """
+        1. Rodar Pyannote para diarização
+        2. Rodar Whisper (uma vez no áudio completo)
+        3. Distribuir cada trecho de texto do Whisper para o turno de fala
+           que tiver a maior intersecção de tempo (evitando repetições)
 
-        speaker_outputs.sort(key=lambda x: x.start_time)
+        `audio` pode ser o caminho de um arquivo ou o buffer float32 mono de
+        16kHz já decodificado (ver core.video_to_audio.decode_audio), que é
+        entregue direto ao Pyannote e ao Whisper.
 
-        return speaker_outputs
+        Com `parallel=True`, o Whisper roda em janelas sobrepostas num pool
+        de processos (ver core.transcription.transcribe_parallel). Com
+        `words=True`, o texto é distribuído palavra a palavra.
+        """
+        speaker_outputs = self.diarize(audio)
+        whisper_segments = self.transcribe_segments(audio, parallel, workers, word_timestamps=words)
+        return self.align(speaker_outputs, whisper_segments, words=words)
@@ -1,4 +1,9 @@
+import wave
+import threading
+from typing import Optional
+
 import ffmpeg
+import numpy as np
 
 def mp4_to_wav(
     input_file: str,
@@ -24,4 +29,83 @@ def mp4_to_wav(
         .overwrite_output()  # Overwrite existing files
     )
 
-    ffmpeg.run(stream)
\ No newline at end of file
+    ffmpeg.run(stream)
+
+
+# Above this duration, decode_audio spills samples to a memory-mapped file
+MMAP_THRESHOLD_SECONDS = 2 * 60 * 60
+
+
+def _duration(input_file: str) -> float:
+    return float(ffmpeg.probe(input_file)["format"]["duration"])
+
+
+def decode_audio(
+    input_file: str,
+    sample_rate: int = 16000,
+    mmap_path: Optional[str] = None,
+    mmap_threshold_seconds: float = MMAP_THRESHOLD_SECONDS
+) -> np.ndarray:
+    """
+    Decodes the audio of input_file straight from ffmpeg's stdout (s16le)
+    into a mono float32 array at sample_rate, the format Whisper and pyannote
+    take, without writing a WAV file in between.
+
+    When `mmap_path` is given and the input is longer than
+    `mmap_threshold_seconds`, the samples are streamed to that raw float32
+    file and returned memory-mapped instead of being held in RAM.
+    """
+    use_mmap = mmap_path is not None and _duration(input_file) > mmap_threshold_seconds
+
+    process = (
+        ffmpeg
+        .input(input_file)
+        .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=sample_rate)
+        .global_args("-loglevel", "error")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+
+    if not use_mmap:
+        out, err = process.communicate()
+        if process.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, err)
+        return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+    # Drained aside, so ffmpeg never blocks on a full stderr pipe
+    stderr = []
+    drain = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    drain.start()
+
+    with open(mmap_path, "wb") as f:
+        # 1 MiB reads are always sample aligned, except maybe the last one
+        for chunk in iter(lambda: process.stdout.read(1024 * 1024), b""):
+            samples = np.frombuffer(chunk[:len(chunk) // 2 * 2], np.int16)
+            f.write((samples.astype(np.float32) / 32768.0).tobytes())
+
+    process.wait()
+    drain.join()
+    if process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", None, stderr[0])
+
+    # Copy-on-write, so consumers get a writable array that never touches the file
+    return np.memmap(mmap_path, dtype=np.float32, mode="c")
+
+
+def write_wav(
+    audio: np.ndarray,
+    output_file: str,
+    sample_rate: int = 16000,
+    chunk_samples: int = 1024 * 1024
+):
+    """
+    Spills an already decoded mono float32 buffer to a 16-bit WAV, e.g. for
+    the audio player, without decoding the video a second time. Converted
+    `chunk_samples` at a time, so a memory-mapped buffer is never copied whole.
+    """
+    with wave.open(output_file, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        for start in range(0, len(audio), chunk_samples):
+            chunk = np.clip(audio[start:start + chunk_samples], -1.0, 1.0) * 32767
+            f.writeframes(chunk.astype(np.int16).tobytes())
@@ -2,31 +2,43 @@
 
 import streamlit as st
 import os
-import pickle
 import pandas as pd
-import math
 import matplotlib.pyplot as plt
 from audio_sync_component import audio_sync_player
+from core.meeting_store import MeetingFile
 
-def show_details(pickle_filename, pickle_dir='meetings/'):
+@st.cache_data(max_entries=4)
+def load_transcript(meeting_path, modified):
+    """Turns of the audio player, cached per meeting file (and its mtime)."""
+    return [
+        {
+            "start_time": output.start_time,
+            "end_time": output.end_time,
+            "speaker": output.speaker if output.speaker else "Unknown Speaker",
+            "text": output.text if output.text else ""
+        }
+        for output in MeetingFile(meeting_path).speakers_dialog
+    ]
+
+def show_details(meeting_filename, meeting_dir='meetings/', start_time=None):
     """
-    Displays detailed information from a pickle file.
+    Displays detailed information from a meeting file.
 
     Parameters:
-    - pickle_filename (str): The name of the pickle file to display.
-    - pickle_dir (str): Directory where pickle files are stored.
+    - meeting_filename (str): The name of the meeting file to display.
+    - meeting_dir (str): Directory where meeting files are stored.
+    - start_time (float): Where to start the audio playback, in seconds.
     """
-    pickle_path = os.path.join(pickle_dir, pickle_filename)
+    meeting_path = os.path.join(meeting_dir, meeting_filename)
     
-    # Load pickle data
+    # Sections are read on first access, the turns are memory mapped
     try:
-        with open(pickle_path, 'rb') as f:
-            data = pickle.load(f)
+        data = MeetingFile(meeting_path)
+        knowledge = data.knowledge
     except Exception as e:
-        st.error(f"Failed to load pickle file: {e}")
+        st.error(f"Failed to load meeting file: {e}")
         return
     
-    knowledge = data.knowledge
     speaker_outputs = data.speakers_dialog
     
     # Ensure 'knowledge' is a dictionary
@@ -35,7 +47,7 @@ def show_details(pickle_filename, pickle_dir='meetings/'):
         return
     
     # Page Title
-    st.title(f"📄 Details for `{pickle_filename}`")
+    st.title(f"📄 Details for `{meeting_filename}`")
     
     # Summarization Section
     st.header("📝 Meeting Summary")
@@ -179,59 +191,23 @@ def show_details(pickle_filename, pickle_dir='meetings/'):
     
     st.markdown("---")
 
-    talk_data = []
-    for output in speaker_outputs:
-        speaker = output.speaker if output.speaker else "Unknown Speaker"
-        
-        # start_time, end_time in seconds
-        start_sec = output.start_time
-        end_sec = output.end_time
-        
-        if start_sec is None or end_sec is None:
-            continue
-        
-        # Total speaking duration in seconds
-        total_speaking_time = end_sec - start_sec
-        
-        # Identify which minute bins are touched by this utterance
-        start_minute = int(math.floor(start_sec / 60))
-        end_minute = int(math.floor(end_sec / 60))
-        
-        # Distribute the utterance time across all minutes it spans
-        for minute in range(start_minute, end_minute + 1):
-            # Calculate the start and end (in seconds) for this minute bin
-            bin_start_sec = minute * 60
-            bin_end_sec = (minute + 1) * 60
-            
-            # The overlap between [start_sec, end_sec] and [bin_start_sec, bin_end_sec]
-            overlap_start = max(start_sec, bin_start_sec)
-            overlap_end = min(end_sec, bin_end_sec)
-            
-            # If there's overlap, calculate the duration
-            if overlap_end > overlap_start:
-                overlap_duration = overlap_end - overlap_start
-                talk_data.append({
-                    "minute": minute,
-                    "speaker": speaker,
-                    "talk_time_seconds": overlap_duration
-                })
-    
-    # 2. Convert to a DataFrame
-    if len(talk_data) > 0:
-        df_talk = pd.DataFrame(talk_data)
-        
-        # 3. Aggregate talk times per speaker per minute
-        df_agg = df_talk.groupby(["minute", "speaker"], as_index=False)["talk_time_seconds"].sum()
-        
-        # 4. Pivot so each speaker is a column, minutes are rows
-        pivot_df = df_agg.pivot(index="minute", columns="speaker", values="talk_time_seconds").fillna(0)
+    # Summed from the memory-mapped time columns, no turn is built
+    talk_time, speakers = speaker_outputs.talk_time(bin_seconds=60)
+    
+    if talk_time.size > 0 and talk_time.sum() > 0:
+        # Each speaker is a column, minutes are rows
+        pivot_df = pd.DataFrame(
+            talk_time,
+            columns=[speaker if speaker else "Unknown Speaker" for speaker in speakers]
+        )
+        pivot_df.index.name = "minute"
         
         st.markdown("## 🗣️ Speaking Time per Minute")
         st.write(
             "Below is a line chart that shows how many seconds each speaker talks in each minute of the audio."
         )
         
-        # 5. Plot with Streamlit's built-in line_chart
+        # Plot with Streamlit's built-in line_chart
         st.line_chart(pivot_df)
         
         # If you prefer matplotlib, you could do:
@@ -275,23 +251,14 @@ def show_details(pickle_filename, pickle_dir='meetings/'):
     
     # Path to the audio file
     audio_path = data.audio_path  # Ensure this path is accessible
-    if not os.path.isfile(audio_path):
+    if not audio_path or not os.path.isfile(audio_path):
         st.error(f"Audio file not found at `{audio_path}`.")
-    else:
-        # Prepare transcript data
-        speaker_outputs = data.speakers_dialog  # List[SpeakerOutput]
-        transcript = [
-            {
-                "start_time": output.start_time,
-                "end_time": output.end_time,
-                "speaker": output.speaker if output.speaker else "Unknown Speaker",
-                "text": output.text if output.text else ""
-            }
-            for output in speaker_outputs
-        ]
+    elif st.toggle("Show the audio player", value=start_time is not None):
+        # Only here is the whole dialog read, and once per meeting file
+        transcript = load_transcript(meeting_path, os.path.getmtime(meeting_path))
         
         # Use the custom component
-        audio_sync_player(data.audio_path, transcript)
+        audio_sync_player(data.audio_path, transcript, start_time=start_time)
     
     st.markdown("---")
     
@@ -0,0 +1,67 @@
+# metrics_page.py
+
+import streamlit as st
+import pandas as pd
+from core.instrumentation import metrics
+from core.model_server import ModelServerClient
+
+def show_metrics():
+    """
+    Displays the pipeline spans (ffmpeg, pyannote, Whisper, alignment, LLM)
+    recorded by core.instrumentation.
+    """
+    st.header("📊 Pipeline Metrics")
+    show_model_server()
+    st.caption(f"Spans from `{metrics.log_path}`, exported to `{metrics.prom_path}`")
+
+    summary = metrics.summary()
+    if not summary:
+        st.info("No metrics yet. Process a meeting first.")
+        return
+
+    st.subheader("⏱️ Totals per stage")
+    st.dataframe(
+        pd.DataFrame([{"span": name, **entry} for name, entry in sorted(summary.items())]),
+        use_container_width=True
+    )
+
+    st.subheader("🕒 Recent spans")
+    spans = [r for r in metrics.records(limit=500) if r["type"] == "span"][-50:]
+    st.dataframe(
+        pd.DataFrame([
+            {
+                "span": r["name"],
+                "wall (s)": round(r["wall_seconds"], 3),
+                "cpu (s)": round(r["cpu_seconds"], 3),
+                "child cpu (s)": round(r["child_cpu_seconds"], 3),
+                "RSS start (MB)": r.get("rss_start_mb"),
+                "RSS end (MB)": r.get("rss_end_mb"),
+                "process peak RSS (MB)": r.get("process_peak_rss_mb", r.get("peak_rss_mb")),
+                "error": r["error"],
+                **r["attributes"]
+            }
+            for r in reversed(spans)
+        ]),
+        use_container_width=True
+    )
+
+
+def show_model_server():
+    """
+    Queue depth and memory of the shared model server, when it is running.
+    """
+    client = ModelServerClient()
+    if not client.available():
+        st.info("🧠 The model server starts with the first meeting processed.")
+        return
+
+    status = client.status()
+    st.subheader("🧠 Model server")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Queue depth", status["queue_depth"])
+    col2.metric("Models (MB)", f"{status['registry']['memory_used_mb']:.0f}")
+    col3.metric("Process RSS (MB)", f"{status['rss_mb']:.0f}" if status["rss_mb"] is not None else "-")
+    st.dataframe(
+        pd.DataFrame([{"model": name, **entry} for name, entry in status["models"].items()]),
+        use_container_width=True
+    )
@@ -25,12 +25,12 @@ class Meeting:
     knowledge: Any
 
     def save(self, file_path: str):
-        """Saves the Meeting object to a file using pickle."""
+        """Saves the Meeting object to a file using pickle (legacy, see core.meeting_store)."""
         with open(file_path, 'wb') as file:
             pickle.dump(self, file)
 
     @staticmethod
     def load(file_path: str) -> 'Meeting':
-        """Loads a Meeting object from a file using pickle."""
+        """Loads a Meeting object from a file using pickle (legacy, see core.meeting_store)."""
         with open(file_path, 'rb') as file:
             return pickle.load(file)
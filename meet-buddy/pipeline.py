@@ -1,9 +1,19 @@
 import os
+import json
+import hashlib
 from typing import List
 
-from core.video_to_audio import mp4_to_wav
+from core.video_to_audio import decode_audio, write_wav
 from core.speaker_diarization import SpeakerDiarization
+from core.model_processes import ModelProcesses
+from core.model_server import ModelServerClient
 from core.agent import MeetingKnowlegeAgent
+from core.stage_graph import Stage, StageGraph
+from core.prompt_format import compact_dialog, speaker_aliases, restore_speakers, verbose_dialog, token_report
+from core.instrumentation import metrics
+from core.meeting_store import MeetingFile, meeting_path, save_meeting, migrate_pickle
+from core.meeting_catalog import MeetingCatalog
+from core.upload import file_content_hash
 
 from models.speaker import SpeakerOutput, Meeting
 
@@ -20,67 +30,234 @@ def speaker_outputs_to_dataframe(speaker_outputs: List[SpeakerOutput]) -> pd.Dat
         for s in speaker_outputs
     ])
 
-def process_video(video_path: str) -> List[SpeakerOutput]:
+def catalog_meeting(path: str, meeting=None):
+    # The meeting file is the source of truth: a failed index is only reported
+    try:
+        MeetingCatalog().index_meeting(path, meeting)
+    except Exception as e:
+        print(f'Could not index {path} in the meeting catalog: {e}')
+
+def job_key(*parts) -> str:
+    """Stable name for a meeting job, built from its inputs and parameters."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+def build_meeting_graph(
+        video_path: str,
+        language: str = 'portuguese',
+        parallel_transcription: bool = False,
+        spill_wav: bool = True,
+        bypass_llm_cache: bool = False,
+        word_alignment: bool = False,
+        separate_processes: bool = False,
+        diarization_threads: int = None,
+        transcription_threads: int = None,
+        model_server: bool = False,
+        fingerprint: str = None
+    ) -> StageGraph:
+    """
+    Stage DAG of a meeting, checkpointed under jobs/<job key>/:
+
+        audio -> wav ------------------------------------------+
+        audio -> diarization ---+                              |
+        audio -> transcription -+-> alignment -> knowledge -> meeting
+
+    Diarization and transcription are independent and run concurrently; a
+    failed run (e.g. on the LLM call) resumes after the last finished stage.
+    With `word_alignment`, Whisper also times every word and the text is
+    assigned to the speakers word by word.
+
+    With `separate_processes`, pyannote and Whisper run in two worker
+    processes with their own thread budgets (half of the CPUs each by
+    default) over one shared audio buffer, see ModelProcesses. Whisper then
+    runs whole in its process, so `parallel_transcription` is ignored.
+
+    With `model_server`, both models are run by the shared, warm
+    ModelServer process instead (started on first use), so no model is
+    loaded by the app at all.
+
+    The job key is built from the video content hash (`fingerprint`, e.g.
+    the one recorded by ingest_upload, otherwise computed here) and the
+    parameters that change the stage outputs, so a different recording
+    uploaded under the same name never resumes stale checkpoints.
+    """
     filename = os.path.basename(video_path)
+    fingerprint = fingerprint or file_content_hash(video_path)
+    key = job_key(fingerprint, language, parallel_transcription, spill_wav, word_alignment)
 
     if not os.path.exists('audio'):
         os.mkdir('audio')
 
-    audio_path = f'audio/{filename}.wav'
+    def extract_audio():
+        print('Decoding the audio...')
+        audio = decode_audio(input_file=video_path, mmap_path=f'audio/{key}.f32')
+        metrics.annotate(audio_seconds=len(audio) / 16000)
+        return audio
+
+    def spill(audio):
+        # The WAV is only needed by the audio player in the details page
+        if not spill_wav:
+            return None
+        audio_path = f'audio/{filename}.wav'
+        write_wav(audio, audio_path)
+        return audio_path
+
+    if model_server:
+        model_runner = ModelServerClient()
+    elif separate_processes:
+        model_runner = ModelProcesses(diarization_threads, transcription_threads)
+    else:
+        model_runner = None
+
+    def diarize(audio):
+        print('Identifying the speakers...')
+        if model_runner is not None:
+            return model_runner.diarize(audio)
+        return SpeakerDiarization().diarize(audio)
+
+    def transcribe(audio):
+        print('Transcribing the audio to text...')
+        if model_runner is not None:
+            return model_runner.transcribe_segments(audio, word_timestamps=word_alignment)
+        return SpeakerDiarization().transcribe_segments(
+            audio, parallel=parallel_transcription, word_timestamps=word_alignment
+        )
+
+    def align(diarization, transcription):
+        metrics.annotate(speaker_turns=len(diarization), whisper_segments=len(transcription))
+        return SpeakerDiarization.align(diarization, transcription, words=word_alignment)
+
+    def knowledge(alignment):
+        print('Extracting the meeting knowledge...')
+        return run_agent(
+            transcriptions=alignment,
+            language=language,
+            bypass_cache=bypass_llm_cache
+        )
+
+    def meeting(wav, alignment, knowledge):
+        if not os.path.exists('meetings'):
+            os.mkdir('meetings')
+
+        meeting = Meeting(
+            speakers_dialog=alignment,
+            audio_path=wav,
+            video_path=video_path,
+            knowledge=knowledge
+        )
+        save_meeting(meeting, meeting_path(filename))
+        catalog_meeting(meeting_path(filename), meeting)
+        return meeting
+
+    graph = StageGraph(f'jobs/{key}', [
+        Stage('audio', extract_audio, checkpoint=False),
+        Stage('wav', spill, deps=['audio']),
+        Stage('diarization', diarize, deps=['audio']),
+        Stage('transcription', transcribe, deps=['audio']),
+        Stage('alignment', align, deps=['diarization', 'transcription']),
+        Stage('knowledge', knowledge, deps=['alignment']),
+        Stage('meeting', meeting, deps=['wav', 'alignment', 'knowledge'], checkpoint=False)
+    ], max_workers=3, name='meet-buddy')
+
+    if bypass_llm_cache:
+        # A checkpointed knowledge stage would otherwise be reused without
+        # asking the LLM at all
+        graph.invalidate('knowledge')
 
-    print('Converting mp4 to wav...')
-    mp4_to_wav(input_file=video_path, output_file=audio_path)
-    print('Transcribing the audio to text...')
-    transcriptions = SpeakerDiarization().transcribe(audio_path=audio_path)
+    return graph
+
+
+def _run_graph(graph: StageGraph, targets: List[str]) -> dict:
+    try:
+        return graph.run(targets)
+    finally:
+        mmap_path = f'audio/{os.path.basename(graph.job_dir)}.f32'
+        if os.path.exists(mmap_path):
+            os.remove(mmap_path)
+
+
+def process_video(
+        video_path: str,
+        parallel_transcription: bool = False,
+        spill_wav: bool = True,
+        model_server: bool = False,
+        fingerprint: str = None
+    ) -> List[SpeakerOutput]:
+    graph = build_meeting_graph(
+        video_path,
+        parallel_transcription=parallel_transcription,
+        spill_wav=spill_wav,
+        model_server=model_server,
+        fingerprint=fingerprint
+    )
+    outputs = _run_graph(graph, ['wav', 'alignment'])
+    return outputs['wav'], outputs['alignment']
 
-    return audio_path, transcriptions
 
+def run_agent(
+        transcriptions: List[SpeakerOutput],
+        language: str,
+        bypass_cache: bool = False
+    ):
+    # Merged turns, rounded times and speaker aliases cut prompt tokens
+    transcriptions_str = compact_dialog(transcriptions)
+    report = token_report(verbose_dialog(transcriptions), transcriptions_str)
+    print(
+        f"Meeting log: {report['original_tokens']} -> {report['compact_tokens']} tokens "
+        f"({report['saved_ratio']:.0%} saved)"
+    )
 
-def run_agent(transcriptions: List[SpeakerOutput], language: str):
-    transcriptions_str = '\n'.join([t.to_str() for t in transcriptions])
     agent = MeetingKnowlegeAgent(language=language)
-    return agent.invoke(transcriptions_str)
+    knowledge = agent.invoke(transcriptions_str, bypass_cache=bypass_cache)
+    # Attendance, tasks and sentiments keep the real speaker labels
+    return restore_speakers(knowledge, speaker_aliases(transcriptions))
 
 
 def get_meeting(
         video_path: str,
         language: str = 'portuguese',
-        regenerate_knowledge: bool = False
+        regenerate_knowledge: bool = False,
+        parallel_transcription: bool = False,
+        bypass_llm_cache: bool = False,
+        word_alignment: bool = False,
+        separate_processes: bool = False,
+        model_server: bool = False,
+        fingerprint: str = None
     ) -> Meeting:
     filename = os.path.basename(video_path)
+    path = meeting_path(filename)
 
-    if os.path.exists(f'meetings/{filename}.pkl'):
-        meeting = Meeting.load(f'meetings/{filename}.pkl')
+    if not os.path.exists(path) and os.path.exists(f'meetings/{filename}.pkl'):
+        # Pickled by an older version
+        catalog_meeting(migrate_pickle(f'meetings/{filename}.pkl'))
+
+    if os.path.exists(path):
+        meeting = MeetingFile(path).to_meeting()
         
         if regenerate_knowledge is True:
             response = run_agent(
                 transcriptions=meeting.speakers_dialog,
-                language=language
+                language=language,
+                bypass_cache=bypass_llm_cache
             )
             meeting.knowledge = response
-            meeting.save(f'meetings/{filename}.pkl')
+            save_meeting(meeting, path)
+            catalog_meeting(path, meeting)
 
     else:
-        audio_path, transcriptions = process_video(video_path=video_path)
-
-        response = run_agent(
-            transcriptions=transcriptions,
-            language=language
+        graph = build_meeting_graph(
+            video_path,
+            language=language,
+            parallel_transcription=parallel_transcription,
+            bypass_llm_cache=bypass_llm_cache,
+            word_alignment=word_alignment,
+            separate_processes=separate_processes,
+            model_server=model_server,
+            fingerprint=fingerprint
         )
+        meeting = _run_graph(graph, ['meeting'])['meeting']
 
-        if not os.path.exists('meetings'):
-            os.mkdir('meetings')
-        
-        meeting = Meeting(
-            speakers_dialog=transcriptions,
-            audio_path=audio_path,
-            video_path=video_path,
-            knowledge=response
-        )
-
-        meeting.save(f'meetings/{filename}.pkl')
-
-        return meeting
+    return meeting
 
 
 if __name__ == '__main__':
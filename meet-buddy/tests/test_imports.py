@@ -0,0 +1,48 @@
+import ast
+import os
+import importlib.util
+
+import pytest
+
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ['pipeline.py', 'MeetBuddy.py', 'details_page.py', 'metrics_page.py', 'benchmark.py']
+
+
+def _defined_names(path):
+    tree = ast.parse(open(path, encoding='utf-8').read())
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names.update(t.id for t in targets if isinstance(t, ast.Name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split('.')[0] for alias in node.names)
+    return names
+
+
+@pytest.mark.parametrize('entry_point', ENTRY_POINTS)
+def test_local_imports_resolve(entry_point):
+    # Runs without the heavy dependencies: every `from core.x import y` of
+    # the app must name an existing module defining `y`
+    tree = ast.parse(open(os.path.join(APP_DIR, entry_point), encoding='utf-8').read())
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ImportFrom) or not node.module:
+            continue
+        if node.module.split('.')[0] not in ('core', 'models'):
+            continue
+        module_path = os.path.join(APP_DIR, *node.module.split('.')) + '.py'
+        assert os.path.exists(module_path), f'{entry_point}: no module {node.module}'
+        missing = {alias.name for alias in node.names} - _defined_names(module_path)
+        assert not missing, f'{entry_point}: {node.module} does not define {sorted(missing)}'
+
+
+def test_pipeline_imports():
+    for module in ('numpy', 'pandas', 'ffmpeg', 'torch', 'whisper', 'pyannote.audio', 'langchain_openai', 'dotenv'):
+        pytest.importorskip(module)
+    spec = importlib.util.find_spec('pipeline')
+    assert spec is not None
+    import pipeline
+    assert callable(pipeline.get_meeting)
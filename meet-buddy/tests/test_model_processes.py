@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from core import model_processes
+from core.model_processes import ModelProcesses
+
+
+def test_workers_outlive_calls_and_instances():
+    for module in ('torch', 'whisper', 'pyannote.audio'):
+        pytest.importorskip(module)
+
+    audio = np.zeros(16000, dtype=np.float32)
+    try:
+        ModelProcesses(1, 1).diarize(audio)
+        first = list(model_processes._workers[('diarize', 1)]._processes)
+
+        # A new pipeline (new instance) reuses the warm worker
+        ModelProcesses(1, 1).diarize(audio)
+        assert list(model_processes._workers[('diarize', 1)]._processes) == first
+    finally:
+        model_processes.shutdown_workers()
+    assert not model_processes._workers
@@ -0,0 +1,33 @@
+import io
+
+import pipeline
+from core.upload import ingest_upload
+
+
+def _job_dir(tmp_path, content, **params):
+    video = tmp_path / 'videos' / 'meeting.mp4'
+    video.parent.mkdir(exist_ok=True)
+    video.write_bytes(content)
+    return pipeline.build_meeting_graph(str(video), **params).job_dir
+
+
+def test_job_is_keyed_on_the_content_and_parameters(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = _job_dir(tmp_path, b'first recording')
+
+    assert _job_dir(tmp_path, b'first recording') == first
+    # Same name, different recording: the old checkpoints aren't resumed
+    assert _job_dir(tmp_path, b'second recording') != first
+    assert _job_dir(tmp_path, b'first recording', word_alignment=True) != first
+    assert _job_dir(tmp_path, b'first recording', language='english') != first
+
+
+def test_upload_hash_keys_the_same_job(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = _job_dir(tmp_path, b'first recording')
+
+    upload = io.BytesIO(b'first recording')
+    upload.name = 'copy.mp4'
+    record = ingest_upload(upload, folder=str(tmp_path / 'uploads'))
+    # The hash recorded on upload is the one computed from the stored file
+    assert pipeline.build_meeting_graph(record.path, fingerprint=record.content_hash).job_dir == first
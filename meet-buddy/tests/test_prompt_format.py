@@ -0,0 +1,35 @@
+from core.prompt_format import compact_dialog, restore_speakers, speaker_aliases
+from models.speaker import SpeakerOutput
+
+
+TURNS = [
+    SpeakerOutput('SPEAKER_01', 0.0, 4.2, 'Bom dia a todos.'),
+    SpeakerOutput('SPEAKER_01', 4.2, 6.0, 'Vamos começar.'),
+    SpeakerOutput('SPEAKER_00', 6.0, 9.7, 'Eu fecho o relatório S1.'),
+    SpeakerOutput('SPEAKER_02', 9.7, 10.0, ' '),
+]
+
+
+def test_compact_dialog_declares_the_aliases():
+    assert compact_dialog(TURNS).splitlines()[1:] == [
+        'S1 [0-6] Bom dia a todos. Vamos começar.',
+        'S2 [6-10] Eu fecho o relatório S1.',
+    ]
+    assert speaker_aliases(TURNS) == {'SPEAKER_01': 'S1', 'SPEAKER_00': 'S2'}
+
+
+def test_knowledge_gets_the_speaker_labels_back():
+    knowledge = {
+        'attendance': [{'name': 'S1', 'role': 'host'}, {'name': 'S2', 'role': 'S12'}],
+        'tasks_per_speaker': [{'task_description': 'Send the report', 'assigned_to': 'S2'}],
+        'sentiment_per_speaker': [{'speaker': 'SPEAKER_01', 'sentiment': 'positive'}],
+        'follow_up_meeting': {'date': None, 'purpose': 'S1 and S2 review'},
+    }
+    restored = restore_speakers(knowledge, speaker_aliases(TURNS))
+
+    assert restored['attendance'] == [
+        {'name': 'SPEAKER_01', 'role': 'host'}, {'name': 'SPEAKER_00', 'role': 'S12'}
+    ]
+    assert restored['tasks_per_speaker'][0]['assigned_to'] == 'SPEAKER_00'
+    assert restored['sentiment_per_speaker'][0]['speaker'] == 'SPEAKER_01'
+    assert restored['follow_up_meeting'] == {'date': None, 'purpose': 'SPEAKER_01 and SPEAKER_00 review'}
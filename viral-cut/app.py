@@ -1,8 +1,21 @@
 import streamlit as st
 import os
-import json
+import math
 
-from pipeline import process
+from core.job_queue import JobQueue, QUEUED, RUNNING
+from core.upload import ingest_upload
+from core.instrumentation import metrics
+from core.previews import previews
+from core.catalog import Catalog, CLIP_ORDERS
+
+job_queue = JobQueue()
+catalog = Catalog()
+
+# Cut lists processed before the catalog existed
+if catalog.count_videos() == 0:
+    catalog.import_folder("video_cuts")
+
+PAGE_SIZE = 12
 
 # -----------------------------------------------------------------------
 # Pages / Views
@@ -14,102 +27,225 @@ def show_home():
     st.header("Upload a new MP4")
     uploaded_file = st.file_uploader("Choose a .mp4 file", type=["mp4"])
     if uploaded_file is not None:
-        # Save the uploaded file to the 'videos/' folder (create if needed)
-        videos_folder = "videos"
-        os.makedirs(videos_folder, exist_ok=True)
-
-        file_path = os.path.join(videos_folder, uploaded_file.name)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Save the uploaded file to the 'videos/' folder, once per upload
+        record = ingest_upload(
+            uploaded_file,
+            folder="videos",
+            seen=st.session_state.setdefault("ingested_uploads", {})
+        )
+        file_path = record.path
 
         st.success(f"File saved to {file_path}")
 
-        # Process button
+        reencode = st.checkbox("Re-encode clips (frame-accurate, slower)")
+        priority = st.number_input("Priority", value=0, step=1)
+
+        # Process button: the pipeline runs in the worker processes
         if st.button("Process this video"):
-            with st.spinner("Processing..."):
-                # Call your pipeline
-                process(file_path)
-            st.success("Video processed! Cuts created in 'video_cuts/' folder.")
+            job_id = job_queue.enqueue(
+                file_path,
+                priority=int(priority),
+                reencode=reencode,
+                # The full-content hash: sampled fingerprints can collide
+                fingerprint=record.content_hash
+            )
+            st.success(f"Video queued! Job ID: {job_id}")
 
-    # 2) List Existing JSON Files
+    show_jobs()
+
+    if st.button("Pipeline Metrics"):
+        st.session_state.page = "metrics"
+        st.rerun()
+
+    # 2) Browse the catalog of processed videos and cuts
     st.header("Available Cuts for Processed Videos")
 
-    video_cuts_folder = "video_cuts"
-    if not os.path.exists(video_cuts_folder):
-        st.info("No 'video_cuts' folder yet. Process a video first.")
-        return
+    with st.expander("Processed videos"):
+        st.dataframe([
+            {
+                "video": video.id,
+                "status": video.status,
+                "clips": video.clips,
+                "duration (s)": video.duration,
+                "size (MB)": round(video.size / 1024 / 1024, 1) if video.size else None,
+                "error": video.error
+            }
+            for video in catalog.list_videos(limit=50)
+        ], use_container_width=True)
+
+    cols = st.columns([3, 2, 1])
+    query = cols[0].text_input("Search titles and explanations")
+    orders = ["relevance", *CLIP_ORDERS] if query else list(CLIP_ORDERS)
+    order = cols[1].selectbox("Sort by", orders)
+    page = cols[2].number_input("Page", min_value=1, value=1, step=1)
 
-    # Collect all JSON files
-    json_files = [f for f in os.listdir(video_cuts_folder) if f.endswith(".json")]
-    if not json_files:
-        st.info("No JSON files found in 'video_cuts' folder.")
+    clips, total = catalog.search_clips(
+        query, order=order, limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE
+    )
+    if total == 0:
+        st.info("No cuts found. Process a video first." if not query else "No cuts match the search.")
         return
 
-    # Display each JSON file with a "Details" button
-    for json_file in json_files:
-        st.write(f"**File**: `{json_file}`")
-        details_key = f"details_{json_file}"
+    st.caption(f"{total} cuts, page {page} of {math.ceil(total / PAGE_SIZE)}")
+    show_thumbnails(clips, details=True)
 
-        if st.button("Details", key=details_key):
-            # Store selected JSON in session_state, then go to the details page
-            st.session_state.selected_json = json_file
-            st.session_state.page = "details"
-            st.rerun()
 
+def show_thumbnails(clips: list, columns: int = 4, details: bool = False):
+    """
+    Thumbnail grid of catalog clips. Previews are generated in the
+    background on first view; the grid refreshes every few seconds while
+    some are being generated, and stops polling once none is.
+    """
+    for clip in clips:
+        # Queues the missing thumbnails
+        previews.thumbnail(clip.path)
 
-def show_details():
-    st.title("Cut Details")
+    polling = previews.pending() > 0
+    st.fragment(thumbnail_grid, run_every=5 if polling else None)(clips, columns, details, polling)
+
+
+def thumbnail_grid(clips: list, columns: int, details: bool, polling: bool):
+    cols = st.columns(columns)
+    for i, clip in enumerate(clips):
+        with cols[i % columns]:
+            thumbnail = previews.thumbnail(clip.path)
+            caption = f"{clip.video_id} #{clip.idx}: {clip.title}"
+            if thumbnail is not None:
+                st.image(thumbnail, caption=caption, use_container_width=True)
+            else:
+                st.caption(f"{caption} ({'preview pending' if clip.status == 'ready' else clip.status})")
+
+            if details and st.button("Details", key=f"details_{clip.id}"):
+                # Store the selected clip in session_state, then go to the details page
+                st.session_state.selected_clip = clip.id
+                st.session_state.page = "details"
+                st.rerun()
+
+    if polling and previews.pending() == 0:
+        # Every preview is done (or failed): rerun the page to stop polling
+        st.rerun()
 
-    # If user arrived here without a selected JSON, show warning
-    if "selected_json" not in st.session_state:
-        st.warning("No JSON selected. Go back to the Home Page.")
+
+@st.fragment(run_every=3)
+def show_jobs():
+    st.header("Processing Queue")
+
+    if job_queue.live_workers() == 0:
+        st.warning("No workers running. Start them with `python worker.py --workers 2`.")
+
+    jobs = job_queue.list(limit=20)
+    if not jobs:
+        st.info("No jobs yet.")
         return
 
-    # Load the JSON data (list of cuts)
-    json_file = st.session_state.selected_json
-    json_path = os.path.join("video_cuts", json_file)
+    for job in jobs:
+        cols = st.columns([4, 2, 1])
+        cols[0].write(f"**{os.path.basename(job.video_path)}** (priority {job.priority})")
+        if job.status == RUNNING:
+            cols[1].progress(job.progress, text=job.message or job.status)
+        else:
+            cols[1].write(job.status)
+        if job.status in (QUEUED, RUNNING) and not job.cancel_requested:
+            if cols[2].button("Cancel", key=f"cancel_{job.id}"):
+                job_queue.cancel(job.id)
+                st.rerun()
+        if job.error:
+            with st.expander("Error"):
+                st.code(job.error)
+
+
+def show_details():
+    st.title("Cut Details")
 
-    try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            cuts = json.load(f)
-    except Exception as e:
-        st.error(f"Failed to load {json_path}: {e}")
+    # If user arrived here without a selected clip, show warning
+    clip = catalog.get_clip(st.session_state.get("selected_clip", -1))
+    if clip is None:
+        st.warning("No cut selected. Go back to the Home Page.")
+        if st.button("Back to Home"):
+            st.session_state.page = "home"
+            st.rerun()
         return
 
+    # The other cuts of the same video
+    siblings, _ = catalog.search_clips(video_id=clip.video_id, order="start_time", limit=500)
+    show_thumbnails(siblings)
+
     # Let user pick which cut to view
-    cut_index = st.selectbox(
-        "Select a cut index:",
-        range(len(cuts)),
-        format_func=lambda i: f"Cut #{i}"
+    ids = [sibling.id for sibling in siblings]
+    by_id = {sibling.id: sibling for sibling in siblings}
+    selected = st.selectbox(
+        "Select a cut:",
+        ids,
+        index=ids.index(clip.id) if clip.id in ids else 0,
+        format_func=lambda i: f"Cut #{by_id[i].idx}: {by_id[i].title}"
     )
-
-    cut_data = cuts[cut_index]
+    cut_data = by_id.get(selected, clip)
 
     # Display information about the selected cut
-    st.subheader(cut_data.get("title", "Untitled"))
-    st.write("**Explanation:**", cut_data.get("explanation", ""))
+    st.subheader(cut_data.title or "Untitled")
+    st.write("**Explanation:**", cut_data.explanation)
     st.write(
-        f"**Time Range**: {cut_data.get('start_time')}s "
-        f"to {cut_data.get('end_time')}s"
+        f"**Time Range**: {cut_data.start_time}s "
+        f"to {cut_data.end_time}s ({cut_data.duration:.0f}s)"
     )
 
-    # The original video name is (JSON name minus ".json"), e.g. "myvideo.mp4"
-    base_filename = json_file.replace(".json", "")  # e.g. "myvideo.mp4"
-    # Each cut is named "myvideo.mp4_{index}.mp4"
-    mp4_filename = f"{base_filename}_{cut_index}.mp4"
-    mp4_path = os.path.join("video_cuts", mp4_filename)
-
-    # If found, display the cut
-    if os.path.exists(mp4_path):
-        st.video(mp4_path)
+    mp4_path = cut_data.path
+    # Written next to the clip by the pipeline, timed from the clip start
+    srt_path = f"{os.path.splitext(mp4_path)[0]}.srt"
+    subtitles = srt_path if os.path.exists(srt_path) else None
+    if not os.path.exists(mp4_path):
+        st.warning(f"No matching MP4 found: {os.path.basename(mp4_path)} ({cut_data.status})")
+    elif st.checkbox("Full resolution"):
+        st.video(mp4_path, subtitles=subtitles)
     else:
-        st.warning(f"No matching MP4 found: {mp4_filename}")
+        # The low-bitrate proxy loads much faster than the rendered clip
+        proxy = previews.proxy(mp4_path)
+        if proxy is not None:
+            st.video(proxy, subtitles=subtitles)
+        else:
+            thumbnail = previews.thumbnail(mp4_path)
+            if thumbnail is not None:
+                st.image(thumbnail)
+            st.info("Preparing a preview, refresh in a moment or pick Full resolution.")
 
     # Button to go back to home
     if st.button("Back to Home"):
         st.session_state.page = "home"
         st.rerun()
 
+def show_metrics():
+    st.title("Pipeline Metrics")
+    st.caption(f"Spans from `{metrics.log_path}`, exported to `{metrics.prom_path}`")
+
+    summary = metrics.summary()
+    if not summary:
+        st.info("No metrics yet. Process a video first.")
+    else:
+        rows = [{"span": name, **entry} for name, entry in sorted(summary.items())]
+        st.subheader("Totals per stage")
+        st.dataframe(rows, use_container_width=True)
+
+        st.subheader("Recent spans")
+        spans = [r for r in metrics.records(limit=500) if r["type"] == "span"][-50:]
+        st.dataframe([
+            {
+                "span": r["name"],
+                "wall (s)": round(r["wall_seconds"], 3),
+                "cpu (s)": round(r["cpu_seconds"], 3),
+                "child cpu (s)": round(r["child_cpu_seconds"], 3),
+                "RSS start (MB)": r.get("rss_start_mb"),
+                "RSS end (MB)": r.get("rss_end_mb"),
+                "process peak RSS (MB)": r.get("process_peak_rss_mb", r.get("peak_rss_mb")),
+                "error": r["error"],
+                **r["attributes"]
+            }
+            for r in reversed(spans)
+        ], use_container_width=True)
+
+    if st.button("Back to Home"):
+        st.session_state.page = "home"
+        st.rerun()
+
 # -----------------------------------------------------------------------
 # Routing Logic
 # -----------------------------------------------------------------------
@@ -120,3 +256,5 @@ if st.session_state.page == "home":
     show_home()
 elif st.session_state.page == "details":
     show_details()
+elif st.session_state.page == "metrics":
+    show_metrics()
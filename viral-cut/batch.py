@@ -0,0 +1,203 @@
+"""
+Processes a backlog of videos with the pipeline stages overlapped across
+videos: while video N is transcribing, video N+1 has its audio extracted
+and video N-1 waits on the LLM or is being rendered.
+
+    python batch.py videos/ --transcribe-workers 1 --agent-workers 4
+    python batch.py "episodes/*.mp4" --reencode --queue-size 1
+"""
+import os
+import glob
+import time
+import queue
+import argparse
+import threading
+import traceback
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from pipeline import build_graph, run_graph
+from core.catalog import Catalog
+
+
+# (batch stage, graph stage it runs); the video is done after the last one
+STAGES = [
+    ('audio', 'audio'),
+    ('transcribe', 'transcript'),
+    ('agent', 'cuts'),
+    ('render', 'clips'),
+]
+
+
+@dataclass
+class BatchItem:
+    video_path: str
+    graph: object = None
+    started: float = 0.0
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    clips: int = 0
+    error: Optional[str] = None
+    finished: float = 0.0
+
+
+def find_videos(inputs: List[str]) -> List[str]:
+    """Expands directories (their .mp4 files) and glob patterns, in order."""
+    videos = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*.mp4'))
+        else:
+            matches = glob.glob(pattern)
+        for path in sorted(matches):
+            if path not in videos:
+                videos.append(path)
+    return videos
+
+
+def run_batch(
+    videos: List[str],
+    workers: Dict[str, int],
+    queue_size: int = 2,
+    **options
+) -> List[BatchItem]:
+    """
+    Runs the videos through the STAGES, each with `workers[stage]` threads
+    and a queue of at most `queue_size` videos in front of it, so a fast
+    stage can't pile up decoded audio ahead of a slow one. A video failing
+    a stage is recorded and dropped, the others go on. `options` are passed
+    to pipeline.build_graph (streaming is disabled, the agent and render
+    stages are overlapped across videos instead).
+    """
+    catalog = Catalog()
+    queues = [queue.Queue(maxsize=queue_size) for _ in STAGES]
+    finished = []
+    lock = threading.Lock()
+    remaining = [workers[stage] for stage, _ in STAGES]
+
+    def work(index: int):
+        stage, target = STAGES[index]
+        while True:
+            item = queues[index].get()
+            if item is None:
+                break
+
+            started = time.perf_counter()
+            try:
+                if item.graph is None:
+                    item.started = time.time()
+                    item.graph = build_graph(
+                        item.video_path, catalog=catalog, stream_agent=False, **options
+                    )
+
+                if index == len(STAGES) - 1:
+                    outputs = run_graph(item.graph, item.video_path, [target], catalog, final=True)
+                    item.clips = len(outputs[target])
+                elif target in item.graph.plan(['clips']):
+                    # Cached outputs (e.g. the transcript) skip their stages
+                    run_graph(item.graph, item.video_path, [target], catalog)
+
+                if target == 'transcript':
+                    # The decoded audio is not needed anymore
+                    item.graph.forget('audio')
+            except Exception as e:
+                item.error = f'{type(e).__name__}: {e}'
+                traceback.print_exc()
+
+            item.stage_seconds[stage] = time.perf_counter() - started
+
+            if item.error is not None or index == len(STAGES) - 1:
+                item.finished = time.time()
+                item.graph = None
+                with lock:
+                    finished.append(item)
+                status = 'failed' if item.error else f'{item.clips} clips'
+                print(f'[{len(finished)}/{len(videos)}] {os.path.basename(item.video_path)}: {status}')
+            else:
+                # Blocks while the next stage is saturated
+                queues[index + 1].put(item)
+
+        # The last worker of a stage closes the next one
+        with lock:
+            remaining[index] -= 1
+            closing = remaining[index] == 0
+        if closing and index + 1 < len(STAGES):
+            for _ in range(workers[STAGES[index + 1][0]]):
+                queues[index + 1].put(None)
+
+    threads = [
+        threading.Thread(target=work, args=(index,), name=f'batch-{stage}-{n}')
+        for index, (stage, _) in enumerate(STAGES)
+        for n in range(workers[stage])
+    ]
+    for thread in threads:
+        thread.start()
+
+    for video_path in videos:
+        queues[0].put(BatchItem(video_path))
+    for _ in range(workers[STAGES[0][0]]):
+        queues[0].put(None)
+
+    for thread in threads:
+        thread.join()
+
+    return finished
+
+
+def print_summary(items: List[BatchItem], wall_seconds: float):
+    catalog = Catalog()
+    done = [item for item in items if item.error is None]
+    media_seconds = 0.0
+    for item in done:
+        video = catalog.get_video(Catalog.video_id(item.video_path))
+        media_seconds += (video.duration or 0.0) if video else 0.0
+
+    print()
+    print(f'{len(done)} videos processed, {len(items) - len(done)} failed, {wall_seconds:.1f}s wall time')
+    if done:
+        print(f'{len(done) / wall_seconds * 3600:.1f} videos/hour, '
+              f'{media_seconds / wall_seconds:.1f} media seconds per second')
+
+    for stage, _ in STAGES:
+        busy = [item.stage_seconds[stage] for item in items if stage in item.stage_seconds]
+        if busy:
+            print(f'  {stage:<11} {sum(busy):9.1f}s busy  {sum(busy) / len(busy):8.1f}s per video')
+
+    for item in items:
+        if item.error is not None:
+            print(f'  FAILED {item.video_path}: {item.error}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Processes many videos with overlapping pipeline stages")
+    parser.add_argument('inputs', nargs='+', help="Directories (of .mp4 files) or glob patterns")
+    parser.add_argument('--audio-workers', type=int, default=2)
+    parser.add_argument('--transcribe-workers', type=int, default=1)
+    parser.add_argument('--agent-workers', type=int, default=4)
+    parser.add_argument('--render-workers', type=int, default=2)
+    parser.add_argument('--queue-size', type=int, default=2)
+    parser.add_argument('--language', default='portuguese')
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--chunked-agent', action='store_true')
+    parser.add_argument('--reencode', action='store_true')
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        parser.error('No videos found')
+
+    started = time.perf_counter()
+    items = run_batch(
+        videos,
+        workers={
+            'audio': args.audio_workers,
+            'transcribe': args.transcribe_workers,
+            'agent': args.agent_workers,
+            'render': args.render_workers,
+        },
+        queue_size=args.queue_size,
+        language=args.language,
+        model=args.model,
+        chunked_agent=args.chunked_agent,
+        reencode=args.reencode
+    )
+    print_summary(items, time.perf_counter() - started)
@@ -0,0 +1,185 @@
+"""
+Offline benchmark of the viral-cut stages on synthetic media.
+
+Videos are generated with ffmpeg's lavfi sources, the agent answers with a
+fake chat model and Whisper can be stubbed, so runs need neither network
+nor real footage. Every stage is timed and the results are written to JSON
+to compare runs:
+
+    python benchmark.py --durations 60 600 --whisper stub
+    python benchmark.py --durations 300 --whisper tiny --reencode
+"""
+import os
+import json
+import time
+import wave
+import argparse
+import platform
+import tempfile
+
+import ffmpeg
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from core.video_handler import mp4_to_wav, cut_video
+from core.transcription import transcribe, SAMPLE_RATE
+from core.model_registry import registry
+from core.agent import ViralCutAgent
+from core.llm_cache import LLMCache
+from core.prompt_format import compact_transcription
+
+
+SEGMENT_SECONDS = 5.0
+
+
+def make_video(path: str, seconds: float, size: str = '640x360', rate: int = 25):
+    """Synthetic test pattern video with a sine tone, keyframes every 2s."""
+    video = ffmpeg.input(f'testsrc2=size={size}:rate={rate}', f='lavfi', t=seconds)
+    audio = ffmpeg.input('sine=frequency=440:sample_rate=44100', f='lavfi', t=seconds)
+    (
+        ffmpeg
+        .output(video, audio, path, vcodec='libx264', preset='ultrafast', g=rate * 2, acodec='aac')
+        .overwrite_output()
+        .run(quiet=True)
+    )
+
+
+class StubWhisper:
+    """Stands in for a Whisper model: one fixed segment every SEGMENT_SECONDS."""
+
+    def transcribe(self, audio, **options) -> dict:
+        if isinstance(audio, str):
+            with wave.open(audio, 'rb') as f:
+                duration = f.getnframes() / f.getframerate()
+        else:
+            duration = len(audio) / SAMPLE_RATE
+
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + SEGMENT_SECONDS, duration)
+            segments.append({'start': start, 'end': end, 'text': ' Uma frase de teste.'})
+            start = end
+
+        return {
+            'text': ''.join(s['text'] for s in segments),
+            'segments': segments,
+            'language': options.get('language')
+        }
+
+
+def fake_response(duration: float) -> str:
+    """The agent's answer: a 60-90s clip every 120s of video."""
+    clips = []
+    start = 0.0
+    while start + 60 <= duration:
+        clips.append({
+            'title': f'Clip {len(clips) + 1}',
+            'explanation': 'Synthetic clip',
+            'start_time': start,
+            'end_time': min(start + 60 + 30 * (len(clips) % 2), duration)
+        })
+        start += 120
+    return json.dumps(clips)
+
+
+def _children_cpu() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def timed(timings: dict, stage: str, func, *args, **kwargs):
+    # ffmpeg runs in child processes, their CPU time is reported apart
+    wall, cpu, children = time.perf_counter(), time.process_time(), _children_cpu()
+    result = func(*args, **kwargs)
+    timings[stage] = {
+        'seconds': time.perf_counter() - wall,
+        'cpu_seconds': time.process_time() - cpu,
+        'child_cpu_seconds': _children_cpu() - children
+    }
+    return result
+
+
+def bench_video(seconds: float, workdir: str, whisper_model: str, reencode: bool) -> dict:
+    video_path = os.path.join(workdir, f'synthetic_{int(seconds)}.mp4')
+    audio_path = os.path.join(workdir, f'synthetic_{int(seconds)}.wav')
+    if not os.path.exists(video_path):
+        make_video(video_path, seconds)
+
+    timings = {}
+    timed(timings, 'mp4_to_wav', mp4_to_wav, input_file=video_path, output_file=audio_path)
+
+    if whisper_model == 'stub':
+        # Warms the registry slot transcribe() reads, so no model is loaded
+        registry.get(('whisper', 'stub', 'cpu', 'float32'), StubWhisper)
+    transcription = timed(
+        timings, 'transcribe', transcribe,
+        audio=audio_path, model=whisper_model, device='cpu'
+    )
+
+    agent = ViralCutAgent(
+        llm=FakeListChatModel(responses=[fake_response(seconds)]),
+        cache=LLMCache(os.path.join(workdir, 'llm_cache.db'))
+    )
+    cuts = timed(
+        timings, 'agent', agent.invoke,
+        transcription=compact_transcription(transcription.to_text()),
+        bypass_cache=True
+    )
+
+    def cut_all():
+        for i, cut in enumerate(cuts):
+            output_file = os.path.join(workdir, f'synthetic_{int(seconds)}_{i}.mp4')
+            cut_video(video_path, output_file, cut['start_time'], cut['end_time'], reencode=reencode)
+
+    timed(timings, 'cut_video', cut_all)
+
+    total = sum(t['seconds'] for t in timings.values())
+    for t in timings.values():
+        t['media_seconds_per_second'] = seconds / t['seconds'] if t['seconds'] else None
+
+    return {
+        'media_seconds': seconds,
+        'clips': len(cuts),
+        'whisper': whisper_model,
+        'reencode': reencode,
+        'stages': timings,
+        'total_seconds': total,
+        'media_seconds_per_second': seconds / total if total else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the viral-cut stages on synthetic videos")
+    parser.add_argument('--durations', type=float, nargs='+', default=[60, 300])
+    parser.add_argument('--whisper', default='stub', help="'stub' or a Whisper model name, e.g. tiny")
+    parser.add_argument('--reencode', action='store_true')
+    parser.add_argument('--workdir', default=None, help="Keeps the synthetic media between runs")
+    parser.add_argument('--output', default=f'benchmarks/{time.strftime("%Y%m%d-%H%M%S")}.json')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='viral-cut-bench-')
+    os.makedirs(workdir, exist_ok=True)
+
+    runs = []
+    for seconds in args.durations:
+        run = bench_video(seconds, workdir, args.whisper, args.reencode)
+        runs.append(run)
+
+        print(f"{seconds:.0f}s video, {run['clips']} clips: {run['media_seconds_per_second']:.1f}x realtime")
+        for stage, t in run['stages'].items():
+            print(f"  {stage:<12} {t['seconds']:8.3f}s  {t['media_seconds_per_second']:8.1f}x")
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created': time.time(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'python': platform.python_version(),
+            'runs': runs
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
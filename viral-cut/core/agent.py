@@ -1,16 +1,203 @@
 import os
 import json
+import math
+from typing import Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
+from core.llm_cache import LLMCache
+from core.prompt_format import count_tokens, parse_transcription
+from core.instrumentation import metrics
+
+
+MIN_CLIP_SECONDS = 60
+MAX_CLIP_SECONDS = 300
+
+
+def split_transcription(transcription: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    Splits a timestamped transcription into windows of at most `chunk_size`
+    tokens, never breaking a line. Consecutive windows share roughly
+    `overlap` tokens of lines, so clips crossing a boundary are seen whole.
+    """
+    lines = [line for line in transcription.split('\n') if line.strip()]
+    sizes = [count_tokens(line) for line in lines]
+
+    windows = []
+    start = 0
+    while start < len(lines):
+        end = start
+        total = 0
+        while end < len(lines) and (end == start or total + sizes[end] <= chunk_size):
+            total += sizes[end]
+            end += 1
+
+        windows.append('\n'.join(lines[start:end]))
+        if end == len(lines):
+            break
+
+        # Step back from the end while staying within the overlap budget
+        next_start = end
+        carried = 0
+        while next_start - 1 > start and carried + sizes[next_start - 1] <= overlap:
+            next_start -= 1
+            carried += sizes[next_start]
+        start = next_start
+
+    return windows
+
+
+def window_ranges(windows: List[str]) -> List[Tuple[float, float]]:
+    """
+    (start, end) seconds of each window of split_transcription, read from
+    its timestamped lines. A window without any gets the end of the
+    previous one.
+    """
+    ranges = []
+    for window in windows:
+        segments = parse_transcription(window)
+        if segments:
+            ranges.append((segments[0][0], max(end for _, end, _ in segments)))
+        else:
+            previous = ranges[-1][1] if ranges else 0.0
+            ranges.append((previous, previous))
+    return ranges
+
+
+def same_moment(a: dict, b: dict, min_overlap: float = 0.5) -> bool:
+    """Whether clips `a` and `b` share at least `min_overlap` of the shorter one."""
+    intersection = min(a['end_time'], b['end_time']) - max(a['start_time'], b['start_time'])
+    shorter = min(a['end_time'] - a['start_time'], b['end_time'] - b['start_time'])
+    return shorter > 0 and intersection / shorter >= min_overlap
+
+
+def merge_clips(clips: List[dict], min_overlap: float = 0.5) -> List[dict]:
+    """
+    De-duplicates clips found by overlapping windows. Two clips sharing at
+    least `min_overlap` of the shorter one are the same moment: they become
+    their union when it still fits MAX_CLIP_SECONDS, otherwise the longer
+    clip is kept. The longer clip's title and explanation win.
+    """
+    merged = []
+    for clip in sorted(clips, key=lambda c: (c['start_time'], c['end_time'])):
+        if merged and same_moment(merged[-1], clip, min_overlap):
+            last = merged[-1]
+            longer = max(last, clip, key=lambda c: c['end_time'] - c['start_time'])
+            start = min(last['start_time'], clip['start_time'])
+            end = max(last['end_time'], clip['end_time'])
+            if end - start <= MAX_CLIP_SECONDS:
+                merged[-1] = {**longer, 'start_time': start, 'end_time': end}
+            else:
+                merged[-1] = longer
+            continue
+
+        merged.append(clip)
+
+    return merged
+
+
+def validate_clip(raw: str) -> Optional[dict]:
+    """
+    Parses one clip object from the model output. Returns None when it is
+    malformed, lacks numeric start/end times or has an empty time range.
+    """
+    try:
+        clip = json.loads(raw)
+        start_time = float(clip['start_time'])
+        end_time = float(clip['end_time'])
+    except (ValueError, TypeError, KeyError):
+        return None
+
+    if end_time <= start_time:
+        return None
+
+    return {
+        **clip,
+        'title': str(clip.get('title', '')),
+        'explanation': str(clip.get('explanation', '')),
+        'start_time': start_time,
+        'end_time': end_time
+    }
+
+
+class ClipStreamParser:
+    """
+    Incremental parser for the JSON list of clips the model writes. Text is
+    fed as it streams in and every clip object is returned as soon as its
+    closing brace arrives. Markdown fences and prose around the list are
+    ignored, and a malformed clip is skipped instead of failing the rest.
+    """
 
-class ViralCutAgent:
     def __init__(self):
+        self.buffer = ''
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.object_start = None
+        self.skipped = 0
+
+    def feed(self, text: str) -> List[dict]:
+        self.buffer += text
+        clips = []
+
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"' and self.depth > 0:
+                self.in_string = True
+            elif char in '[{':
+                if char == '{' and self.depth == 1:
+                    self.object_start = self.position
+                self.depth += 1
+            elif char in ']}' and self.depth > 0:
+                self.depth -= 1
+                if char == '}' and self.depth == 1 and self.object_start is not None:
+                    clip = validate_clip(self.buffer[self.object_start:self.position + 1])
+                    if clip is None:
+                        self.skipped += 1
+                    else:
+                        clips.append(clip)
+                    self.object_start = None
+
+            self.position += 1
+
+        # Only the object being read has to be kept around
+        keep = self.object_start if self.object_start is not None else self.position
+        self.buffer = self.buffer[keep:]
+        self.position -= keep
+        if self.object_start is not None:
+            self.object_start = 0
+
+        return clips
+
+
+class ViralCutAgent:
+    # Bump whenever the prompt changes, it is part of the cut list cache key
+    PROMPT_VERSION = 3
+
+    def __init__(self, llm=None, cache: LLMCache = None):
         load_dotenv()
 
         self.CHUNK_SIZE = 1500
+        self.CHUNK_OVERLAP = 300
+
+        clip_format = """Your output must be a JSON-structured list, where each item contains:
+        - explanation [str]: Why this segment is potentially viral
+        - title [str]: An attention-grabbing title for the clip (good for posting on YouTube, for example).
+            Try some click baits.
+            Add UPPERCASE words to emphatize the important ones.
+        - start_time [float]: Start time of the segment (in seconds)
+        - end_time [float]: End time of the segment (in seconds)"""
 
         prompt_template_str = """
         You are a digital marketing and viral content expert.
@@ -25,34 +212,166 @@ class ViralCutAgent:
         - Clips duration is at greater than 60 seconds and lower than 300 seconds
         - Create AT LEAST (<DURATION OF VIDEO> / 300 seconds) clips. For example: for a 3600 seconds video, AT LEAST 12 clips.
 
-        Your output must be a JSON-structured list, where each item contains:
-        - explanation [str]: Why this segment is potentially viral
-        - title [str]: An attention-grabbing title for the clip (good for posting on YouTube, for example).
-            Try some click baits.
-            Add UPPERCASE words to emphatize the important ones.
-        - start_time [float]: Start time of the segment (in seconds)
-        - end_time [float]: End time of the segment (in seconds)
+        {clip_format}
 
         Podcast audio transcription:
         {transcription}
 
         Return ONLY the JSON list of identified segments, with no additional explanations or text.
         """
-        prompt = ChatPromptTemplate.from_template(prompt_template_str)
 
-        llm = ChatOpenAI(
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            model_name="gpt-4o",
-            temperature=0.9
-        )
+        # invoke_chunked sends each window on its own: it must only find the
+        # window's share of the clips, inside the window
+        window_template_str = """
+        You are a digital marketing and viral content expert.
+        You received one part of a longer podcast: it covers {window_start} to {window_end} seconds
+        of a {duration} seconds episode. The other parts are analyzed separately.
+        Identify moments of this part that can be turned into viral social media clips.
+
+        Output should be in {language}
+
+        Criteria:
+        - Funny, controversial, emotional, or inspiring segments
+        - Catchy phrases, intriguing questions, revelations
+        - Clips duration is at greater than 60 seconds and lower than 300 seconds
+        - Clips start and end between {window_start} and {window_end} seconds
+        - Create {clip_count} clips, this part's share of the episode's clips
+
+        {clip_format}
+
+        Podcast audio transcription of this part:
+        {transcription}
+
+        Return ONLY the JSON list of identified segments, with no additional explanations or text.
+        """
+        prompt = ChatPromptTemplate.from_template(prompt_template_str).partial(clip_format=clip_format)
 
+        if llm is None:
+            llm = ChatOpenAI(
+                openai_api_key=os.getenv("OPENAI_API_KEY"),
+                model_name="gpt-4o",
+                temperature=0.9
+            )
+
+        self.prompt = prompt
+        self.window_prompt = ChatPromptTemplate.from_template(window_template_str).partial(
+            clip_format=clip_format
+        )
+        self.llm = llm
         self.chain = prompt | llm
+        self.cache = cache or LLMCache()
+
+
+    def invoke(
+        self,
+        transcription: str,
+        language: str = 'portuguese',
+        chunked: bool = False,
+        max_concurrency: int = 4,
+        bypass_cache: bool = False
+    ):
+        """
+        Identical prompts are answered from the LLM cache; `bypass_cache`
+        asks the model for a new sample.
+        """
+        with metrics.span('viral-cut.agent', chunked=chunked) as span:
+            if chunked:
+                clips = self.invoke_chunked(transcription, language, max_concurrency, bypass_cache)
+            else:
+                content = self.cache.invoke(
+                    self.prompt,
+                    self.llm,
+                    {"language": language, "transcription": transcription},
+                    bypass=bypass_cache
+                )
+                clips = self._parse(content)
+
+            span['clips'] = len(clips)
+            return clips
 
+    def invoke_chunked(
+        self,
+        transcription: str,
+        language: str = 'portuguese',
+        max_concurrency: int = 4,
+        bypass_cache: bool = False
+    ) -> List[dict]:
+        """
+        Map-reduce over the transcription: each window of CHUNK_SIZE tokens
+        is sent as its own prompt (see window_inputs), at most
+        `max_concurrency` at a time, and the clips of all windows are merged
+        and de-duplicated.
+        """
+        contents = self.cache.batch(
+            self.window_prompt,
+            self.llm,
+            self.window_inputs(transcription, language),
+            config={"max_concurrency": max_concurrency},
+            bypass=bypass_cache
+        )
 
-    def invoke(self, transcription: str, language: str = 'portuguese'):
-        response = self.chain.invoke({"language": language, "transcription": transcription})
+        clips = []
+        for content in contents:
+            clips.extend(self._parse(content))
+
+        return merge_clips(clips)
+
+    def window_inputs(self, transcription: str, language: str = 'portuguese') -> List[dict]:
+        """
+        Prompt inputs of the invoke_chunked windows. Each window is told its
+        time range and its share of the duration / MAX_CLIP_SECONDS clips the
+        full prompt asks for, in proportion to the part of the timeline it
+        owns (up to where the next window starts), and at least one.
+        """
+        windows = split_transcription(transcription, self.CHUNK_SIZE, self.CHUNK_OVERLAP)
+        ranges = window_ranges(windows)
+        duration = max((end for _, end in ranges), default=0.0)
+
+        own_ends = [next_start for next_start, _ in ranges[1:]] + [ranges[-1][1]] if ranges else []
+        shares = [(own_end - start) / MAX_CLIP_SECONDS for (start, _), own_end in zip(ranges, own_ends)]
+        counts = [math.floor(share) for share in shares]
+        # Largest remainders first, so the counts add up to the episode's
+        by_remainder = sorted(range(len(shares)), key=lambda i: counts[i] - shares[i])
+        for i in by_remainder[:round(sum(shares)) - sum(counts)]:
+            counts[i] += 1
+
+        return [
+            {
+                "language": language,
+                "transcription": window,
+                "window_start": round(start),
+                "window_end": round(end),
+                "duration": round(duration),
+                "clip_count": max(1, count)
+            }
+            for window, (start, end), count in zip(windows, ranges, counts)
+        ]
+
+    def stream(
+        self,
+        transcription: str,
+        language: str = 'portuguese',
+        bypass_cache: bool = False
+    ) -> Iterator[dict]:
+        """
+        Streams the completion and yields each validated clip as soon as the
+        model closes it, so callers can start cutting clip 1 while clip 12
+        is still being generated.
+        """
+        with metrics.span('viral-cut.agent', streamed=True):
+            parser = ClipStreamParser()
+            chunks = self.cache.stream(
+                self.prompt,
+                self.llm,
+                {"language": language, "transcription": transcription},
+                bypass=bypass_cache
+            )
+            for chunk in chunks:
+                for clip in parser.feed(chunk):
+                    metrics.annotate(clips=1)
+                    yield clip
 
-        content = response.content
-        content = content.replace('```json', '').replace('```', '')
+    @staticmethod
+    def _parse(content: str) -> List[dict]:
+        return ClipStreamParser().feed(content)
 
-        return json.loads(content)
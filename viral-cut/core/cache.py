@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import closing, contextmanager
+from typing import Dict, Optional
+
+
+CACHE_DIR = 'cache'
+
+# Stages without a limit are never garbage collected
+DEFAULT_LIMITS_MB = {
+    'audio': float(os.getenv('CACHE_AUDIO_LIMIT_MB', '5120')),
+}
+
+
+class Fingerprint:
+    """
+    Fast content hash of a (possibly multi-GB) file. Small files are hashed
+    whole; bigger ones hash their size plus `samples` evenly spaced chunks of
+    `sample_size` bytes, which is enough to tell apart two uploads sharing a
+    name without reading the whole video.
+
+    Bytes are fed with `update`, either sequentially (e.g. while copying an
+    upload) or by `offset`, only the sampled ranges are hashed.
+    """
+
+    def __init__(self, size: int, sample_size: int = 1024 * 1024, samples: int = 16):
+        self.digest = hashlib.blake2b(digest_size=16)
+        self.digest.update(str(size).encode())
+        self.position = 0
+
+        if size <= sample_size * samples:
+            self.ranges = [(0, size)]
+        else:
+            step = (size - sample_size) // (samples - 1)
+            self.ranges = [(i * step, i * step + sample_size) for i in range(samples)]
+
+    def update(self, chunk: bytes, offset: Optional[int] = None):
+        if offset is not None:
+            self.position = offset
+
+        start, end = self.position, self.position + len(chunk)
+        for lo, hi in self.ranges:
+            if lo < end and hi > start:
+                self.digest.update(chunk[max(lo, start) - start:min(hi, end) - start])
+        self.position = end
+
+    def hexdigest(self) -> str:
+        return self.digest.hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    fingerprint = Fingerprint(os.path.getsize(path))
+    with open(path, 'rb') as f:
+        for lo, hi in fingerprint.ranges:
+            f.seek(lo)
+            fingerprint.update(f.read(hi - lo), offset=lo)
+    return fingerprint.hexdigest()
+
+
+def cache_key(*parts) -> str:
+    """Stable key for a stage, built from its inputs and parameters."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ArtifactCache:
+    """
+    Content-addressed store of pipeline artifacts (WAVs, transcripts, cut
+    lists). Every artifact is recorded in an SQLite manifest with its size
+    and last access time, shared safely by every thread and process (app,
+    workers, batch runs); stages with a size limit are garbage collected
+    least recently used first.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, limits_mb: Optional[Dict[str, float]] = None):
+        self.root = root
+        self.limits_mb = DEFAULT_LIMITS_MB if limits_mb is None else limits_mb
+        self.db_path = os.path.join(root, 'manifest.db')
+        os.makedirs(root, exist_ok=True)
+
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    stage TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    params TEXT NOT NULL DEFAULT '{}',
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (stage, key)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS artifacts_lru ON artifacts (stage, last_access)')
+        self._import_json_manifest()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE: concurrent writers queue up instead of losing entries
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def _import_json_manifest(self):
+        # Manifest written by earlier versions, imported once
+        json_path = os.path.join(self.root, 'manifest.json')
+        if not os.path.exists(json_path):
+            return
+        with open(json_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        with self._transaction() as conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (e['stage'], e['key'], e['path'], e['size'], json.dumps(e.get('params', {})),
+                     e['created'], e['last_access'])
+                    for e in entries.values()
+                ]
+            )
+        os.replace(json_path, f'{json_path}.imported')
+
+    def get(self, stage: str, key: str) -> Optional[str]:
+        """Returns the artifact path for (stage, key), or None on a miss."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT path FROM artifacts WHERE stage = ? AND key = ?', (stage, key)
+            ).fetchone()
+            if row is None:
+                return None
+
+            if not os.path.exists(row[0]):
+                conn.execute('DELETE FROM artifacts WHERE stage = ? AND key = ?', (stage, key))
+                return None
+
+            conn.execute(
+                'UPDATE artifacts SET last_access = ? WHERE stage = ? AND key = ?', (time.time(), stage, key)
+            )
+            return row[0]
+
+    def put(self, stage: str, key: str, path: str, params: Optional[dict] = None) -> str:
+        """Records the artifact at `path`, then garbage collects its stage."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (stage, key, path, os.path.getsize(path), json.dumps(params or {}, default=str), now, now)
+            )
+            self._gc(conn, stage)
+        return path
+
+    def gc(self):
+        with self._transaction() as conn:
+            for stage in self.limits_mb:
+                self._gc(conn, stage)
+
+    def _gc(self, conn: sqlite3.Connection, stage: str):
+        limit_mb = self.limits_mb.get(stage)
+        if limit_mb is None:
+            return
+
+        rows = conn.execute(
+            'SELECT key, path, size FROM artifacts WHERE stage = ? ORDER BY last_access', (stage,)
+        ).fetchall()
+        total = sum(size for _, _, size in rows)
+
+        # Always keep the most recent artifact, even if it is over the limit
+        for key, path, size in rows[:-1]:
+            if total <= limit_mb * 1024 * 1024:
+                break
+            conn.execute('DELETE FROM artifacts WHERE stage = ? AND key = ?', (stage, key))
+            total -= size
+            if os.path.exists(path):
+                os.remove(path)
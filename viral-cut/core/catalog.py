@@ -0,0 +1,316 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+CATALOG_DB = 'catalog.db'
+
+PROCESSING = 'processing'
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+
+CLIP_ORDERS = {
+    'newest': 'c.created_at DESC, c.idx',
+    'title': 'c.title COLLATE NOCASE, c.id',
+    'start_time': 'c.video_id, c.start_time',
+    'longest': 'c.duration DESC, c.id',
+    'shortest': 'c.duration, c.id',
+}
+
+
+@dataclass
+class VideoEntry:
+    id: str
+    path: str
+    fingerprint: Optional[str]
+    duration: Optional[float]
+    size: Optional[int]
+    clips: int
+    status: str
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+
+
+@dataclass
+class ClipEntry:
+    id: int
+    video_id: str
+    idx: int
+    title: str
+    explanation: str
+    start_time: float
+    end_time: float
+    duration: float
+    path: str
+    size: Optional[int]
+    status: str
+    error: Optional[str]
+    created_at: float
+
+
+class Catalog:
+    """
+    SQLite catalog of the processed videos and their clips, written by the
+    pipeline and queried by the app with pagination, sorting and full text
+    search over clip titles and explanations (FTS5, or LIKE when the SQLite
+    build lacks it), so pages don't scan folders or reload JSON files.
+
+    Videos are identified by their file name, like their clips on disk.
+    """
+
+    def __init__(self, db_path: str = CATALOG_DB):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS videos (
+                    id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    fingerprint TEXT,
+                    duration REAL,
+                    size INTEGER,
+                    clips INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS clips (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    video_id TEXT NOT NULL REFERENCES videos (id),
+                    idx INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    explanation TEXT NOT NULL,
+                    start_time REAL NOT NULL,
+                    end_time REAL NOT NULL,
+                    duration REAL NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    UNIQUE (video_id, idx)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS clips_created ON clips (created_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS clips_duration ON clips (duration)')
+            conn.execute('CREATE INDEX IF NOT EXISTS videos_updated ON videos (updated_at)')
+
+            try:
+                # External content index, kept in sync by triggers
+                conn.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS clips_fts USING fts5 (
+                        title, explanation, content='clips', content_rowid='id'
+                    )
+                ''')
+                conn.executescript('''
+                    CREATE TRIGGER IF NOT EXISTS clips_fts_insert AFTER INSERT ON clips BEGIN
+                        INSERT INTO clips_fts (rowid, title, explanation)
+                        VALUES (new.id, new.title, new.explanation);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS clips_fts_delete AFTER DELETE ON clips BEGIN
+                        INSERT INTO clips_fts (clips_fts, rowid, title, explanation)
+                        VALUES ('delete', old.id, old.title, old.explanation);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS clips_fts_update AFTER UPDATE OF title, explanation ON clips BEGIN
+                        INSERT INTO clips_fts (clips_fts, rowid, title, explanation)
+                        VALUES ('delete', old.id, old.title, old.explanation);
+                        INSERT INTO clips_fts (rowid, title, explanation)
+                        VALUES (new.id, new.title, new.explanation);
+                    END;
+                ''')
+                self.full_text = True
+            except sqlite3.OperationalError:
+                self.full_text = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def video_id(path: str) -> str:
+        return os.path.basename(path)
+
+    def upsert_video(
+        self,
+        path: str,
+        fingerprint: Optional[str] = None,
+        status: str = PROCESSING,
+        duration: Optional[float] = None
+    ) -> str:
+        """Records `path` (keeping its known duration and size) and returns its id."""
+        video_id = self.video_id(path)
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                INSERT INTO videos (id, path, fingerprint, duration, size, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    path = excluded.path,
+                    fingerprint = COALESCE(excluded.fingerprint, fingerprint),
+                    duration = COALESCE(excluded.duration, duration),
+                    size = COALESCE(excluded.size, size),
+                    status = excluded.status,
+                    error = NULL,
+                    updated_at = excluded.updated_at
+            ''', (video_id, path, fingerprint, duration, size, status, now, now))
+        return video_id
+
+    def update_video(self, video_id: str, **fields):
+        """Sets `fields` (status, error, duration...) of a video."""
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                f'UPDATE videos SET {assignments} WHERE id = ?',
+                (*fields.values(), video_id)
+            )
+
+    def set_clips(self, video_id: str, cuts: List[dict], paths: List[str]):
+        """Replaces the clips of a video with `cuts`, rendered to `paths`."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM clips WHERE video_id = ?', (video_id,))
+            conn.executemany('''
+                INSERT INTO clips (
+                    video_id, idx, title, explanation, start_time, end_time,
+                    duration, path, status, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    video_id, i, cut.get('title', ''), cut.get('explanation', ''),
+                    cut['start_time'], cut['end_time'], cut['end_time'] - cut['start_time'],
+                    path, PENDING, now
+                )
+                for i, (cut, path) in enumerate(zip(cuts, paths))
+            ])
+            conn.execute(
+                'UPDATE videos SET clips = ?, updated_at = ? WHERE id = ?',
+                (len(cuts), now, video_id)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def update_clip(self, video_id: str, idx: int, success: bool, error: Optional[str] = None):
+        """Records the render result of a clip, with its file size."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT path FROM clips WHERE video_id = ? AND idx = ?', (video_id, idx)
+            ).fetchone()
+            if row is None:
+                return
+            size = os.path.getsize(row['path']) if success and os.path.exists(row['path']) else None
+            conn.execute(
+                'UPDATE clips SET status = ?, size = ?, error = ? WHERE video_id = ? AND idx = ?',
+                (READY if success else FAILED, size, error, video_id, idx)
+            )
+
+    def get_video(self, video_id: str) -> Optional[VideoEntry]:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM videos WHERE id = ?', (video_id,)).fetchone()
+        return VideoEntry(**dict(row)) if row else None
+
+    def get_clip(self, clip_id: int) -> Optional[ClipEntry]:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM clips WHERE id = ?', (clip_id,)).fetchone()
+        return ClipEntry(**dict(row)) if row else None
+
+    def count_videos(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+
+    def list_videos(self, limit: int = 20, offset: int = 0) -> List[VideoEntry]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT * FROM videos ORDER BY updated_at DESC LIMIT ? OFFSET ?', (limit, offset)
+            ).fetchall()
+        return [VideoEntry(**dict(row)) for row in rows]
+
+    def search_clips(
+        self,
+        query: str = '',
+        video_id: Optional[str] = None,
+        order: str = 'newest',
+        limit: int = 20,
+        offset: int = 0
+    ) -> Tuple[List[ClipEntry], int]:
+        """
+        One page of clips matching `query` (over titles and explanations)
+        and/or `video_id`, ordered by one of CLIP_ORDERS ('relevance' ranks
+        full text matches), and the total number of matches.
+        """
+        joins, conditions, params = [], [], []
+        query = query.strip()
+        if query and self.full_text:
+            # Every word is matched as a prefix, quoted to escape FTS syntax
+            terms = ' '.join('"{}"*'.format(word.replace('"', '""')) for word in query.split())
+            joins.append('JOIN clips_fts ON clips_fts.rowid = c.id')
+            conditions.append('clips_fts MATCH ?')
+            params.append(terms)
+        elif query:
+            conditions.append("(c.title LIKE ? ESCAPE '\\' OR c.explanation LIKE ? ESCAPE '\\')")
+            pattern = '%{}%'.format(query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+            params.extend([pattern, pattern])
+
+        if video_id is not None:
+            conditions.append('c.video_id = ?')
+            params.append(video_id)
+
+        if order == 'relevance' and query and self.full_text:
+            order_by = 'clips_fts.rank'
+        else:
+            order_by = CLIP_ORDERS.get(order, CLIP_ORDERS['newest'])
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        join = ' '.join(joins)
+        with closing(self._connect()) as conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM clips c {join} {where}', params).fetchone()[0]
+            rows = conn.execute(
+                f'SELECT c.* FROM clips c {join} {where} ORDER BY {order_by} LIMIT ? OFFSET ?',
+                (*params, limit, offset)
+            ).fetchall()
+        return [ClipEntry(**dict(row)) for row in rows], total
+
+    def import_folder(self, folder: str = 'video_cuts') -> int:
+        """
+        Catalogs the cut lists (`<video>.json`) of runs made before the
+        catalog existed. Returns how many videos were imported.
+        """
+        if not os.path.isdir(folder):
+            return 0
+
+        imported = 0
+        for json_file in sorted(os.listdir(folder)):
+            if not json_file.endswith('.json'):
+                continue
+            video_id = self.video_id(json_file[:-len('.json')])
+            if self.get_video(video_id) is not None:
+                continue
+
+            with open(os.path.join(folder, json_file), 'r', encoding='utf-8') as f:
+                cuts = json.load(f)
+            paths = [os.path.join(folder, f'{video_id}_{i}.mp4') for i in range(len(cuts))]
+
+            self.upsert_video(os.path.join('videos', video_id), status=READY)
+            self.set_clips(video_id, cuts, paths)
+            for i, path in enumerate(paths):
+                self.update_clip(video_id, i, os.path.exists(path))
+            imported += 1
+
+        return imported
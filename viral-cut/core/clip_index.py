@@ -0,0 +1,105 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from core.agent import MIN_CLIP_SECONDS, MAX_CLIP_SECONDS
+
+
+SENTENCE_END = ('.', '!', '?', '…')
+
+
+class ClipIndex:
+    """
+    Sorted boundary index of one video: where its sentences start and end
+    (from the Whisper segments) and where its keyframes are. Clip times
+    proposed by the agent are snapped onto it with binary searches, so each
+    clip costs O(log n) however long the video is.
+
+    A sentence starts at the first segment and after every segment ending in
+    sentence punctuation; when the transcript has no punctuation at all,
+    every segment counts as a sentence.
+    """
+
+    def __init__(
+        self,
+        segments: List[Tuple[float, float, str]],
+        keyframes: Optional[np.ndarray] = None,
+        duration: Optional[float] = None
+    ):
+        segments = sorted((s for s in segments if s[1] > s[0]), key=lambda s: s[0])
+        closes = [text.rstrip().endswith(SENTENCE_END) for _, _, text in segments]
+        if not any(closes):
+            closes = [True] * len(segments)
+
+        self.starts = np.unique([
+            start for i, (start, _, _) in enumerate(segments) if i == 0 or closes[i - 1]
+        ]).astype(np.float64)
+        # The transcript's last segment always closes a sentence
+        self.ends = np.unique(
+            [end for (_, end, _), closed in zip(segments, closes) if closed]
+            + ([segments[-1][1]] if segments else [])
+        ).astype(np.float64)
+        self.keyframes = np.unique(
+            np.asarray(keyframes if keyframes is not None else [], dtype=np.float64)
+        )
+        self.duration = duration or (float(self.ends[-1]) if self.ends.size else None)
+
+    @staticmethod
+    def _nearest(points: np.ndarray, t: float) -> float:
+        if not points.size:
+            return t
+        i = int(np.searchsorted(points, t))
+        candidates = points[max(i - 1, 0):i + 1]
+        return float(candidates[np.argmin(np.abs(candidates - t))])
+
+    @staticmethod
+    def _floor(points: np.ndarray, t: float) -> Optional[float]:
+        i = int(np.searchsorted(points, t, side='right')) - 1
+        return float(points[i]) if i >= 0 else None
+
+    @staticmethod
+    def _ceil(points: np.ndarray, t: float) -> Optional[float]:
+        i = int(np.searchsorted(points, t, side='left'))
+        return float(points[i]) if i < points.size else None
+
+    def _keyframe_start(self, start: float) -> float:
+        # Stream copy begins at the keyframe before the requested start
+        keyframe = self._floor(self.keyframes, start)
+        return keyframe if keyframe is not None else start
+
+    def snap(self, start: float, end: float) -> Tuple[float, float]:
+        """
+        Moves [start, end] to the nearest sentence start and end, the start
+        back onto a keyframe (when keyframes are known), and then stretches
+        or trims the end to sentence ends so the clip lasts between
+        MIN_CLIP_SECONDS and MAX_CLIP_SECONDS (as far as the video allows).
+        """
+        start = self._keyframe_start(self._nearest(self.starts, start))
+        end = self._nearest(self.ends, end)
+
+        if end - start < MIN_CLIP_SECONDS:
+            end = self._ceil(self.ends, start + MIN_CLIP_SECONDS)
+            if end is None or end - start > MAX_CLIP_SECONDS:
+                end = start + MIN_CLIP_SECONDS
+
+        if end - start > MAX_CLIP_SECONDS:
+            end = self._floor(self.ends, start + MAX_CLIP_SECONDS)
+            if end is None or end - start < MIN_CLIP_SECONDS:
+                end = start + MAX_CLIP_SECONDS
+
+        if self.duration is not None and end > self.duration:
+            end = self.duration
+            if end - start < MIN_CLIP_SECONDS:
+                # Too close to the end of the video, start earlier instead
+                earlier = self._floor(self.starts, end - MIN_CLIP_SECONDS)
+                start = self._keyframe_start(earlier if earlier is not None else 0.0)
+                start = max(start, 0.0)
+
+        return float(start), float(end)
+
+    def snap_clip(self, clip: dict) -> dict:
+        start, end = self.snap(clip['start_time'], clip['end_time'])
+        return {**clip, 'start_time': start, 'end_time': end}
+
+    def snap_clips(self, clips: List[dict]) -> List[dict]:
+        return [self.snap_clip(clip) for clip in clips]
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+JOBS_DB = 'jobs.db'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+@dataclass
+class Job:
+    id: str
+    video_path: str
+    params: dict
+    priority: int
+    status: str
+    progress: float
+    message: Optional[str]
+    error: Optional[str]
+    cancel_requested: bool
+    worker: Optional[str]
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+
+class JobQueue:
+    """
+    Local SQLite-backed queue of videos to process. Jobs are claimed by
+    worker processes (see worker.py) by priority, then age; any process can
+    enqueue, follow or cancel them.
+    """
+
+    def __init__(self, db_path: str = JOBS_DB):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    video_path TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            ''')
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at)'
+            )
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS workers (
+                    id TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    heartbeat_at REAL NOT NULL
+                )
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Job:
+        return Job(**{
+            **dict(row),
+            'params': json.loads(row['params']),
+            'cancel_requested': bool(row['cancel_requested'])
+        })
+
+    def enqueue(self, video_path: str, priority: int = 0, **params) -> str:
+        """Queues `video_path` to be processed with pipeline.process(**params)."""
+        job_id = str(uuid.uuid4())
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, video_path, params, priority, status, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, video_path, json.dumps(params), priority, QUEUED, time.time())
+            )
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """Atomically moves the next queued job to running for `worker`."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT id FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1',
+                (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            conn.execute(
+                'UPDATE jobs SET status = ?, worker = ?, started_at = ? WHERE id = ?',
+                (RUNNING, worker, time.time(), row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        return self.get(row['id'])
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def running(self, worker: str) -> Optional[Job]:
+        """The job `worker` is currently running, if any."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT * FROM jobs WHERE status = ? AND worker = ? ORDER BY started_at DESC LIMIT 1',
+                (RUNNING, worker)
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def list(self, limit: int = 50) -> List[Job]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def update_progress(self, job_id: str, progress: float, message: Optional[str] = None):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'UPDATE jobs SET progress = ?, message = ? WHERE id = ?',
+                (progress, message, job_id)
+            )
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                (status, error, time.time(), job_id)
+            )
+
+    def requeue(self, job_id: str):
+        """Puts a running job back in the queue, e.g. after its worker was killed."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, worker = NULL, started_at = NULL WHERE id = ? AND status = ?',
+                (QUEUED, job_id, RUNNING)
+            )
+
+    def cancel(self, job_id: str):
+        """
+        Cancels a queued job right away; running jobs are flagged and killed
+        by their worker on its next check.
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?',
+                (CANCELLED, time.time(), job_id, QUEUED)
+            )
+            conn.execute(
+                'UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?',
+                (job_id, RUNNING)
+            )
+
+    def heartbeat(self, worker: str):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO workers (id, pid, heartbeat_at) VALUES (?, ?, ?)',
+                (worker, os.getpid(), time.time())
+            )
+
+    def live_workers(self, max_age: float = 30.0) -> int:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT COUNT(*) FROM workers WHERE heartbeat_at > ?', (time.time() - max_age,)
+            ).fetchone()
+        return row[0]
+
+    def requeue_orphans(self, max_age: float = 30.0):
+        """Puts back jobs left running by workers that stopped heartbeating."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, worker = NULL, started_at = NULL '
+                'WHERE status = ? AND worker NOT IN '
+                '(SELECT id FROM workers WHERE heartbeat_at > ?)',
+                (QUEUED, RUNNING, time.time() - max_age)
+            )
@@ -0,0 +1,173 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Iterator, List, Optional
+
+from core.instrumentation import metrics
+from core.prompt_format import count_tokens
+
+
+LLM_CACHE_DB = os.getenv('LLM_CACHE_DB', 'llm_cache.db')
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+
+class LLMCache:
+    """
+    On-disk (SQLite) cache of LLM completions, placed in front of a
+    `prompt | llm` chain. Entries are keyed by the model, its temperature and
+    the fully rendered prompt, expire after `ttl_seconds` and are evicted
+    least recently used first beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        db_path: str = LLM_CACHE_DB,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def key(prompt, llm, inputs: dict) -> str:
+        model = getattr(llm, 'model_name', None) or getattr(llm, 'model', None)
+        temperature = getattr(llm, 'temperature', None)
+        rendered = prompt.invoke(inputs).to_string()
+
+        digest = hashlib.sha256()
+        for part in (type(llm).__name__, str(model), str(temperature), rendered):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT content FROM responses WHERE key = ? AND created_at > ?',
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row else None
+
+    def put(self, key: str, content: str, model: Optional[str] = None):
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, model, content, created_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, model, content, now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute('DELETE FROM responses WHERE created_at <= ?', (now - self.ttl_seconds,))
+        conn.execute('''
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+
+    def invoke(self, prompt, llm, inputs: dict, bypass: bool = False) -> str:
+        """
+        Returns the completion content for `inputs`, calling the model only
+        on a miss. `bypass` always calls it (for a fresh sample) and stores
+        the new response.
+        """
+        return self.batch(prompt, llm, [inputs], bypass=bypass)[0]
+
+    def batch(
+        self,
+        prompt,
+        llm,
+        inputs: List[dict],
+        config: Optional[dict] = None,
+        bypass: bool = False
+    ) -> List[str]:
+        """Like invoke, sending only the misses to the model in one batch."""
+        keys = [self.key(prompt, llm, item) for item in inputs]
+        contents = [None if bypass else self.get(key) for key in keys]
+
+        missing = [i for i, content in enumerate(contents) if content is None]
+        if missing:
+            chain = prompt | llm
+            responses = chain.batch([inputs[i] for i in missing], config=config)
+            model = getattr(llm, 'model_name', None) or getattr(llm, 'model', None)
+            for i, response in zip(missing, responses):
+                contents[i] = response.content
+                self.put(keys[i], response.content, model)
+
+        self._annotate(prompt, [inputs[i] for i in missing], [contents[i] for i in missing], len(inputs))
+        return contents
+
+    @staticmethod
+    def _annotate(prompt, sent: List[dict], responses: List[str], requests: int):
+        # Tokens are only counted for the prompts that reached the model
+        metrics.annotate(
+            llm_requests=requests,
+            llm_cache_hits=requests - len(sent),
+            prompt_tokens=sum(count_tokens(prompt.invoke(item).to_string()) for item in sent),
+            completion_tokens=sum(count_tokens(content) for content in responses)
+        )
+
+    def stream(self, prompt, llm, inputs: dict, bypass: bool = False) -> Iterator[str]:
+        """
+        Yields the completion content in chunks as the model streams it (or
+        all at once on a hit). The response is cached once fully received.
+        """
+        key = self.key(prompt, llm, inputs)
+        content = None if bypass else self.get(key)
+        if content is not None:
+            self._annotate(prompt, [], [], 1)
+            yield content
+            return
+
+        parts = []
+        for chunk in (prompt | llm).stream(inputs):
+            parts.append(chunk.content)
+            yield chunk.content
+
+        model = getattr(llm, 'model_name', None) or getattr(llm, 'model', None)
+        self.put(key, ''.join(parts), model)
+        self._annotate(prompt, [inputs], [''.join(parts)], 1)
+
+    def stats(self) -> dict:
+        with closing(self._connect()) as conn:
+            entries = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries
+        }
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Optional
+
+import ffmpeg
+
+from core.cache import cache_key
+
+
+PREVIEW_DIR = os.path.join('cache', 'previews')
+THUMBNAIL_WIDTH = 320
+PROXY_HEIGHT = 360
+
+
+def make_thumbnail(clip_path: str, output_file: str, at_seconds: float = 1.0):
+    """Poster frame of the clip, `THUMBNAIL_WIDTH` pixels wide."""
+    (
+        ffmpeg
+        .input(clip_path, ss=at_seconds)
+        .output(output_file, vframes=1, vf=f'scale={THUMBNAIL_WIDTH}:-2', **{'q:v': 4})
+        .overwrite_output()
+        .run(quiet=True)
+    )
+
+
+def make_proxy(clip_path: str, output_file: str):
+    """Low-bitrate `PROXY_HEIGHT`p MP4 that starts playing before it is fully loaded."""
+    (
+        ffmpeg
+        .input(clip_path)
+        .output(
+            output_file,
+            vf=f'scale=-2:{PROXY_HEIGHT}',
+            vcodec='libx264',
+            preset='veryfast',
+            crf=32,
+            acodec='aac',
+            audio_bitrate='64k',
+            movflags='+faststart'
+        )
+        .overwrite_output()
+        .run(quiet=True)
+    )
+
+
+class PreviewService:
+    """
+    Thumbnails and proxy MP4s of the rendered clips, generated on first
+    request by a background pool and cached under `root`, keyed by the clip
+    path, size and modification time (so a re-rendered clip gets new
+    previews, without reading the clip on the caller's thread).
+
+    `thumbnail` and `proxy` never block: they return the cached file, or
+    None while it is being generated. A failed preview is retried `retries`
+    times right away, then again when requested `retry_after` seconds later.
+    """
+
+    def __init__(
+        self,
+        root: str = PREVIEW_DIR,
+        max_workers: int = 2,
+        retries: int = 1,
+        retry_after: float = 60.0
+    ):
+        self.root = root
+        self.retries = retries
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preview')
+        self._pending: Dict[str, Future] = {}
+        self._failed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, clip_path: str) -> str:
+        stat = os.stat(clip_path)
+        return cache_key(os.path.abspath(clip_path), stat.st_size, stat.st_mtime_ns)
+
+    def _get(self, clip_path: str, suffix: str, make) -> Optional[str]:
+        try:
+            output_file = os.path.join(self.root, f'{self._key(clip_path)}{suffix}')
+        except FileNotFoundError:
+            return None
+        if os.path.exists(output_file):
+            return output_file
+
+        with self._lock:
+            if output_file in self._pending:
+                return None
+            failed_at = self._failed.get(output_file)
+            if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+                return None
+            self._failed.pop(output_file, None)
+            self._pending[output_file] = self._executor.submit(
+                self._generate, make, clip_path, output_file
+            )
+        return None
+
+    def _generate(self, make, clip_path: str, output_file: str):
+        # Written aside and renamed, so a half-written preview is never served
+        name, extension = os.path.splitext(output_file)
+        tmp_path = f'{name}.tmp{extension}'
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    make(clip_path, tmp_path)
+                    os.replace(tmp_path, output_file)
+                    return
+                except (ffmpeg.Error, OSError) as e:
+                    error = e
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+            print(f'Could not generate the preview of {clip_path}: {error}')
+            with self._lock:
+                self._failed[output_file] = time.monotonic()
+        finally:
+            with self._lock:
+                del self._pending[output_file]
+
+    def thumbnail(self, clip_path: str) -> Optional[str]:
+        return self._get(clip_path, '.jpg', make_thumbnail)
+
+    def proxy(self, clip_path: str) -> Optional[str]:
+        return self._get(clip_path, '.proxy.mp4', make_proxy)
+
+    def pending(self) -> int:
+        """Previews still being generated."""
+        with self._lock:
+            return len(self._pending)
+
+
+previews = PreviewService()
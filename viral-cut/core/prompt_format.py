@@ -0,0 +1,70 @@
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+
+NUMBER = r'(\d+(?:\.\d+)?(?:e[+-]?\d+)?)'
+SEGMENT_LINE = re.compile(rf'^\[{NUMBER}:{NUMBER}\]\s?(.*)$')
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # Looked up once: offline, every attempt to fetch the BPE files waits on the network
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model("gpt-4o")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        # tiktoken unavailable (or offline without its BPE files): ~4 chars per token
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def parse_transcription(transcription: str) -> List[Tuple[float, float, str]]:
+    """Parses `[start:end] text` lines back into (start, end, text) tuples."""
+    segments = []
+    for line in transcription.split('\n'):
+        match = SEGMENT_LINE.match(line.strip())
+        if match:
+            segments.append((float(match.group(1)), float(match.group(2)), match.group(3).strip()))
+    return segments
+
+
+def compact_transcription(transcription: str, max_block_seconds: float = 30.0) -> str:
+    """
+    Token-compact version of a `[start:end] text` transcription for LLM
+    prompts: timestamps are rounded to whole seconds, empty segments are
+    dropped and consecutive segments are merged into blocks of up to
+    `max_block_seconds`, so far fewer timestamps are spent.
+    """
+    blocks = []
+    for start, end, text in parse_transcription(transcription):
+        if not text:
+            continue
+
+        if blocks and end - blocks[-1][0] <= max_block_seconds:
+            blocks[-1][1] = end
+            blocks[-1][2].append(text)
+        else:
+            blocks.append([start, end, [text]])
+
+    return '\n'.join(
+        f'[{round(start)}:{round(end)}] {" ".join(texts)}'
+        for start, end, texts in blocks
+    )
+
+
+def token_report(original: str, compact: str) -> dict:
+    original_tokens = count_tokens(original)
+    compact_tokens = count_tokens(compact)
+    return {
+        'original_tokens': original_tokens,
+        'compact_tokens': compact_tokens,
+        'saved_tokens': original_tokens - compact_tokens,
+        'saved_ratio': 1 - compact_tokens / original_tokens if original_tokens else 0.0
+    }
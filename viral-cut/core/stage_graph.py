@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from core.instrumentation import metrics
+
+
+@dataclass
+class Stage:
+    """
+    A step of a pipeline. `func` is called with the outputs of `deps` as
+    keyword arguments. Checkpointed outputs are pickled in the job folder,
+    so a later run resumes after them; `lookup` may return an output found
+    elsewhere (e.g. in the artifact cache), in which case the stage and its
+    dependencies are skipped. `inline` stages run on the calling thread,
+    e.g. those reporting progress to Streamlit widgets.
+    """
+    name: str
+    func: Callable[..., Any]
+    deps: List[str] = field(default_factory=list)
+    checkpoint: bool = True
+    lookup: Optional[Callable[[], Any]] = None
+    inline: bool = False
+
+
+class StageGraph:
+    """
+    Runs a DAG of stages for one job. Every stage records its status and
+    timings in `<job_dir>/manifest.json`; stages whose dependencies are ready
+    run concurrently on up to `max_workers` threads.
+
+    Runs and stages are also traced as `<name>.run` / `<name>.<stage>`
+    instrumentation spans, exported to Prometheus after every run.
+    """
+
+    def __init__(self, job_dir: str, stages: List[Stage], max_workers: int = 2, name: str = 'pipeline'):
+        self.job_dir = job_dir
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self.manifest_path = os.path.join(job_dir, 'manifest.json')
+        self._lock = threading.Lock()
+        self._results = {}
+
+        os.makedirs(job_dir, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'stages': {}}
+
+    def checkpoint_path(self, name: str) -> str:
+        return os.path.join(self.job_dir, f'{name}.pkl')
+
+    def is_done(self, name: str) -> bool:
+        entry = self.manifest['stages'].get(name, {})
+        return entry.get('status') == 'done' and os.path.exists(self.checkpoint_path(name))
+
+    def run(self, targets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Runs whatever is missing to produce `targets` (by default, the stages
+        nothing depends on) and returns their outputs.
+        """
+        if targets is None:
+            used = {dep for stage in self.stages.values() for dep in stage.deps}
+            targets = [name for name in self.stages if name not in used]
+
+        try:
+            with metrics.span(f'{self.name}.run', job=os.path.basename(self.job_dir)):
+                return self._run(targets)
+        finally:
+            metrics.export_prometheus()
+
+    def plan(self, targets: List[str]) -> set:
+        """Names of the stages a run of `targets` would execute."""
+        pending = set()
+        for name in targets:
+            self._plan(name, pending)
+        return pending
+
+    def forget(self, *names: str):
+        """Drops in-memory outputs (e.g. decoded audio) no later run needs."""
+        for name in names:
+            self._results.pop(name, None)
+
+    def invalidate(self, *names: str) -> set:
+        """
+        Discards the outputs of `names` and of every stage depending on them,
+        checkpoints included, so the next run recomputes them (e.g. to sample
+        the LLM again). Returns the names of the discarded stages.
+        """
+        stale = set()
+        queue = list(names)
+        while queue:
+            name = queue.pop()
+            if name in stale:
+                continue
+            stale.add(name)
+            queue.extend(stage.name for stage in self.stages.values() if name in stage.deps)
+
+        self.forget(*stale)
+        with self._lock:
+            for name in stale:
+                if os.path.exists(self.checkpoint_path(name)):
+                    os.remove(self.checkpoint_path(name))
+                self.manifest['stages'].pop(name, None)
+            self._write_manifest()
+        return stale
+
+    def _run(self, targets: List[str]) -> Dict[str, Any]:
+        pending = self.plan(targets)
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                ready = [
+                    name for name in pending
+                    if not any(dep in pending or dep in running.values() for dep in self.stages[name].deps)
+                ]
+                inline = []
+                for name in ready:
+                    pending.discard(name)
+                    inputs = {dep: self._get(dep) for dep in self.stages[name].deps}
+                    if self.stages[name].inline:
+                        inline.append((name, inputs))
+                    else:
+                        running[executor.submit(self._execute, name, inputs)] = name
+
+                for name, inputs in inline:
+                    try:
+                        self._results[name] = self._execute(name, inputs)
+                    except Exception:
+                        wait(running)
+                        raise
+
+                if not running:
+                    if not pending or inline:
+                        continue
+                    raise ValueError(f'Stages {sorted(pending)} have unresolvable dependencies')
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        # Let the stages already running finish their checkpoints
+                        wait(running)
+                        raise error
+                    self._results[name] = future.result()
+
+        return {name: self._get(name) for name in targets}
+
+    def _plan(self, name: str, pending: set):
+        if name in pending or name in self._results or self.is_done(name):
+            return
+
+        stage = self.stages[name]
+        if stage.lookup is not None:
+            found = stage.lookup()
+            if found is not None:
+                self._results[name] = found
+                return
+
+        pending.add(name)
+        for dep in stage.deps:
+            self._plan(dep, pending)
+
+    def _get(self, name: str) -> Any:
+        if name not in self._results:
+            with open(self.checkpoint_path(name), 'rb') as f:
+                self._results[name] = pickle.load(f)
+        return self._results[name]
+
+    def _execute(self, name: str, inputs: Dict[str, Any]) -> Any:
+        stage = self.stages[name]
+        started = time.time()
+        self._record(name, status='running', started=started)
+
+        try:
+            with metrics.span(f'{self.name}.{name}', job=os.path.basename(self.job_dir)):
+                output = stage.func(**inputs)
+        except Exception as e:
+            self._record(name, status='failed', error=str(e), seconds=time.time() - started)
+            raise
+
+        if stage.checkpoint:
+            # Written aside and renamed, so a crash never leaves half a checkpoint
+            path = self.checkpoint_path(name)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(output, f)
+            os.replace(tmp_path, path)
+
+        self._record(
+            name,
+            status='done' if stage.checkpoint else 'ran',
+            seconds=time.time() - started,
+            error=None
+        )
+        return output
+
+    def _record(self, name: str, **fields):
+        with self._lock:
+            self.manifest['stages'].setdefault(name, {}).update(fields)
+            self._write_manifest()
+
+    def _write_manifest(self):
+        tmp_path = f'{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
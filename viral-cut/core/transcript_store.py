@@ -0,0 +1,262 @@
+import math
+import struct
+import zipfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+# Cue limits of the generated subtitles
+SUBTITLE_MAX_CHARS = 42
+SUBTITLE_MAX_SECONDS = 5.0
+
+SENTENCE_END = ('.', '!', '?', '…')
+
+
+def _text_column(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    # Every text is a slice of one UTF-8 blob, delimited by n + 1 offsets
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+def _memmap_npz(path: str) -> Dict[str, np.ndarray]:
+    """
+    Maps the members of an uncompressed .npz (as written by np.savez)
+    straight from the file, instead of reading them into memory.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f'{path}: {info.filename} is compressed, it cannot be mapped')
+
+            # The member data follows its local header, name and extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            name = info.filename[:-len('.npy')]
+            if math.prod(shape) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(
+                    path, dtype=dtype, mode='r', shape=shape,
+                    order='F' if fortran_order else 'C', offset=f.tell()
+                )
+    return arrays
+
+
+def _format_srt_time(seconds: float) -> str:
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f'{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}'
+
+
+class Transcript:
+    """
+    Columnar transcript of one video: parallel arrays of segments and of
+    words (start, end, confidence and offsets into a UTF-8 text blob),
+    sorted by start time and saved as an uncompressed .npz.
+
+    Loaded transcripts are memory mapped, and `segment_indices` /
+    `word_indices` find what is said between two instants with binary
+    searches, so clip snapping, subtitles and previews only touch the
+    part of the transcript they need.
+
+    Segment confidence is exp(avg_logprob) and word confidence the word
+    probability, as reported by Whisper (NaN when unknown). Words are only
+    present when Whisper ran with word timestamps.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self.segment_start = arrays['segment_start']
+        self.segment_end = arrays['segment_end']
+        self.segment_confidence = arrays['segment_confidence']
+        self.word_start = arrays['word_start']
+        self.word_end = arrays['word_end']
+        self.word_confidence = arrays['word_confidence']
+        self.word_segment = arrays['word_segment']
+
+    @classmethod
+    def from_segments(cls, segments: List[dict]) -> 'Transcript':
+        """Builds a transcript from Whisper-like segments (with optional `words`)."""
+        segments = sorted(segments, key=lambda seg: seg['start'])
+
+        words = []
+        for i, seg in enumerate(segments):
+            for word in seg.get('words') or []:
+                words.append((word['start'], word['end'], word['word'], word.get('probability'), i))
+        words.sort(key=lambda word: word[0])
+
+        segment_end = np.array([seg['end'] for seg in segments], dtype=np.float64)
+        word_end = np.array([word[1] for word in words], dtype=np.float64)
+        segment_text, segment_text_offsets = _text_column([seg['text'] for seg in segments])
+        word_text, word_text_offsets = _text_column([word[2] for word in words])
+
+        return cls({
+            'version': np.array(FORMAT_VERSION, dtype=np.int32),
+            'segment_start': np.array([seg['start'] for seg in segments], dtype=np.float64),
+            'segment_end': segment_end,
+            # Latest end so far: lets a binary search skip every segment
+            # that ends before an instant, even if segments overlap
+            'segment_reach': np.maximum.accumulate(segment_end) if segment_end.size else segment_end,
+            'segment_confidence': np.array([
+                math.exp(seg['avg_logprob']) if seg.get('avg_logprob') is not None else math.nan
+                for seg in segments
+            ], dtype=np.float32),
+            'segment_text': segment_text,
+            'segment_text_offsets': segment_text_offsets,
+            'word_start': np.array([word[0] for word in words], dtype=np.float64),
+            'word_end': word_end,
+            'word_reach': np.maximum.accumulate(word_end) if word_end.size else word_end,
+            'word_confidence': np.array([
+                word[3] if word[3] is not None else math.nan for word in words
+            ], dtype=np.float32),
+            'word_segment': np.array([word[4] for word in words], dtype=np.int32),
+            'word_text': word_text,
+            'word_text_offsets': word_text_offsets,
+        })
+
+    @classmethod
+    def from_whisper(cls, result: dict) -> 'Transcript':
+        return cls.from_segments(result['segments'])
+
+    @classmethod
+    def from_text(cls, transcription: str) -> 'Transcript':
+        """Converts a legacy `[start:end] text` transcript (no words, no confidence)."""
+        from core.prompt_format import parse_transcription
+        return cls.from_segments([
+            {'start': start, 'end': end, 'text': f' {text}'}
+            for start, end, text in parse_transcription(transcription)
+        ])
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'Transcript':
+        if mmap:
+            arrays = _memmap_npz(path)
+        else:
+            with np.load(path) as archive:
+                arrays = {name: archive[name] for name in archive.files}
+
+        version = int(arrays['version'])
+        if version > FORMAT_VERSION:
+            raise ValueError(f'{path}: transcript format {version} is newer than {FORMAT_VERSION}')
+        return cls(arrays)
+
+    def save(self, path: str):
+        # Uncompressed, so the members can be memory mapped by load()
+        with open(path, 'wb') as f:
+            np.savez(f, **self.arrays)
+
+    def __getstate__(self):
+        # Pickled (e.g. as a stage checkpoint) as plain arrays, not mappings
+        return {name: np.array(array) for name, array in self.arrays.items()}
+
+    def __setstate__(self, arrays):
+        self.__init__(arrays)
+
+    def __len__(self) -> int:
+        return len(self.segment_start)
+
+    @property
+    def duration(self) -> float:
+        return float(self.arrays['segment_reach'][-1]) if len(self) else 0.0
+
+    @staticmethod
+    def _overlapping(starts, ends, reach, start: float, end: float) -> np.ndarray:
+        lo = int(np.searchsorted(reach, start, side='right'))
+        hi = int(np.searchsorted(starts, end, side='left'))
+        if hi <= lo:
+            return np.empty(0, dtype=np.int64)
+        return lo + np.flatnonzero(np.asarray(ends[lo:hi]) > start)
+
+    def segment_indices(self, start: float, end: float) -> np.ndarray:
+        """Indices of the segments overlapping [start, end)."""
+        return self._overlapping(
+            self.segment_start, self.segment_end, self.arrays['segment_reach'], start, end
+        )
+
+    def word_indices(self, start: float, end: float) -> np.ndarray:
+        """Indices of the words overlapping [start, end)."""
+        return self._overlapping(self.word_start, self.word_end, self.arrays['word_reach'], start, end)
+
+    def segment_text(self, i: int) -> str:
+        offsets = self.arrays['segment_text_offsets']
+        return bytes(self.arrays['segment_text'][offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def word_text(self, i: int) -> str:
+        offsets = self.arrays['word_text_offsets']
+        return bytes(self.arrays['word_text'][offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def segments(self, start: float = 0.0, end: float = math.inf) -> List[Tuple[float, float, str]]:
+        """(start, end, text) of the segments overlapping [start, end)."""
+        return [
+            (float(self.segment_start[i]), float(self.segment_end[i]), self.segment_text(i).strip())
+            for i in self.segment_indices(start, end)
+        ]
+
+    def words(self, start: float = 0.0, end: float = math.inf) -> List[Tuple[float, float, str, float]]:
+        """(start, end, text, confidence) of the words overlapping [start, end)."""
+        return [
+            (
+                float(self.word_start[i]), float(self.word_end[i]),
+                self.word_text(i).strip(), float(self.word_confidence[i])
+            )
+            for i in self.word_indices(start, end)
+        ]
+
+    def to_text(self) -> str:
+        """The `[start:end] text` lines the agent prompts are built from."""
+        return '\n'.join(
+            f'[{float(self.segment_start[i])}:{float(self.segment_end[i])}] {self.segment_text(i)}'
+            for i in range(len(self))
+        )
+
+    def to_srt(
+        self,
+        start: float,
+        end: float,
+        max_chars: int = SUBTITLE_MAX_CHARS,
+        max_seconds: float = SUBTITLE_MAX_SECONDS
+    ) -> str:
+        """
+        SRT subtitles of the clip [start, end], timed from the clip start.
+        Cues are built from the words, breaking at sentence ends and at
+        `max_chars` / `max_seconds`; without word timestamps every segment
+        is a cue.
+        """
+        units = [(s, e, text) for s, e, text, _ in self.words(start, end)] or self.segments(start, end)
+
+        cues = []
+        for s, e, text in units:
+            if not text:
+                continue
+            if cues:
+                cue = cues[-1]
+                fits = len(cue[2]) + 1 + len(text) <= max_chars and e - cue[0] <= max_seconds
+                if fits and not cue[2].endswith(SENTENCE_END):
+                    cue[1] = e
+                    cue[2] = f'{cue[2]} {text}'
+                    continue
+            cues.append([s, e, text])
+
+        blocks = []
+        for number, (s, e, text) in enumerate(cues, start=1):
+            s = min(max(s, start), end) - start
+            e = min(max(e, start), end) - start
+            blocks.append(f'{number}\n{_format_srt_time(s)} --> {_format_srt_time(e)}\n{text}\n')
+        return '\n'.join(blocks)
@@ -1,12 +1,262 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 import whisper
 
-def transcribe(audio_path: str, model: str = 'base', language = 'portuguese') -> str:
-    model = whisper.load_model(model)
-    result = model.transcribe(audio_path, language=language)
-    
-    segments = []
-    for seg in result["segments"]:
-        txt = f"[{seg['start']}:{seg['end']}] {seg['text']}"
-        segments.append(txt)
-    
-    return '\n'.join(segments)
\ No newline at end of file
+from core.model_registry import get_whisper_model
+from core.transcript_store import Transcript
+
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE
+
+
+@dataclass
+class AudioWindow:
+    """
+    A slice of the audio sent to one worker. `start`/`end` are the samples
+    actually transcribed (including the overlap), while `own_start`/`own_end`
+    delimit the part of the timeline this window is responsible for.
+    """
+    start: int
+    end: int
+    own_start: int
+    own_end: int
+
+
+def _quietest_sample(audio: np.ndarray, center: int, search: int, frame: int) -> int:
+    lo = max(0, center - search)
+    hi = min(len(audio), center + search)
+    n_frames = (hi - lo) // frame
+    if n_frames < 1:
+        return center
+
+    frames = audio[lo:lo + n_frames * frame].reshape(n_frames, frame)
+    energy = np.mean(frames.astype(np.float32) ** 2, axis=1)
+    return lo + int(np.argmin(energy)) * frame + frame // 2
+
+
+def split_audio(
+    audio: np.ndarray,
+    window_seconds: float = 300.0,
+    overlap_seconds: float = 5.0,
+    search_seconds: float = 10.0,
+    frame_seconds: float = 0.05
+) -> List[AudioWindow]:
+    """
+    Splits the audio into windows of roughly `window_seconds`. Each cut is
+    moved to the quietest frame within `search_seconds` of its nominal
+    position, so it tends to fall in a silence instead of mid-word, and every
+    window is padded with `overlap_seconds` of context on both sides.
+    """
+    total = len(audio)
+    window = int(window_seconds * SAMPLE_RATE)
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    search = int(search_seconds * SAMPLE_RATE)
+    frame = max(1, int(frame_seconds * SAMPLE_RATE))
+
+    cuts = [0]
+    while total - cuts[-1] > window + search:
+        cut = _quietest_sample(audio, cuts[-1] + window, search, frame)
+        cuts.append(cut)
+    cuts.append(total)
+
+    return [
+        AudioWindow(
+            start=max(0, own_start - overlap),
+            end=min(total, own_end + overlap),
+            own_start=own_start,
+            own_end=own_end
+        )
+        for own_start, own_end in zip(cuts[:-1], cuts[1:])
+    ]
+
+
+def _init_worker(model: str, device: str, compute_type: str, threads: int):
+    import torch
+    torch.set_num_threads(threads)
+    # Warm the model once per worker, every window then hits the registry
+    get_whisper_model(model, device=device, compute_type=compute_type)
+
+
+def _transcribe_window(
+    audio: np.ndarray,
+    model: str,
+    device: str,
+    compute_type: str,
+    decode_options: dict,
+    threads: Optional[int] = None
+) -> List[dict]:
+    if threads is not None:
+        # Pools outlive a call, the budget depends on how many windows run
+        import torch
+        torch.set_num_threads(threads)
+    whisper_model = get_whisper_model(model, device=device, compute_type=compute_type)
+    result = whisper_model.transcribe(audio, word_timestamps=True, **decode_options)
+    return result["segments"]
+
+
+# Warm pools per (model, device, compute type, workers), created on first
+# use, so each worker loads Whisper once instead of once per input
+_pools: Dict[Tuple[str, str, str, int], ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(model: str, device: str, compute_type: str, workers: int) -> ProcessPoolExecutor:
+    with _pools_lock:
+        key = (model, device, compute_type, workers)
+        if key not in _pools:
+            # spawn avoids forking a parent that already holds torch threads
+            _pools[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model, device, compute_type, max(1, (os.cpu_count() or 1) // workers))
+            )
+        return _pools[key]
+
+
+def shutdown_pools():
+    """Stops the warm transcription workers (and unloads their models)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for executor in pools:
+        executor.shutdown()
+
+
+atexit.register(shutdown_pools)
+
+
+def stitch_segments(windows: List[AudioWindow], window_segments: List[List[dict]]) -> List[dict]:
+    """
+    Shifts every window's segments back onto the global timeline and drops
+    what was transcribed twice in the overlaps: a word (or a segment without
+    word timestamps) is kept only by the window that owns its midpoint.
+    """
+    stitched = []
+    for window, segments in zip(windows, window_segments):
+        offset = window.start / SAMPLE_RATE
+        own_start = window.own_start / SAMPLE_RATE
+        own_end = window.own_end / SAMPLE_RATE
+
+        def owned(start, end):
+            middle = (start + end) / 2 + offset
+            return own_start <= middle < own_end
+
+        for seg in segments:
+            words = seg.get("words")
+            if words:
+                kept = [
+                    {**w, "start": w["start"] + offset, "end": w["end"] + offset}
+                    for w in words if owned(w["start"], w["end"])
+                ]
+                if not kept:
+                    continue
+                seg = {
+                    **seg,
+                    "start": kept[0]["start"],
+                    "end": kept[-1]["end"],
+                    "text": "".join(w["word"] for w in kept),
+                    "words": kept
+                }
+            elif owned(seg["start"], seg["end"]):
+                seg = {**seg, "start": seg["start"] + offset, "end": seg["end"] + offset}
+            else:
+                continue
+
+            stitched.append({**seg, "id": len(stitched)})
+
+    return stitched
+
+
+def transcribe_parallel(
+    audio,
+    model: str = 'base',
+    device: str = 'cpu',
+    compute_type: str = 'float32',
+    workers: Optional[int] = None,
+    window_seconds: float = 300.0,
+    overlap_seconds: float = 5.0,
+    **decode_options
+) -> dict:
+    """
+    Transcribes `audio` (a path or a 16kHz float32 array) in overlapping
+    windows on a warm process pool of `workers` (the CPU count by default),
+    one Whisper model per worker, reused by later calls. Returns a dict
+    shaped like `whisper.transcribe` output (`text` and `segments`).
+    Meant for CPU inference; on a single GPU the workers would just queue.
+    """
+    if isinstance(audio, str):
+        audio = whisper.load_audio(audio)
+
+    windows = split_audio(audio, window_seconds, overlap_seconds)
+    cpus = os.cpu_count() or 1
+    workers = max(1, workers or cpus)
+
+    if workers == 1 or len(windows) == 1:
+        window_segments = [
+            _transcribe_window(audio[w.start:w.end], model, device, compute_type, decode_options)
+            for w in windows
+        ]
+    else:
+        executor = _pool(model, device, compute_type, workers)
+        # Fewer windows than workers: the busy ones share the idle cores
+        threads = max(1, cpus // min(workers, len(windows)))
+        try:
+            futures = [
+                executor.submit(
+                    _transcribe_window,
+                    audio[w.start:w.end], model, device, compute_type, decode_options, threads
+                )
+                for w in windows
+            ]
+            window_segments = [f.result() for f in futures]
+        except BrokenProcessPool:
+            # e.g. a worker killed when out of memory: the next call starts a new pool
+            with _pools_lock:
+                if _pools.get((model, device, compute_type, workers)) is executor:
+                    del _pools[(model, device, compute_type, workers)]
+            raise
+
+    segments = stitch_segments(windows, window_segments)
+    return {
+        "text": "".join(seg["text"] for seg in segments),
+        "segments": segments,
+        "language": decode_options.get("language")
+    }
+
+
+def transcribe(
+    audio,
+    model: str = 'base',
+    language = 'portuguese',
+    device: str = None,
+    compute_type: str = 'float32',
+    parallel: bool = False,
+    workers: int = None
+) -> Transcript:
+    """
+    Transcribes `audio`, either a file path or an already decoded 16kHz
+    float32 array (see video_handler.decode_audio), into a columnar
+    Transcript with word timestamps.
+    """
+    if parallel:
+        result = transcribe_parallel(
+            audio,
+            model=model,
+            device=device or 'cpu',
+            compute_type=compute_type,
+            workers=workers,
+            language=language
+        )
+    else:
+        whisper_model = get_whisper_model(model, device=device, compute_type=compute_type)
+        result = whisper_model.transcribe(audio, language=language, word_timestamps=True)
+
+    return Transcript.from_whisper(result)
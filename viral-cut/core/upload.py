@@ -0,0 +1,104 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from dataclasses import dataclass, asdict
+from typing import BinaryIO, Optional, Tuple
+
+
+CHUNK_SIZE = 8 * 1024 * 1024
+INGEST_INDEX = '.ingest.json'
+
+_index_lock = threading.Lock()
+
+
+@dataclass
+class IngestRecord:
+    path: str
+    content_hash: str
+    size: int
+    reused: bool
+
+
+def _load_index(folder: str) -> dict:
+    index_path = os.path.join(folder, INGEST_INDEX)
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_index(folder: str, index: dict):
+    index_path = os.path.join(folder, INGEST_INDEX)
+    tmp_path = f'{index_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, index_path)
+
+
+def _copy_upload(uploaded_file: BinaryIO, f: BinaryIO, chunk_size: int) -> Tuple[str, int]:
+    """
+    Copies the upload to `f` in `chunk_size` pieces, hashing them on the
+    way. Returns the full-content hash and the size.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    size = 0
+    uploaded_file.seek(0)
+    for chunk in iter(lambda: uploaded_file.read(chunk_size), b''):
+        digest.update(chunk)
+        f.write(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def ingest_upload(
+    uploaded_file: BinaryIO,
+    folder: str = 'videos',
+    seen: Optional[dict] = None,
+    chunk_size: int = CHUNK_SIZE
+) -> IngestRecord:
+    """
+    Persists an upload (e.g. a Streamlit UploadedFile) as folder/<name>.
+
+    The upload is read once, in `chunk_size` pieces that are hashed while
+    they are written to a temporary file next to the target. If the stored
+    file already has that content hash it is kept and the temporary file is
+    dropped; otherwise the temporary file is atomically renamed into place.
+
+    `seen` (e.g. a dict kept in st.session_state) remembers uploads by their
+    `file_id`, so Streamlit reruns don't even read the upload again.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, uploaded_file.name)
+    file_id = getattr(uploaded_file, 'file_id', None)
+
+    if seen is not None and file_id in seen and os.path.exists(path):
+        return IngestRecord(**{**seen[file_id], 'reused': True})
+
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            content_hash, size = _copy_upload(uploaded_file, f, chunk_size)
+
+        with _index_lock:
+            index = _load_index(folder)
+            stored = index.get(uploaded_file.name)
+            reused = (
+                stored is not None
+                and stored.get('content_hash') == content_hash
+                and os.path.exists(path)
+                and os.path.getsize(path) == size
+            )
+            if not reused:
+                os.replace(tmp_path, path)
+                index[uploaded_file.name] = {'content_hash': content_hash, 'size': size}
+                _save_index(folder, index)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    record = IngestRecord(path=path, content_hash=content_hash, size=size, reused=reused)
+    if seen is not None and file_id is not None:
+        seen[file_id] = asdict(record)
+    return record
@@ -1,4 +1,13 @@
+import os
+import queue
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Sized, Tuple
+
 import ffmpeg
+import numpy as np
 
 def mp4_to_wav(
     input_file: str,
@@ -26,16 +35,427 @@ def mp4_to_wav(
 
     ffmpeg.run(stream)
 
+
+# Above this duration, decode_audio spills samples to a memory-mapped file
+MMAP_THRESHOLD_SECONDS = 2 * 60 * 60
+
+
+def _duration(input_file: str) -> float:
+    return float(ffmpeg.probe(input_file)["format"]["duration"])
+
+
+def probe_keyframes(input_file: str) -> Tuple[np.ndarray, float]:
+    """
+    Sorted timestamps (seconds) of the video keyframes, read from the packet
+    flags with a single ffprobe call (nothing is decoded), and the duration
+    of the file. Stream-copied cuts can only start on a keyframe.
+    """
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags:format=duration", "-of", "compact=p=0",
+            input_file
+        ],
+        capture_output=True,
+        check=True,
+        text=True
+    )
+
+    keyframes = []
+    duration = 0.0
+    for line in result.stdout.splitlines():
+        fields = dict(field.split("=", 1) for field in line.split("|") if "=" in field)
+        if "K" in fields.get("flags", "") and fields.get("pts_time", "N/A") != "N/A":
+            keyframes.append(float(fields["pts_time"]))
+        elif fields.get("duration", "N/A") != "N/A":
+            duration = float(fields["duration"])
+    return np.unique(np.array(keyframes, dtype=np.float64)), duration
+
+
+def decode_audio(
+    input_file: str,
+    sample_rate: int = 16000,
+    mmap_path: Optional[str] = None,
+    mmap_threshold_seconds: float = MMAP_THRESHOLD_SECONDS
+) -> np.ndarray:
+    """
+    Decodes the audio of input_file straight from ffmpeg's stdout (s16le)
+    into a mono float32 array at sample_rate, the format Whisper and pyannote
+    take, without writing a WAV file in between.
+
+    When `mmap_path` is given and the input is longer than
+    `mmap_threshold_seconds`, the samples are streamed to that raw float32
+    file and returned memory-mapped instead of being held in RAM.
+    """
+    use_mmap = mmap_path is not None and _duration(input_file) > mmap_threshold_seconds
+
+    process = (
+        ffmpeg
+        .input(input_file)
+        .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=sample_rate)
+        .global_args("-loglevel", "error")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+
+    if not use_mmap:
+        out, err = process.communicate()
+        if process.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, err)
+        return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+    # Drained aside, so ffmpeg never blocks on a full stderr pipe
+    stderr = []
+    drain = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    drain.start()
+
+    with open(mmap_path, "wb") as f:
+        # 1 MiB reads are always sample aligned, except maybe the last one
+        for chunk in iter(lambda: process.stdout.read(1024 * 1024), b""):
+            samples = np.frombuffer(chunk[:len(chunk) // 2 * 2], np.int16)
+            f.write((samples.astype(np.float32) / 32768.0).tobytes())
+
+    process.wait()
+    drain.join()
+    if process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", None, stderr[0])
+
+    # Copy-on-write, so consumers get a writable array that never touches the file
+    return np.memmap(mmap_path, dtype=np.float32, mode="c")
+
+
 def cut_video(input_file: str,
               output_file: str,
               start_time: float, 
-              end_time: float
+              end_time: float,
+              reencode: bool = False,
+              threads: int = 0,
+              timeout: Optional[float] = None
 ):
+    """
+    Cuts [start_time, end_time] of input_file into output_file. By default
+    the streams are copied, which snaps the cut to keyframes; `reencode=True`
+    renders a frame-accurate clip with x264/aac using `threads` encoder
+    threads (0 lets ffmpeg decide). The ffmpeg process is killed after
+    `timeout` seconds.
+    """
     duration = end_time - start_time
-    (
+    if reencode:
+        output_options = dict(vcodec="libx264", acodec="aac", preset="veryfast", threads=threads)
+    else:
+        output_options = dict(c="copy")
+
+    process = (
         ffmpeg
         .input(input_file, ss=start_time, t=duration)
-        .output(output_file, c="copy")
+        .output(output_file, **output_options)
         .overwrite_output()
-        .run()
-    )
\ No newline at end of file
+        .run_async(pipe_stderr=True)
+    )
+
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise TimeoutError(f"ffmpeg timed out after {timeout}s cutting {output_file}")
+
+    if process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", None, stderr)
+
+def _ffmpeg_error_message(error: Exception) -> str:
+    stderr = getattr(error, "stderr", None)
+    if stderr:
+        return stderr.decode(errors="replace")[-500:]
+    return str(error)
+
+
+@dataclass
+class CutResult:
+    output_file: str
+    start_time: float
+    end_time: float
+    success: bool
+    error: Optional[str] = None
+
+
+def _cut_group(input_file: str, group: List[Tuple[float, float, str]]):
+    """
+    Extracts every clip of `group` in a single ffmpeg run. Each clip is its
+    own input, seeked on the input side like cut_video, so the copy starts
+    on the keyframe before the clip (an output-side seek would drop every
+    packet up to the next keyframe instead), and its own output.
+    """
+    outputs = []
+    for start, end, output_file in group:
+        clip = ffmpeg.input(input_file, ss=start, t=end - start)
+        # Without a map the first output would pick streams from every input
+        outputs.append(ffmpeg.output(clip["v:0?"], clip["a:0?"], output_file, c="copy"))
+    ffmpeg.merge_outputs(*outputs).overwrite_output().run(capture_stderr=True)
+
+
+def cut_videos(
+    input_file: str,
+    cuts: List[Tuple[float, float, str]],
+    max_outputs: int = 16
+) -> List[CutResult]:
+    """
+    Batch version of cut_video. `cuts` is a list of (start, end, output_file)
+    tuples; clips are extracted in groups of up to `max_outputs` per ffmpeg
+    process instead of one process per clip.
+    If a group fails, its clips are retried one by one so that a single bad
+    clip does not fail the others. Returns one CutResult per cut, in order.
+    """
+    ordered = sorted(range(len(cuts)), key=lambda i: cuts[i][0])
+    results = [None] * len(cuts)
+
+    for offset in range(0, len(ordered), max_outputs):
+        indexes = ordered[offset:offset + max_outputs]
+        group = [cuts[i] for i in indexes]
+
+        try:
+            _cut_group(input_file, group)
+            group_error = None
+        except (ffmpeg.Error, OSError) as e:
+            group_error = e
+
+        for i in indexes:
+            start, end, output_file = cuts[i]
+            error = None
+            if group_error is not None:
+                try:
+                    cut_video(input_file, output_file, start, end)
+                except (ffmpeg.Error, OSError) as e:
+                    # OSError: e.g. no ffmpeg binary
+                    error = _ffmpeg_error_message(e)
+
+            if error is None and not (os.path.exists(output_file) and os.path.getsize(output_file) > 0):
+                error = "ffmpeg produced no output"
+
+            results[i] = CutResult(
+                output_file=output_file,
+                start_time=start,
+                end_time=end,
+                success=error is None,
+                error=error
+            )
+
+    return results
+
+
+@dataclass
+class RenderEvent:
+    """
+    Progress of one clip in iter_render_clips. `status` is one of
+    "started", "retrying", "done" or "failed"; `completed` counts the clips
+    that are finished (done or failed) out of `total`, which keeps growing
+    while the cuts are still being produced.
+    """
+    index: int
+    output_file: str
+    status: str
+    attempt: int
+    completed: int
+    total: int
+    error: Optional[str] = None
+
+
+def iter_render_clips(
+    input_file: str,
+    cuts: Iterable[Tuple[float, float, str]],
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    retries: int = 1,
+    reencode: bool = True
+) -> Iterator[RenderEvent]:
+    """
+    Renders every (start, end, output_file) of `cuts` with cut_video on a
+    pool of at most `max_workers` concurrent ffmpeg processes (half the cores
+    by default, the encoder threads are split among them). Each job is killed
+    after `timeout` seconds and retried up to `retries` times.
+
+    `cuts` may be a lazy iterable (e.g. clips streamed by the agent): it is
+    consumed on a feeder thread and each clip starts rendering as soon as it
+    is produced. An exception raised by the iterable is re-raised here.
+
+    Yields RenderEvents in the calling thread as jobs progress, so callers
+    like Streamlit can update their widgets directly.
+    """
+    cpus = os.cpu_count() or 1
+    max_workers = max(1, max_workers or cpus // 2)
+    if isinstance(cuts, Sized):
+        max_workers = min(max_workers, len(cuts) or 1)
+    threads = max(1, cpus // max_workers)
+    events = queue.Queue()
+    output_files = []
+
+    def job(index: int, start: float, end: float, output_file: str):
+        for attempt in range(1, retries + 2):
+            events.put((index, "started" if attempt == 1 else "retrying", attempt, None))
+            try:
+                cut_video(input_file, output_file, start, end, reencode, threads, timeout)
+                events.put((index, "done", attempt, None))
+                return
+            except (ffmpeg.Error, TimeoutError) as e:
+                error = _ffmpeg_error_message(e)
+            except Exception as e:
+                # e.g. ffmpeg missing or an unwritable output: not worth a
+                # retry, but the consumer still waits for a terminal event
+                error = f"{type(e).__name__}: {e}"
+                break
+        events.put((index, "failed", attempt, error))
+
+    def feed(executor: ThreadPoolExecutor):
+        try:
+            for index, (start, end, output_file) in enumerate(cuts):
+                output_files.append(output_file)
+                executor.submit(job, index, start, end, output_file)
+        except Exception as e:
+            events.put((None, "error", 0, e))
+        else:
+            events.put((None, "fed", 0, None))
+
+    completed = 0
+    fed = False
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        threading.Thread(target=feed, args=(executor,), daemon=True).start()
+
+        while not fed or completed < len(output_files):
+            index, status, attempt, error = events.get()
+            if status == "error":
+                raise error
+            if status == "fed":
+                fed = True
+                continue
+            if status in ("done", "failed"):
+                completed += 1
+
+            yield RenderEvent(
+                index=index,
+                output_file=output_files[index],
+                status=status,
+                attempt=attempt,
+                completed=completed,
+                total=len(output_files),
+                error=error
+            )
+
+
+def iter_cut_videos(
+    input_file: str,
+    cuts: Iterable[Tuple[float, float, str]],
+    max_outputs: int = 16
+) -> Iterator[RenderEvent]:
+    """
+    Streaming version of cut_videos. `cuts` may be a lazy iterable (e.g.
+    clips streamed by the agent): it is consumed on a feeder thread and,
+    whenever ffmpeg is free, the clips that arrived in the meantime (up to
+    `max_outputs`) are stream copied as one group. An exception raised by
+    the iterable is re-raised here.
+
+    Yields RenderEvents like iter_render_clips.
+    """
+    arrived = queue.Queue()
+
+    def feed():
+        try:
+            for cut in cuts:
+                arrived.put(("cut", cut))
+        except Exception as e:
+            arrived.put(("error", e))
+        else:
+            arrived.put(("fed", None))
+
+    threading.Thread(target=feed, daemon=True).start()
+
+    output_files = []
+    completed = 0
+    fed = False
+    while not fed:
+        # Wait for one clip, then take whatever else is already there
+        group = []
+        kind, value = arrived.get()
+        while True:
+            if kind == "error":
+                raise value
+            if kind == "fed":
+                fed = True
+                break
+            group.append(value)
+            if len(group) == max_outputs:
+                break
+            try:
+                kind, value = arrived.get_nowait()
+            except queue.Empty:
+                break
+
+        first = len(output_files)
+        output_files.extend(output_file for _, _, output_file in group)
+        for index in range(first, len(output_files)):
+            yield RenderEvent(
+                index=index,
+                output_file=output_files[index],
+                status="started",
+                attempt=1,
+                completed=completed,
+                total=len(output_files)
+            )
+
+        for index, result in enumerate(cut_videos(input_file, group, max_outputs), start=first):
+            completed += 1
+            yield RenderEvent(
+                index=index,
+                output_file=result.output_file,
+                status="done" if result.success else "failed",
+                attempt=1,
+                completed=completed,
+                total=len(output_files),
+                error=result.error
+            )
+
+
+def render_clips(
+    input_file: str,
+    cuts: Iterable[Tuple[float, float, str]],
+    on_progress: Optional[Callable[[RenderEvent], None]] = None,
+    reencode: bool = True,
+    **kwargs
+) -> List[CutResult]:
+    """
+    Runs iter_render_clips (or, without `reencode`, iter_cut_videos, which
+    groups the stream copies into as few ffmpeg runs as possible) to
+    completion, forwarding every event to `on_progress`. `kwargs` go to the
+    iterator. Returns one CutResult per cut, in order.
+    """
+    if isinstance(cuts, Sized):
+        produced, source = cuts, cuts
+    else:
+        produced = []
+
+        def record():
+            for cut in cuts:
+                produced.append(cut)
+                yield cut
+
+        source = record()
+
+    if reencode:
+        events = iter_render_clips(input_file, source, reencode=True, **kwargs)
+    else:
+        events = iter_cut_videos(input_file, source, **kwargs)
+
+    results = {}
+    for event in events:
+        if on_progress is not None:
+            on_progress(event)
+
+        if event.status in ("done", "failed"):
+            start, end, output_file = produced[event.index]
+            results[event.index] = CutResult(
+                output_file=output_file,
+                start_time=start,
+                end_time=end,
+                success=event.status == "done",
+                error=event.error
+            )
+
+    return [results[i] for i in range(len(results))]
@@ -1,9 +1,20 @@
 import os
 import json
+import wave
+import subprocess
 
-from core.video_handler import mp4_to_wav, cut_video
+import numpy as np
+
+from core.video_handler import mp4_to_wav, decode_audio, render_clips, probe_keyframes
 from core.transcription import transcribe
-from core.agent import ViralCutAgent
+from core.transcript_store import Transcript
+from core.agent import ViralCutAgent, merge_clips, same_moment
+from core.cache import ArtifactCache, cache_key, file_fingerprint
+from core.stage_graph import Stage, StageGraph
+from core.prompt_format import compact_transcription, token_report
+from core.clip_index import ClipIndex
+from core.instrumentation import metrics
+from core.catalog import Catalog, READY, FAILED
 
 def prepare_folders():
     if not os.path.exists('audio'):
@@ -15,45 +26,297 @@ def prepare_folders():
     if not os.path.exists('video_cuts'):
         os.mkdir('video_cuts')
 
-def process(
+    if not os.path.exists('cache/cuts'):
+        os.makedirs('cache/cuts')
+
+    if not os.path.exists('cache/keyframes'):
+        os.makedirs('cache/keyframes')
+
+def clip_output(video_path: str, index: int) -> str:
+    return f'video_cuts/{os.path.basename(video_path)}_{str(index)}.mp4'
+
+def subtitle_output(clip_path: str) -> str:
+    return f'{os.path.splitext(clip_path)[0]}.srt'
+
+def render(
         video_path: str,
-        language: str = 'portuguese'
+        cuts,
+        reencode: bool = False,
+        on_progress=None
 ):
+    """
+    Cuts the clips of `cuts` (a list, or an iterator of clips still being
+    streamed by the agent, each one cut as soon as it arrives).
+    """
+    clips = (
+        (cut['start_time'], cut['end_time'], clip_output(video_path, i))
+        for i, cut in enumerate(cuts)
+    )
+
+    if isinstance(cuts, list):
+        clips = list(clips)
+
+    # Stream copies are grouped by iter_cut_videos: streamed clips that
+    # arrive while a group is being cut form the next group. Re-encoding is
+    # CPU bound and runs on a worker pool instead.
+    results = render_clips(
+        input_file=video_path,
+        cuts=clips,
+        on_progress=on_progress,
+        reencode=reencode
+    )
+
+    for result in results:
+        if not result.success:
+            print(f'Failed to cut {result.output_file}: {result.error}')
+
+    return results
+
+def build_graph(
+        video_path: str,
+        language: str = 'portuguese',
+        model: str = 'base',
+        parallel_transcription: bool = False,
+        chunked_agent: bool = False,
+        reencode: bool = False,
+        on_progress=None,
+        cache: ArtifactCache = None,
+        catalog: Catalog = None,
+        audio_in_memory: bool = True,
+        fingerprint: str = None,
+        bypass_llm_cache: bool = False,
+        stream_agent: bool = True
+) -> StageGraph:
+    """
+    The viral-cut stages (audio -> transcript -> cuts -> clips) of a video
+    as a StageGraph under jobs/<job key>/. Each stage is checkpointed with its
+    timings in the job manifest, so a failed run resumes after the last
+    completed stage. `fingerprint` identifies the video content in the
+    artifact keys: the content_hash of an upload.ingest_upload when known,
+    its file_fingerprint otherwise.
+
+    With `stream_agent` (ignored by the chunked agent) the cut list is
+    streamed from the LLM and every clip is cut while the next ones are
+    still being generated. Clip times are snapped to sentence boundaries
+    (and keyframes, when stream copying) with a ClipIndex. The video and
+    its clips are recorded in the `catalog` browsed by the app.
+    """
     prepare_folders()
+    cache = cache or ArtifactCache()
+    catalog = catalog or Catalog()
     filename = os.path.basename(video_path)
-
-    audio_path = f'audio/{filename}.wav'
-    transcript_path = f'transcripts/{filename}.txt'
     json_path = f'video_cuts/{filename}.json'
 
-    if os.path.exists(transcript_path) == False:
-        mp4_to_wav(input_file=video_path, output_file=audio_path)
-        transcription = transcribe(audio_path=audio_path, language=language)
+    # Artifacts are addressed by the video content and the stage parameters,
+    # so a different upload with the same name never reuses stale results
+    fingerprint = fingerprint or file_fingerprint(video_path)
+    video_id = catalog.upsert_video(video_path, fingerprint)
+    audio_key = cache_key(fingerprint, 'audio', 16000)
+    transcript_key = cache_key(fingerprint, 'transcript', model, language)
+    # Stream-copied clips are also snapped to keyframes, re-encoded ones not
+    cuts_key = cache_key(
+        transcript_key, 'cuts', language, ViralCutAgent.PROMPT_VERSION, chunked_agent,
+        'snapped', not reencode
+    )
+    # Clips are written under the video name, so copies don't share a job
+    job_dir = f'jobs/{cache_key(cuts_key, "render", reencode, filename)}'
+
+    def extract_audio():
+        if audio_in_memory:
+            # PCM goes from ffmpeg straight to Whisper, very long inputs
+            # are spilled to a temporary memory-mapped buffer
+            audio = decode_audio(video_path, mmap_path=f'audio/{audio_key}.f32')
+            metrics.annotate(audio_seconds=len(audio) / 16000)
+            catalog.update_video(video_id, duration=len(audio) / 16000)
+            return audio
+
+        audio_path = cache.get('audio', audio_key)
+        if audio_path is None:
+            audio_path = f'audio/{audio_key}.wav'
+            mp4_to_wav(input_file=video_path, output_file=audio_path)
+            cache.put('audio', audio_key, audio_path, {'video': filename})
+        with wave.open(audio_path, 'rb') as f:
+            duration = f.getnframes() / f.getframerate()
+        metrics.annotate(audio_seconds=duration)
+        catalog.update_video(video_id, duration=duration)
+        return audio_path
+
+    def cached_transcript():
+        transcript_path = cache.get('transcript', transcript_key)
+        if transcript_path is None:
+            return None
+        if transcript_path.endswith('.txt'):
+            # Cached before the columnar format, converted on read
+            with open(transcript_path, 'r', encoding='utf-8') as f:
+                return Transcript.from_text(f.read())
+        return Transcript.load(transcript_path)
+
+    def run_transcription(audio):
+        try:
+            transcription = transcribe(
+                audio=audio,
+                model=model,
+                language=language,
+                parallel=parallel_transcription
+            )
+        finally:
+            if os.path.exists(f'audio/{audio_key}.f32'):
+                os.remove(f'audio/{audio_key}.f32')
+
+        transcript_path = f'transcripts/{transcript_key}.npz'
+        transcription.save(transcript_path)
+        cache.put('transcript', transcript_key, transcript_path, {
+            'video': filename, 'model': model, 'language': language
+        })
+        return transcription
+
+    def cached_cuts():
+        cuts_path = cache.get('cuts', cuts_key)
+        if cuts_path is not None:
+            with open(cuts_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+    streamed = {}
+
+    def clip_index(transcript):
+        keyframes, duration = None, None
+        if not reencode:
+            # Probed once per video content, then read from the cache
+            keyframes_key = cache_key(fingerprint, 'keyframes')
+            keyframes_path = cache.get('keyframes', keyframes_key)
+            if keyframes_path is None:
+                try:
+                    keyframes_path = f'cache/keyframes/{keyframes_key}.npz'
+                    keyframes, duration = probe_keyframes(video_path)
+                    np.savez(keyframes_path, keyframes=keyframes, duration=duration)
+                    cache.put('keyframes', keyframes_key, keyframes_path, {'video': filename})
+                except (OSError, subprocess.CalledProcessError) as e:
+                    print(f'Could not probe the keyframes of {filename}: {e}')
+                    keyframes_path = None
 
-        with open(transcript_path, 'w', encoding='utf-8') as f:
-            f.write(transcription)
-    else:
-        with open(transcript_path, 'r', encoding='utf-8') as f:
-            transcription = f.read()
+            if keyframes_path is not None:
+                with np.load(keyframes_path) as probed:
+                    keyframes, duration = probed['keyframes'], float(probed['duration']) or None
 
-    if os.path.exists(json_path) == False:
+        return ClipIndex(transcript.segments(), keyframes=keyframes, duration=duration)
+
+    def compact_prompt(transcript):
+        # Rounded, merged timestamps cut prompt tokens (and LLM latency)
+        transcription = transcript.to_text()
+        compact = compact_transcription(transcription)
+        report = token_report(transcription, compact)
+        print(
+            f"Prompt transcription: {report['original_tokens']} -> {report['compact_tokens']} tokens "
+            f"({report['saved_ratio']:.0%} saved)"
+        )
+        return compact
+
+    def store_cuts(cuts):
+        cuts_path = f'cache/cuts/{cuts_key}.json'
+        with open(cuts_path, 'w', encoding='utf-8') as f:
+            json.dump(cuts, f, ensure_ascii=False)
+        cache.put('cuts', cuts_key, cuts_path, {
+            'video': filename, 'prompt_version': ViralCutAgent.PROMPT_VERSION
+        })
+        return cuts
+
+    def find_cuts(transcript):
         agent = ViralCutAgent()
-        cuts = agent.invoke(transcription=transcription)
-        
+        cuts = agent.invoke(
+            transcription=compact_prompt(transcript),
+            chunked=chunked_agent,
+            bypass_cache=bypass_llm_cache
+        )
+        # Snapping can make distinct clips the same moment again
+        return store_cuts(merge_clips(clip_index(transcript).snap_clips(cuts)))
+
+    def stream_cuts(transcript):
+        agent = ViralCutAgent()
+        index = clip_index(transcript)
+        cuts = []
+
+        def clips():
+            for cut in agent.stream(compact_prompt(transcript), bypass_cache=bypass_llm_cache):
+                cut = index.snap_clip(cut)
+                # Clips already emitted are being cut: the same moment again
+                # is dropped instead of merged
+                if any(same_moment(emitted, cut) for emitted in cuts):
+                    continue
+                cuts.append(cut)
+                yield cut
+
+        streamed['clips'] = render(video_path, clips(), reencode=reencode, on_progress=on_progress)
+        return store_cuts(cuts)
+
+    def render_cuts(cuts, transcript):
+        # The app browses cut lists by video name
         with open(json_path, 'w', encoding='utf-8') as f:
             json.dump(cuts, f, ensure_ascii=False)
-    else:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            cuts = json.load(f)
-
-    for i, cut in enumerate(cuts):
-        cut_path = f'video_cuts/{filename}_{str(i)}.mp4'
-        cut_video(
-            input_file=video_path,
-            output_file=cut_path,
-            start_time=cut['start_time'],
-            end_time=cut['end_time']
+
+        paths = [clip_output(video_path, i) for i in range(len(cuts))]
+        catalog.set_clips(video_id, cuts, paths)
+
+        # Subtitles only read the part of the transcript each clip covers
+        for cut, path in zip(cuts, paths):
+            with open(subtitle_output(path), 'w', encoding='utf-8') as f:
+                f.write(transcript.to_srt(cut['start_time'], cut['end_time']))
+
+        results = streamed.pop('clips') if 'clips' in streamed else render(
+            video_path, cuts, reencode=reencode, on_progress=on_progress
         )
+        for i, result in enumerate(results):
+            catalog.update_clip(video_id, i, result.success, result.error)
+        metrics.annotate(clips=len(results), failed_clips=sum(not r.success for r in results))
+        return results
+
+    streaming = stream_agent and not chunked_agent
+
+    graph = StageGraph(job_dir, [
+        Stage('audio', extract_audio, checkpoint=False),
+        Stage('transcript', run_transcription, deps=['audio'], lookup=cached_transcript),
+        # Streamed clips are cut as they arrive, also on the caller's thread
+        Stage(
+            'cuts',
+            stream_cuts if streaming else find_cuts,
+            deps=['transcript'],
+            lookup=None if bypass_llm_cache else cached_cuts,
+            inline=streaming
+        ),
+        # Runs on the caller's thread, so on_progress can drive Streamlit widgets
+        Stage('clips', render_cuts, deps=['cuts', 'transcript'], inline=True)
+    ], name='viral-cut')
+
+    if bypass_llm_cache:
+        # Checkpointed cuts (and the clips cut from them) would otherwise be
+        # reused without asking the LLM at all
+        graph.invalidate('cuts')
+
+    return graph
+
+def run_graph(graph: StageGraph, video_path: str, targets: list, catalog: Catalog, final: bool = False) -> dict:
+    """
+    Runs `targets` of a build_graph graph, marking the video as failed in
+    the catalog on errors, and as ready once a `final` run succeeds.
+    """
+    video_id = Catalog.video_id(video_path)
+    try:
+        outputs = graph.run(targets)
+    except Exception as e:
+        catalog.update_video(video_id, status=FAILED, error=str(e))
+        raise
+
+    if final:
+        catalog.update_video(video_id, status=READY)
+    return outputs
+
+def process(video_path: str, catalog: Catalog = None, **options):
+    """
+    Runs every stage of build_graph(video_path, **options) and returns the
+    CutResults of the rendered clips.
+    """
+    catalog = catalog or Catalog()
+    graph = build_graph(video_path, catalog=catalog, **options)
+    return run_graph(graph, video_path, ['clips'], catalog, final=True)['clips']
 
 if __name__ == '__main__':
     process('videos/FELCA - Flow #379.mp4')
\ No newline at end of file
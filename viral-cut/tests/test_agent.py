@@ -0,0 +1,124 @@
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from core.agent import ViralCutAgent, merge_clips, same_moment, split_transcription
+from core.llm_cache import LLMCache
+
+
+def _transcription(lines: int = 60, seconds: int = 20) -> str:
+    return '\n'.join(
+        f'[{i * seconds}:{(i + 1) * seconds}] line {i} of the podcast, with a few more words'
+        for i in range(lines)
+    )
+
+
+def _clip(start: float, end: float, title: str) -> dict:
+    return {'explanation': f'why {title}', 'title': title, 'start_time': start, 'end_time': end}
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Spans and caches are written relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def test_split_transcription_windows_overlap_without_breaking_lines():
+    transcription = _transcription()
+    lines = transcription.split('\n')
+    windows = split_transcription(transcription, chunk_size=120, overlap=30)
+
+    assert len(windows) > 2
+    previous_end = None
+    for window in windows:
+        window_lines = window.split('\n')
+        first = lines.index(window_lines[0])
+        assert window_lines == lines[first:first + len(window_lines)]
+        if previous_end is not None:
+            # Shares some lines with the previous window, and moves forward
+            assert first < previous_end
+            assert first + len(window_lines) > previous_end
+        previous_end = first + len(window_lines)
+    assert previous_end == len(lines)
+
+
+def test_merge_clips_deduplicates_overlaps_and_orders_by_start():
+    clips = [
+        _clip(400, 500, 'late'),
+        _clip(100, 200, 'first half'),
+        _clip(120, 240, 'LONGER first'),
+        _clip(250, 320, 'separate')
+    ]
+    merged = merge_clips(clips)
+
+    assert [(c['start_time'], c['end_time']) for c in merged] == [(100, 240), (250, 320), (400, 500)]
+    assert merged[0]['title'] == 'LONGER first'
+
+    # A union too long for a clip keeps the longer one
+    merged = merge_clips([_clip(0, 200, 'a'), _clip(100, 400, 'b')])
+    assert [(c['start_time'], c['end_time'], c['title']) for c in merged] == [(100, 400, 'b')]
+
+
+def test_same_moment_needs_half_of_the_shorter_clip():
+    assert same_moment(_clip(100, 200, 'a'), _clip(150, 400, 'b'))
+    assert same_moment(_clip(100, 200, 'a'), _clip(100, 200, 'again'))
+    assert not same_moment(_clip(100, 200, 'a'), _clip(160, 400, 'b'))
+    assert not same_moment(_clip(100, 200, 'a'), _clip(200, 300, 'next'))
+
+
+def test_window_prompts_get_their_range_and_share_of_the_clips(tmp_path):
+    agent = ViralCutAgent(
+        llm=FakeListChatModel(responses=['[]']),
+        cache=LLMCache(db_path=str(tmp_path / 'llm_cache.db'))
+    )
+    agent.CHUNK_SIZE = 120
+    agent.CHUNK_OVERLAP = 30
+
+    # Two hours, a few minutes per window
+    inputs = agent.window_inputs(_transcription(lines=120, seconds=60))
+    assert len(inputs) > 3
+    assert inputs[0]['window_start'] == 0
+    assert inputs[-1]['window_end'] == 7200
+    assert all(i['duration'] == 7200 for i in inputs)
+    for previous, current in zip(inputs, inputs[1:]):
+        assert previous['window_start'] < current['window_start'] < previous['window_end']
+
+    # Together the windows ask for what the full prompt would: 7200 / 300
+    assert sum(i['clip_count'] for i in inputs) == 24
+    rendered = agent.window_prompt.invoke(inputs[1]).to_string()
+    assert f"covers {inputs[1]['window_start']} to {inputs[1]['window_end']} seconds" in rendered
+    assert f"Create {inputs[1]['clip_count']} clips" in rendered
+
+
+def test_invoke_chunked_maps_windows_and_merges_clips(tmp_path):
+    transcription = _transcription()
+    windows = split_transcription(transcription, chunk_size=120, overlap=30)
+    assert len(windows) >= 3
+
+    # One answer per window, in order: the first two windows overlap and both
+    # find the same moment, the last one answers in a markdown fence with a
+    # malformed clip
+    responses = [json.dumps([_clip(700, 800, 'LATE'), _clip(60, 160, 'shared')])]
+    responses.append(json.dumps([_clip(80, 180, 'shared, seen again')]))
+    responses += ['[]'] * (len(windows) - 3)
+    responses.append('```json\n' + json.dumps([_clip(300, 400, 'middle'), {'title': 'broken'}]) + '\n```')
+
+    agent = ViralCutAgent(
+        llm=FakeListChatModel(responses=responses),
+        cache=LLMCache(db_path=str(tmp_path / 'llm_cache.db'))
+    )
+    agent.CHUNK_SIZE = 120
+    agent.CHUNK_OVERLAP = 30
+
+    clips = agent.invoke(transcription, chunked=True, max_concurrency=1)
+
+    assert [(c['start_time'], c['end_time']) for c in clips] == [(60, 180), (300, 400), (700, 800)]
+    assert [c['title'] for c in clips] == ['shared', 'middle', 'LATE']
+    # Every window went to the model exactly once
+    assert agent.cache.misses == len(windows)
+
+    # The same windows are answered from the cache afterwards
+    agent.llm = FakeListChatModel(responses=['[]'])
+    assert agent.invoke(transcription, chunked=True, max_concurrency=1) == clips
+    assert agent.cache.hits == len(windows)
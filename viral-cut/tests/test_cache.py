@@ -0,0 +1,66 @@
+import os
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from core.cache import ArtifactCache
+
+
+def _put_many(root: str, worker: int, count: int):
+    cache = ArtifactCache(root)
+    for i in range(count):
+        path = os.path.join(root, f'{worker}-{i}.bin')
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        cache.put('transcript', f'{worker}-{i}', path)
+
+
+def test_concurrent_writers_keep_every_entry(tmp_path):
+    root = str(tmp_path / 'cache')
+    ArtifactCache(root)
+
+    # Separate instances, like the workers and batch threads
+    with ProcessPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(_put_many, root, worker, 20) for worker in range(3)]
+    threads = [threading.Thread(target=_put_many, args=(root, worker, 20)) for worker in range(3, 6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for future in futures:
+        future.result()
+
+    cache = ArtifactCache(root)
+    for worker in range(6):
+        for i in range(20):
+            assert cache.get('transcript', f'{worker}-{i}') is not None
+
+
+def test_limited_stage_evicts_least_recently_used(tmp_path):
+    root = str(tmp_path / 'cache')
+    cache = ArtifactCache(root, limits_mb={'audio': 2.5})
+    paths = []
+    for i in range(3):
+        paths.append(os.path.join(root, f'{i}.wav'))
+        with open(paths[-1], 'wb') as f:
+            f.write(b'\0' * 1024 * 1024)
+        cache.put('audio', str(i), paths[-1])
+        if i == 1:
+            cache.get('audio', '0')
+
+    assert cache.get('audio', '1') is None and not os.path.exists(paths[1])
+    assert cache.get('audio', '0') == paths[0] and cache.get('audio', '2') == paths[2]
+
+
+def test_json_manifest_is_imported(tmp_path):
+    root = tmp_path / 'cache'
+    root.mkdir()
+    artifact = root / 'cuts.json'
+    artifact.write_text('[]')
+    (root / 'manifest.json').write_text(json.dumps({'cuts/abc': {
+        'stage': 'cuts', 'key': 'abc', 'path': str(artifact), 'size': 2,
+        'params': {}, 'created': 1.0, 'last_access': 1.0
+    }}))
+
+    assert ArtifactCache(str(root)).get('cuts', 'abc') == str(artifact)
+    assert not (root / 'manifest.json').exists()
@@ -0,0 +1,94 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from core.instrumentation import Metrics
+
+
+def _log_spans(root: str, worker: int, count: int):
+    metrics = Metrics(root, max_log_bytes=4096)
+    for i in range(count):
+        with metrics.span('transcribe', worker=str(worker)):
+            metrics.annotate(audio_seconds=1.5)
+        metrics.count('clips', status='done')
+        if i % 10 == 0:
+            metrics.export_prometheus()
+
+
+def test_aggregates_survive_rotation_with_concurrent_writers(tmp_path):
+    root = str(tmp_path / 'metrics')
+    with ProcessPoolExecutor(max_workers=3) as executor:
+        for future in [executor.submit(_log_spans, root, worker, 50) for worker in range(3)]:
+            future.result()
+
+    metrics = Metrics(root, max_log_bytes=4096)
+    summary = metrics.summary()
+    assert summary['transcribe']['runs'] == 150
+    assert summary['transcribe']['audio_seconds'] == 225.0
+    # The log was rotated instead of growing forever
+    assert os.path.exists(f'{metrics.log_path}.1')
+    assert not os.path.exists(metrics.log_path) or os.path.getsize(metrics.log_path) < 4096 * 2
+
+    with open(metrics.export_prometheus(), encoding='utf-8') as f:
+        prom = f.read()
+    assert 'pipeline_span_runs_total{span="transcribe"} 150' in prom
+    assert 'clips_total{status="done"} 150' in prom
+
+
+def test_aggregate_only_reads_new_lines(tmp_path):
+    metrics = Metrics(str(tmp_path))
+    with metrics.span('cuts'):
+        pass
+    first = metrics.aggregate()
+    assert first['spans']['cuts']['runs'] == 1
+    assert first['offset'] == os.path.getsize(metrics.log_path)
+
+    # Nothing new: the aggregates are neither re-read nor re-counted
+    assert metrics.aggregate() == first
+
+    with metrics.span('cuts'):
+        pass
+    assert metrics.summary()['cuts']['runs'] == 2
+
+
+def test_records_reads_the_tail(tmp_path):
+    metrics = Metrics(str(tmp_path))
+    for i in range(300):
+        metrics.count('step', index=i)
+
+    records = metrics.records(limit=5)
+    assert [r['labels']['index'] for r in records] == [295, 296, 297, 298, 299]
+    assert len(metrics.records()) == 300
+
+
+def test_spans_record_the_current_rss_and_label_the_process_peak(tmp_path):
+    metrics = Metrics(str(tmp_path))
+    with metrics.span('decode'):
+        buffer = bytearray(64 * 1024 * 1024)
+        buffer[::4096] = b'x' * len(buffer[::4096])
+    del buffer
+    with metrics.span('small'):
+        pass
+
+    decode, small = metrics.records()
+    if decode['rss_end_mb'] is not None:
+        assert decode['rss_end_mb'] - decode['rss_start_mb'] > 32
+        # The buffer is freed: a later span doesn't report it as its own
+        assert small['rss_end_mb'] < decode['rss_end_mb'] - 32
+    assert 'peak_rss_mb' not in small and 'process_peak_rss_mb' in small
+
+    summary = metrics.summary()
+    assert summary['decode']['rss_mb'] > summary['small']['rss_mb']
+    with open(metrics.export_prometheus(), encoding='utf-8') as f:
+        prom = f.read()
+    assert '# TYPE pipeline_span_rss_megabytes gauge' in prom
+    assert '# TYPE pipeline_span_process_peak_rss_megabytes gauge' in prom
+
+
+def test_older_peak_rss_aggregates_are_migrated(tmp_path):
+    metrics = Metrics(str(tmp_path))
+    with open(metrics.log_path, 'w', encoding='utf-8') as f:
+        f.write('{"type": "span", "name": "cuts", "error": null, "attributes": {}, "peak_rss_mb": 512.0}\n')
+
+    summary = metrics.summary()
+    assert summary['cuts']['process_peak_rss_mb'] == 512.0
+    assert 'peak_rss_mb' not in summary['cuts']
@@ -0,0 +1,68 @@
+import os
+import time
+
+import ffmpeg
+
+from core import previews as previews_module
+from core.previews import PreviewService
+
+
+def _wait(service: PreviewService):
+    deadline = time.monotonic() + 5
+    while service.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert service.pending() == 0
+
+
+def test_failed_previews_are_retried(tmp_path, monkeypatch):
+    calls = []
+
+    def flaky_thumbnail(clip_path, output_file):
+        calls.append(clip_path)
+        if len(calls) < 3:
+            raise ffmpeg.Error('ffmpeg', None, b'broken frame')
+        with open(output_file, 'wb') as f:
+            f.write(b'jpg')
+
+    monkeypatch.setattr(previews_module, 'make_thumbnail', flaky_thumbnail)
+    clip = tmp_path / 'clip.mp4'
+    clip.write_bytes(b'video')
+    service = PreviewService(str(tmp_path / 'previews'), retries=1, retry_after=0.2)
+
+    # Both attempts of the first run fail
+    assert service.thumbnail(str(clip)) is None
+    _wait(service)
+    assert len(calls) == 2
+
+    # Not retried again until retry_after has passed
+    assert service.thumbnail(str(clip)) is None
+    assert service.pending() == 0
+    time.sleep(0.25)
+    assert service.thumbnail(str(clip)) is None
+    _wait(service)
+
+    thumbnail = service.thumbnail(str(clip))
+    assert thumbnail is not None and os.path.exists(thumbnail)
+    assert len(calls) == 3
+
+
+def test_rerendered_clip_gets_new_previews(tmp_path, monkeypatch):
+    def thumbnail(clip_path, output_file):
+        with open(output_file, 'wb') as f:
+            f.write(b'jpg')
+
+    monkeypatch.setattr(previews_module, 'make_thumbnail', thumbnail)
+    clip = tmp_path / 'clip.mp4'
+    clip.write_bytes(b'video')
+    service = PreviewService(str(tmp_path / 'previews'))
+
+    service.thumbnail(str(clip))
+    _wait(service)
+    first = service.thumbnail(str(clip))
+
+    clip.write_bytes(b'another video')
+    os.utime(clip, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+    assert service.thumbnail(str(clip)) is None
+    _wait(service)
+    assert service.thumbnail(str(clip)) not in (None, first)
+    assert service.thumbnail(str(tmp_path / 'missing.mp4')) is None
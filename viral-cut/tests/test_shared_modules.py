@@ -0,0 +1,37 @@
+import os
+import ast
+
+import pytest
+
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEET_BUDDY_CORE = os.path.join(os.path.dirname(APP_DIR), 'meet-buddy', 'core')
+# Copied between the two apps, which are deployed independently; viral-cut's
+# transcription.py adds a Transcript-building transcribe() on top
+SHARED_MODULES = ['transcription.py', 'stage_graph.py', 'instrumentation.py', 'llm_cache.py']
+
+
+def _definitions(path):
+    source = open(path, encoding='utf-8').read()
+    definitions = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            name = node.name
+        elif isinstance(node, ast.Assign) and all(isinstance(t, ast.Name) for t in node.targets):
+            name = ','.join(t.id for t in node.targets)
+        else:
+            continue
+        definitions[name] = ast.get_source_segment(source, node)
+    return definitions
+
+
+@pytest.mark.skipif(not os.path.isdir(MEET_BUDDY_CORE), reason='meet-buddy is not next to viral-cut')
+@pytest.mark.parametrize('module', SHARED_MODULES)
+def test_shared_definitions_match(module):
+    ours = _definitions(os.path.join(APP_DIR, 'core', module))
+    theirs = _definitions(os.path.join(MEET_BUDDY_CORE, module))
+
+    shared = ours.keys() & theirs.keys()
+    assert shared
+    changed = sorted(name for name in shared if ours[name] != theirs[name])
+    assert not changed, f'{module}: {changed} differ from meet-buddy/core/{module}, change both copies'
@@ -0,0 +1,47 @@
+import pytest
+
+from core.stage_graph import Stage, StageGraph
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Spans are written relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def _graph(job_dir, calls):
+    def stage(name):
+        def run(**inputs):
+            calls.append(name)
+            return (name, sorted(inputs))
+        return run
+
+    return StageGraph(str(job_dir), [
+        Stage('transcript', stage('transcript')),
+        Stage('cuts', stage('cuts'), deps=['transcript']),
+        Stage('clips', stage('clips'), deps=['cuts', 'transcript'])
+    ])
+
+
+def test_rerun_resumes_from_checkpoints(tmp_path):
+    calls = []
+    _graph(tmp_path / 'job', calls).run()
+    assert calls == ['transcript', 'cuts', 'clips']
+
+    calls.clear()
+    outputs = _graph(tmp_path / 'job', calls).run()
+    assert calls == []
+    assert outputs['clips'] == ('clips', ['cuts', 'transcript'])
+
+
+def test_invalidate_discards_the_stage_and_its_dependents(tmp_path):
+    calls = []
+    _graph(tmp_path / 'job', calls).run()
+
+    calls.clear()
+    graph = _graph(tmp_path / 'job', calls)
+    assert graph.invalidate('cuts') == {'cuts', 'clips'}
+    assert not graph.is_done('cuts') and not graph.is_done('clips') and graph.is_done('transcript')
+
+    graph.run()
+    assert calls == ['cuts', 'clips']
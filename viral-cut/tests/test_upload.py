@@ -0,0 +1,51 @@
+import io
+import os
+
+from core.upload import ingest_upload
+
+
+class Upload(io.BytesIO):
+    def __init__(self, name: str, content: bytes):
+        super().__init__(content)
+        self.name = name
+        self.size = len(content)
+
+
+def test_same_content_is_not_written_again(tmp_path):
+    content = os.urandom(3 * 1024 * 1024)
+    first = ingest_upload(Upload('talk.mp4', content), folder=str(tmp_path), chunk_size=1024 * 1024)
+    assert not first.reused
+    stored = os.stat(first.path)
+
+    second = ingest_upload(Upload('talk.mp4', content), folder=str(tmp_path), chunk_size=1024 * 1024)
+    assert second.reused
+    assert second.content_hash == first.content_hash
+    # The stored file was kept, and the copy made while hashing dropped
+    assert os.stat(second.path).st_ino == stored.st_ino
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.upload-')]
+
+
+def test_upload_is_read_once(tmp_path):
+    upload = Upload('talk.mp4', os.urandom(3 * 1024 * 1024))
+    reads = []
+    read = upload.read
+    upload.read = lambda size=-1: reads.append(size) or read(size)
+
+    ingest_upload(upload, folder=str(tmp_path), chunk_size=1024 * 1024)
+    # Three chunks and the empty read that ends the copy
+    assert len(reads) == 4
+
+
+def test_content_outside_the_fingerprint_samples_is_not_lost(tmp_path):
+    # Same size and same bytes where file_fingerprint samples, different in between
+    content = bytearray(40 * 1024 * 1024)
+    first = ingest_upload(Upload('talk.mp4', bytes(content)), folder=str(tmp_path))
+
+    content[1024 * 1024 + 10] = 1
+    second = ingest_upload(Upload('talk.mp4', bytes(content)), folder=str(tmp_path))
+
+    assert second.content_hash != first.content_hash
+    assert not second.reused
+    with open(second.path, 'rb') as f:
+        assert f.read() == bytes(content)
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.upload-')]
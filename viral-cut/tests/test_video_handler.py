@@ -0,0 +1,89 @@
+import time
+import shutil
+import threading
+
+import ffmpeg
+import pytest
+
+from core import video_handler
+from core.video_handler import cut_videos, decode_audio, render_clips
+
+
+def test_streamed_stream_copies_are_grouped(tmp_path, monkeypatch):
+    groups = []
+    first_group_started = threading.Event()
+
+    def fake_cut_group(input_file, group):
+        groups.append([output_file for _, _, output_file in group])
+        first_group_started.set()
+        # The clips streamed meanwhile queue up for the next group
+        time.sleep(0.2)
+        for _, _, output_file in group:
+            with open(output_file, 'wb') as f:
+                f.write(b'clip')
+
+    monkeypatch.setattr(video_handler, '_cut_group', fake_cut_group)
+    outputs = [str(tmp_path / f'{i}.mp4') for i in range(4)]
+
+    def streamed():
+        yield 0.0, 1.0, outputs[0]
+        first_group_started.wait()
+        for i in range(1, 4):
+            yield float(i), i + 1.0, outputs[i]
+
+    events = []
+    results = render_clips('input.mp4', streamed(), on_progress=events.append, reencode=False)
+
+    assert groups == [outputs[:1], outputs[1:]]
+    assert [r.output_file for r in results] == outputs
+    assert all(r.success for r in results)
+    done = [e for e in events if e.status == 'done']
+    assert [e.index for e in done] == [0, 1, 2, 3]
+    assert done[-1].completed == done[-1].total == 4
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='needs ffmpeg')
+@pytest.mark.parametrize('spill', [False, True])
+def test_decode_audio_errors_keep_stderr(tmp_path, monkeypatch, spill):
+    bad = tmp_path / 'bad.mp4'
+    bad.write_bytes(b'not a video')
+    # Long enough to be spilled to the memory-mapped file
+    monkeypatch.setattr(video_handler, '_duration', lambda input_file: 1e9)
+
+    with pytest.raises(ffmpeg.Error) as error:
+        decode_audio(str(bad), mmap_path=str(tmp_path / 'bad.f32') if spill else None)
+    assert b'Invalid data' in error.value.stderr
+
+
+def _frames(path: str) -> int:
+    out, _ = (
+        ffmpeg.input(path).video
+        .output('pipe:', format='rawvideo', pix_fmt='gray', s='16x16')
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return len(out) // (16 * 16)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='needs ffmpeg')
+def test_grouped_copies_keep_the_frames_before_the_next_keyframe(tmp_path):
+    # Keyframes every second, clips starting between them
+    video = str(tmp_path / 'in.mp4')
+    (
+        ffmpeg
+        .input('testsrc=duration=8:size=160x120:rate=25', f='lavfi')
+        .output(video, vcodec='libx264', g=25, preset='ultrafast')
+        .run(capture_stderr=True)
+    )
+    cuts = [(1.3, 2.8, str(tmp_path / 'a.mp4')), (4.7, 6.2, str(tmp_path / 'b.mp4'))]
+
+    results = cut_videos(video, cuts)
+    assert all(r.success for r in results)
+    for _, _, output_file in cuts:
+        assert _frames(output_file) >= 37
+
+
+def test_missing_ffmpeg_fails_the_clips(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    results = cut_videos('input.mp4', [(0.0, 1.0, str(tmp_path / 'a.mp4'))])
+    assert not results[0].success
+    assert 'No such file' in results[0].error
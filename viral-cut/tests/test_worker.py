@@ -0,0 +1,19 @@
+from core.job_queue import JobQueue, QUEUED, CANCELLED
+from worker import release_jobs
+
+
+def test_terminated_child_releases_every_running_job(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    cancelled = queue.enqueue('a.mp4')
+    claimed_meanwhile = queue.enqueue('b.mp4')
+    queue.claim('worker-1')
+    queue.cancel(cancelled)
+    # The child moved on to the next job right before it was terminated
+    queue.claim('worker-1')
+
+    release_jobs(queue, 'worker-1')
+
+    assert queue.get(cancelled).status == CANCELLED
+    assert queue.get(claimed_meanwhile).status == QUEUED
+    assert queue.running('worker-1') is None
+    assert queue.claim('worker-2').id == claimed_meanwhile
@@ -0,0 +1,134 @@
+import os
+import time
+import argparse
+import traceback
+import multiprocessing
+
+from core.job_queue import JobQueue, Job, JOBS_DB, DONE, FAILED, CANCELLED, RUNNING
+
+
+def run_job(queue: JobQueue, job: Job, process):
+    """Runs one job's pipeline, recording its progress and outcome."""
+    def on_progress(event):
+        queue.update_progress(
+            job.id,
+            event.completed / event.total,
+            f"Rendered {event.completed}/{event.total} clips"
+        )
+
+    try:
+        queue.update_progress(job.id, 0.0, "Processing...")
+        process(job.video_path, on_progress=on_progress, **job.params)
+        queue.finish(job.id, DONE)
+    except Exception:
+        traceback.print_exc()
+        queue.finish(job.id, FAILED, traceback.format_exc(limit=5))
+
+
+def run_jobs(db_path: str, worker: str, threads: int, poll_interval: float, current):
+    """
+    Job loop of a worker's long-lived child process: torch, the pipeline and
+    the models it loads (kept by core.model_registry) stay warm from one job
+    to the next. The id of the job being run is published in `current`, a
+    shared char array, and cleared before the next one is claimed.
+    """
+    import torch
+    torch.set_num_threads(threads)
+
+    from pipeline import process
+
+    queue = JobQueue(db_path)
+    supervisor = os.getppid()
+    # Stops claiming jobs once orphaned, they would be requeued under it
+    while os.getppid() == supervisor:
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        with current.get_lock():
+            current.value = job.id.encode()
+        run_job(queue, job, process)
+        with current.get_lock():
+            current.value = b""
+
+
+def release_jobs(queue: JobQueue, worker: str):
+    """Jobs left running by a terminated child: cancelled if asked, queued again otherwise."""
+    while True:
+        job = queue.running(worker)
+        if job is None:
+            return
+        if job.cancel_requested:
+            queue.finish(job.id, CANCELLED)
+        else:
+            queue.requeue(job.id)
+
+
+def run_worker(db_path: str = JOBS_DB, threads: int = 1, poll_interval: float = 2.0):
+    """
+    Supervises a child process claiming and running jobs in a loop. The
+    child is only terminated (and replaced, reloading its models) when its
+    job gets cancelled; a job it was running when it crashed is failed.
+    """
+    queue = JobQueue(db_path)
+    worker = f"{os.uname().nodename}-{os.getpid()}"
+    context = multiprocessing.get_context("spawn")
+    child = None
+
+    while True:
+        if child is None or not child.is_alive():
+            if child is not None:
+                job = queue.running(worker)
+                if job is not None:
+                    queue.finish(job.id, FAILED, f"Worker process exited with code {child.exitcode}")
+                # Don't respawn in a tight loop if it dies on startup
+                time.sleep(poll_interval)
+
+            # A fresh array per child, in case one died holding its lock
+            current = context.Array("c", 64)
+            child = context.Process(
+                target=run_jobs, args=(db_path, worker, threads, poll_interval, current)
+            )
+            child.start()
+
+        child.join(poll_interval)
+        queue.heartbeat(worker)
+        queue.requeue_orphans()
+
+        job = queue.running(worker)
+        if job is None or not job.cancel_requested:
+            continue
+
+        with current.get_lock():
+            # While we hold the lock the child can't move on to another job
+            terminate = current.value == job.id.encode()
+            if terminate:
+                child.terminate()
+        if terminate:
+            child.join()
+            child = None
+            release_jobs(queue, worker)
+
+
+def start_workers(workers: int, db_path: str = JOBS_DB):
+    """Starts `workers` worker processes, splitting the cores among them."""
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(db_path, threads))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    return processes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Processes videos queued by the viral-cut app")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--db", default=JOBS_DB)
+    args = parser.parse_args()
+
+    for process in start_workers(args.workers, args.db):
+        process.join()